@@ -1,6 +1,12 @@
 from django.contrib import admin
 
-from .models import CashTransaction, DailyCashCounter, Expense, Staff
+from .models import (
+    CashTransaction,
+    DailyCashCounter,
+    DailySalesSummary,
+    Expense,
+    Staff,
+)
 
 
 class CashTransactionInline(admin.TabularInline):
@@ -24,3 +30,9 @@ class StaffAdmin(admin.ModelAdmin):
 class ExpenseAdmin(admin.ModelAdmin):
     list_display = ("date", "category", "amount", "description")
     list_filter = ("category",)
+
+
+@admin.register(DailySalesSummary)
+class DailySalesSummaryAdmin(admin.ModelAdmin):
+    list_display = ("date", "bill_count", "gross", "gst", "cash", "upi", "split_cash")
+    readonly_fields = [field.name for field in DailySalesSummary._meta.fields]
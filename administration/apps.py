@@ -1,6 +1,16 @@
 from django.apps import AppConfig
+from django.db.models.signals import pre_migrate
 
 
 class AdministrationConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "administration"
+
+    def ready(self):
+        from administration import signals
+
+        pre_migrate.connect(
+            signals.create_trigram_extension,
+            sender=self,
+            dispatch_uid="pg-trgm-extension",
+        )
@@ -0,0 +1,101 @@
+import random
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import RequestFactory
+
+from administration.models import Customer
+from administration.views import customer_list_view, search_customers
+
+FIRST_NAMES = [
+    "Aarav", "Aditi", "Akash", "Ananya", "Arjun", "Diya", "Ishaan", "Kavya",
+    "Krishna", "Meera", "Neha", "Nikhil", "Pooja", "Priya", "Rahul", "Riya",
+    "Rohan", "Sanjay", "Shreya", "Simran", "Tanvi", "Varun", "Vikram", "Zara",
+]  # fmt: skip
+LAST_NAMES = [
+    "Agarwal", "Bhatt", "Chopra", "Desai", "Gupta", "Iyer", "Jain", "Joshi",
+    "Kapoor", "Khan", "Mehta", "Nair", "Patel", "Rao", "Reddy", "Shah",
+    "Sharma", "Singh", "Thakur", "Verma",
+]  # fmt: skip
+
+
+class Command(BaseCommand):
+    help = (
+        "Load synthetic customers, time the POS customer typeahead and the "
+        "customer list search on them, then roll everything back"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--customers", type=int, default=100_000)
+        parser.add_argument(
+            "--queries", type=int, default=200, help="Typeahead lookups to time"
+        )
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+
+        with transaction.atomic():
+            started = time.perf_counter()
+            phones = self._load(rng, options["customers"])
+            with connection.cursor() as cursor:
+                cursor.execute(f"ANALYZE {Customer._meta.db_table}")
+            self.stdout.write(
+                f"Loaded {options['customers']} customers "
+                f"in {time.perf_counter() - started:.1f}s"
+            )
+
+            # What the POS sends: 3+ typed characters of a name or phone
+            queries = []
+            for _ in range(options["queries"]):
+                if rng.random() < 0.5:
+                    name = rng.choice(FIRST_NAMES + LAST_NAMES)
+                    queries.append(name[: rng.randint(3, len(name))].lower())
+                else:
+                    phone = rng.choice(phones)
+                    queries.append(phone[-rng.randint(4, 10) :])
+
+            self._time("typeahead", search_customers, queries)
+            self._time("customer list", customer_list_view, queries[:50])
+
+            # Nothing generated here is kept
+            transaction.set_rollback(True)
+
+    def _load(self, rng, count):
+        phones = rng.sample(range(6_000_000_000, 10_000_000_000), count)
+        customers = [
+            Customer(
+                name=f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+                phone=str(phone),
+                total_visits=rng.randint(1, 40),
+            )
+            for phone in phones
+        ]
+        Customer.objects.bulk_create(customers, batch_size=5000)
+        return [customer.phone for customer in customers]
+
+    def _time(self, label, view, queries):
+        user = get_user_model()(username="bench", is_staff=True, is_superuser=True)
+        factory = RequestFactory()
+
+        timings = []
+        for q in queries:
+            request = factory.get("/", {"q": q})
+            request.user = user
+            started = time.perf_counter()
+            response = view(request)
+            timings.append((time.perf_counter() - started) * 1000)
+            assert response.status_code == 200
+
+        timings.sort()
+        p95 = timings[int(len(timings) * 0.95) - 1]
+        self.stdout.write(
+            f"{label:<14} p50 {statistics.median(timings):7.1f} ms   "
+            f"p95 {p95:7.1f} ms   max {timings[-1]:7.1f} ms   ({len(timings)} queries)"
+        )
+
+
+# python manage.py benchmark_customer_search
+# python manage.py benchmark_customer_search --customers 20000 --queries 50
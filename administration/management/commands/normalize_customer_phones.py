@@ -0,0 +1,88 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Max, Sum
+from django.db.models.functions import Coalesce
+
+from administration.models import Customer, normalize_phone
+from billing.models import Bill
+
+
+class Command(BaseCommand):
+    help = (
+        "Normalize phone numbers saved before Customer.save() did, merging "
+        "customers that turn out to share a number"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report what would be changed or merged",
+        )
+
+    def handle(self, *args, **options):
+        groups = defaultdict(list)
+        for customer in Customer.objects.order_by("id"):
+            groups[normalize_phone(customer.phone)].append(customer)
+
+        renamed = merged = 0
+        with transaction.atomic():
+            for phone, customers in groups.items():
+                if not phone:
+                    for customer in customers:
+                        self.stdout.write(
+                            f"#{customer.id} {customer.name}: no digits in "
+                            f"{customer.phone!r}, left as is"
+                        )
+                    continue
+
+                # The row already in the new format wins, else the oldest
+                keeper = next((c for c in customers if c.phone == phone), customers[0])
+                duplicates = [c for c in customers if c is not keeper]
+
+                if duplicates:
+                    self.stdout.write(
+                        f"{phone}: merging "
+                        + ", ".join(f"#{c.id} {c.name} ({c.phone})" for c in duplicates)
+                        + f" into #{keeper.id} {keeper.name}"
+                    )
+                    if not options["dry_run"]:
+                        self._merge(keeper, duplicates)
+                    merged += len(duplicates)
+
+                if keeper.phone != phone:
+                    self.stdout.write(f"#{keeper.id}: {keeper.phone!r} → {phone}")
+                    if not options["dry_run"]:
+                        Customer.objects.filter(id=keeper.id).update(phone=phone)
+                    renamed += 1
+
+        verb = "would be" if options["dry_run"] else "were"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{renamed} phone(s) {verb} normalized, {merged} duplicate(s) {verb} merged"
+            )
+        )
+
+    def _merge(self, keeper, duplicates):
+        Bill.objects.filter(customer__in=duplicates).update(customer=keeper)
+
+        notes = [c.notes for c in [keeper, *duplicates] if c.notes]
+        stats = Bill.objects.filter(customer=keeper).aggregate(
+            visits=Count("id"),
+            spent=Coalesce(Sum("grand_total"), Decimal("0")),
+            last=Max("created_at"),
+        )
+        Customer.objects.filter(id__in=[c.id for c in duplicates]).delete()
+        Customer.objects.filter(id=keeper.id).update(
+            notes="\n".join(notes),
+            total_visits=stats["visits"],
+            total_spent=stats["spent"],
+            last_visited=stats["last"],
+        )
+
+
+# python manage.py normalize_customer_phones --dry-run
+# python manage.py normalize_customer_phones
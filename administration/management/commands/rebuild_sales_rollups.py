@@ -0,0 +1,62 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Min
+
+from administration.rollups import build_missing_days, refresh_day
+from billing.models import Bill
+from core.business_day import business_date
+
+
+class Command(BaseCommand):
+    help = "Recompute DailySalesSummary rows for a date range"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--from", dest="start", help="First day (YYYY-MM-DD)")
+        parser.add_argument("--to", dest="end", help="Last day (YYYY-MM-DD)")
+        parser.add_argument(
+            "--missing",
+            action="store_true",
+            help="Only build closed days that have no row yet",
+        )
+
+    def handle(self, *args, **options):
+        first = Bill.objects.aggregate(first=Min("business_date"))["first"]
+        if first is None and not options["start"]:
+            self.stdout.write("No bills yet")
+            return
+
+        try:
+            start = date.fromisoformat(options["start"]) if options["start"] else first
+            end = (
+                date.fromisoformat(options["end"])
+                if options["end"]
+                else business_date()
+            )
+        except ValueError:
+            raise CommandError("Dates must look like 2025-01-31")
+
+        if options["missing"]:
+            built = build_missing_days(start, end)
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Built {built} missing day(s) from {start} to {end}"
+                )
+            )
+            return
+
+        rebuilt = 0
+        day = start
+        while day <= end:
+            refresh_day(day)
+            rebuilt += 1
+            day += timedelta(days=1)
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Rebuilt {rebuilt} day(s) from {start} to {end}")
+        )
+
+
+# python manage.py rebuild_sales_rollups
+# python manage.py rebuild_sales_rollups --missing
+# python manage.py rebuild_sales_rollups --from 2025-01-01 --to 2025-01-31
@@ -0,0 +1,55 @@
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Max, Sum
+from django.db.models.functions import Coalesce
+
+from administration.models import Customer
+
+STAT_FIELDS = ["total_visits", "total_spent", "last_visited"]
+
+
+class Command(BaseCommand):
+    help = "Check customer visit / spend counters against their bills and fix drift"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report customers whose counters are off",
+        )
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        # One grouped query for every customer, no per-customer bill reads
+        customers = Customer.objects.annotate(
+            bill_visits=Count("bills"),
+            bill_spent=Coalesce(Sum("bills__grand_total"), Decimal("0")),
+            bill_last=Max("bills__created_at"),
+        ).order_by("id")
+
+        drifted = []
+        for customer in customers.iterator(chunk_size=options["batch_size"]):
+            actual = (customer.bill_visits, customer.bill_spent, customer.bill_last)
+            stored = tuple(getattr(customer, field) for field in STAT_FIELDS)
+            if actual == stored:
+                continue
+
+            self.stdout.write(f"{customer.phone}: stored {stored}, bills say {actual}")
+            for field, value in zip(STAT_FIELDS, actual):
+                setattr(customer, field, value)
+            drifted.append(customer)
+
+        if drifted and not options["dry_run"]:
+            with transaction.atomic():
+                Customer.objects.bulk_update(
+                    drifted, STAT_FIELDS, batch_size=options["batch_size"]
+                )
+
+        verb = "would fix" if options["dry_run"] else "fixed"
+        self.stdout.write(self.style.SUCCESS(f"{len(drifted)} customer(s) {verb}"))
+
+
+# python manage.py reconcile_customer_stats
+# python manage.py reconcile_customer_stats --dry-run
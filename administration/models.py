@@ -1,6 +1,10 @@
 from decimal import Decimal
 
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import TrigramWordSimilarity
 from django.db import models
+from django.db.models import Case, F, Value, When
+from django.db.models.functions import Greatest, Upper
 from django.utils import timezone
 
 
@@ -113,10 +117,79 @@ class Expense(models.Model):
         return f"{self.get_category_display()} — ₹{self.amount}"
 
 
+def normalize_phone(raw) -> str:
+    """
+    Digits only, last 10 — "+91 98765-43210", "098765 43210" and
+    "9876543210" are the same customer.
+    """
+    return "".join(ch for ch in raw or "" if ch.isdigit())[-10:]
+
+
+def _is_phone_query(q):
+    # "+", "-" or spaces alone would normalize to "" and match everyone
+    return any(ch.isdigit() for ch in q) and all(
+        ch.isdigit() or ch in " +-" for ch in q
+    )
+
+
+class CustomerQuerySet(models.QuerySet):
+    def matching(self, q):
+        """
+        Customers whose name or phone contains the typed text.
+        Served by the trigram indexes in ``Customer.Meta``.
+        """
+        q = q.strip()
+        if _is_phone_query(q):
+            return self.filter(phone__contains=normalize_phone(q))
+        return self.filter(name__icontains=q)
+
+    def search(self, q):
+        """
+        ``matching()`` ranked for typeahead: prefix / phone-suffix hits
+        first, then by word similarity of the name, then regulars.
+        """
+        q = q.strip()
+        if _is_phone_query(q):
+            digits = normalize_phone(q)
+            rank = Case(
+                When(phone__endswith=digits, then=2),
+                When(phone__startswith=digits, then=1),
+                default=0,
+            )
+            return (
+                self.matching(q)
+                .annotate(rank=rank)
+                .order_by("-rank", "-total_visits", "id")
+            )
+
+        return (
+            self.matching(q)
+            .annotate(
+                rank=Case(When(name__istartswith=q, then=1), default=0),
+                similarity=TrigramWordSimilarity(q, "name"),
+            )
+            .order_by("-rank", "-similarity", "-total_visits", "id")
+        )
+
+    def record_bill(self, bill):
+        """
+        Count a finalized ``bill`` towards its customer's lifetime stats.
+        Atomic in the database, so concurrent checkouts don't lose visits.
+        """
+        return self.filter(id=bill.customer_id).update(
+            total_visits=F("total_visits") + 1,
+            total_spent=F("total_spent") + bill.grand_total,
+            # Postgres GREATEST skips NULL (first visit)
+            last_visited=Greatest("last_visited", Value(bill.created_at)),
+        )
+
+
 class Customer(models.Model):
     """
-    Stores unique customers based on phone number.
-    Auto-updated whenever a bill is created.
+    Stores unique customers based on phone number (normalized on save;
+    ``python manage.py normalize_customer_phones`` fixes older rows).
+    Stats are updated with each bill (``record_bill``);
+    ``python manage.py reconcile_customer_stats`` checks them.
     """
 
     name = models.CharField(max_length=150)
@@ -129,8 +202,70 @@ class Customer(models.Model):
     notes = models.TextField(blank=True, default="")
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = CustomerQuerySet.as_manager()
+
     class Meta:
         ordering = ["-last_visited"]
+        # One per sort of the customer list, ending on id for keyset paging
+        indexes = [
+            models.Index(
+                F("last_visited").desc(nulls_last=True),
+                F("id").desc(),
+                name="customer_recent_idx",
+            ),
+            models.Index(fields=["total_spent", "id"], name="customer_spent_idx"),
+            models.Index(fields=["total_visits", "id"], name="customer_visits_idx"),
+            models.Index(fields=["name", "id"], name="customer_name_idx"),
+            # Substring search (icontains / contains) for the typeahead;
+            # pg_trgm is created by a pre_migrate receiver
+            GinIndex(
+                OpClass(Upper("name"), name="gin_trgm_ops"), name="customer_name_trgm"
+            ),
+            GinIndex(
+                fields=["phone"], opclasses=["gin_trgm_ops"], name="customer_phone_trgm"
+            ),
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.phone})"
+
+    def save(self, *args, **kwargs):
+        self.phone = normalize_phone(self.phone)
+        super().save(*args, **kwargs)
+
+
+class DailySalesSummary(models.Model):
+    """
+    One row per business day with that day's sales totals.
+    Kept current as bills of that day are finalized or deleted;
+    ``python manage.py rebuild_sales_rollups`` recomputes any range.
+    """
+
+    date = models.DateField(unique=True)
+    bill_count = models.PositiveIntegerField(default=0)
+    gross = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0"))
+    discount = models.DecimalField(
+        max_digits=14, decimal_places=2, default=Decimal("0")
+    )
+    gst = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0"))
+    # Full amount of CASH / UPI bills
+    cash = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0"))
+    upi = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0"))
+    # Cash portion of SPLIT bills
+    split_cash = models.DecimalField(
+        max_digits=14, decimal_places=2, default=Decimal("0")
+    )
+    item_quantity = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["-date"]
+        verbose_name = "Daily Sales Summary"
+        verbose_name_plural = "Daily Sales Summaries"
+
+    def __str__(self):
+        return f"Sales — {self.date}"
+
+    @property
+    def total_cash(self):
+        return self.cash + self.split_cash
@@ -0,0 +1,208 @@
+"""
+Daily sales rollups.
+
+Days are business days (``Bill.business_date``). Closed days are read
+from ``DailySalesSummary``; the current day is always aggregated live
+from ``Bill``. ``refresh_day()`` recomputes one day's row and runs
+inside the billing transaction that finalized (or deleted) a bill of
+that day.
+
+Reads never write: a closed day without a row (before the rollups
+existed, or a day without bills) is aggregated live too, in one grouped
+query. ``python manage.py rebuild_sales_rollups --missing`` stores them.
+"""
+
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, F, Q, Sum, Value
+from django.db.models.functions import Coalesce
+
+from billing.models import Bill, BillItem
+from core.business_day import business_date
+
+from .models import DailySalesSummary
+
+ZERO = Value(
+    Decimal("0.00"), output_field=DecimalField(max_digits=12, decimal_places=2)
+)
+
+SUMMARY_FIELDS = [
+    "bill_count",
+    "gross",
+    "discount",
+    "gst",
+    "cash",
+    "upi",
+    "split_cash",
+    "item_quantity",
+]
+
+
+def bills_between(start, end=None):
+    """Bills of the business days ``start`` to ``end`` (inclusive)."""
+    return Bill.objects.filter(business_date__range=(start, end or start))
+
+
+def _bill_totals():
+    return dict(
+        bill_count=Count("id"),
+        gross=Coalesce(Sum("grand_total"), ZERO),
+        discount=Coalesce(Sum("discount_amount"), ZERO),
+        gst=Coalesce(Sum(F("cgst") + F("sgst")), ZERO),
+        cash=Coalesce(Sum("grand_total", filter=Q(payment_mode="CASH")), ZERO),
+        upi=Coalesce(Sum("grand_total", filter=Q(payment_mode="UPI")), ZERO),
+        split_cash=Coalesce(Sum("cash_received", filter=Q(payment_mode="SPLIT")), ZERO),
+    )
+
+
+def aggregate_sales(bills) -> dict:
+    totals = bills.aggregate(**_bill_totals())
+    totals["item_quantity"] = BillItem.objects.filter(bill__in=bills).aggregate(
+        total=Coalesce(Sum("quantity"), 0)
+    )["total"]
+    return totals
+
+
+def aggregate_sales_by_day(days) -> dict:
+    """
+    ``aggregate_sales()`` of several days at once: ``{date: totals}``,
+    days without bills left out.
+    """
+    result = {
+        row.pop("business_date"): {**row, "item_quantity": 0}
+        for row in Bill.objects.filter(business_date__in=days)
+        .order_by()
+        .values("business_date")
+        .annotate(**_bill_totals())
+    }
+    quantities = (
+        BillItem.objects.filter(bill__business_date__in=days)
+        .order_by()
+        .values_list("bill__business_date")
+        .annotate(total=Sum("quantity"))
+    )
+    for day, quantity in quantities:
+        result[day]["item_quantity"] = quantity
+    return result
+
+
+def _bill_delta(bill, items=None) -> dict:
+    zero = Decimal("0.00")
+    if items is None:
+        quantity = bill.items.aggregate(total=Coalesce(Sum("quantity"), 0))["total"]
+    else:
+        quantity = sum(item.quantity for item in items)
+
+    mode = bill.payment_mode
+    return {
+        "bill_count": 1,
+        "gross": bill.grand_total,
+        "discount": bill.discount_amount,
+        "gst": bill.cgst + bill.sgst,
+        "cash": bill.grand_total if mode == "CASH" else zero,
+        "upi": bill.grand_total if mode == "UPI" else zero,
+        "split_cash": (bill.cash_received or zero) if mode == "SPLIT" else zero,
+        "item_quantity": quantity,
+    }
+
+
+def add_bill(bill, items=None):
+    """
+    Add a newly finalized ``bill`` to its day's rollup row.
+    Atomic in the database, like ``Customer.objects.record_bill()``.
+    """
+    updated = DailySalesSummary.objects.filter(date=bill.business_date).update(
+        **{field: F(field) + value for field, value in _bill_delta(bill, items).items()}
+    )
+    if not updated:
+        # First bill of the day (or a day from before the rollups)
+        refresh_day(bill.business_date)
+
+
+def refresh_day(day) -> DailySalesSummary:
+    """
+    Recompute the rollup row of one day.
+
+    The row is locked first, so a concurrent bill of the same day waits
+    and then aggregates with this bill already committed.
+    """
+    with transaction.atomic():
+        summary, _ = DailySalesSummary.objects.select_for_update().get_or_create(
+            date=day
+        )
+        for field, value in aggregate_sales(bills_between(day)).items():
+            setattr(summary, field, value)
+        summary.save()
+
+    return summary
+
+
+def _as_dict(summary):
+    return {field: getattr(summary, field) for field in SUMMARY_FIELDS}
+
+
+def build_missing_days(start, end) -> int:
+    """
+    Store the rollup rows missing for the closed days ``start`` to
+    ``end``. Returns the number of days built.
+    """
+    end = min(end, business_date() - timedelta(days=1))
+    existing = set(
+        DailySalesSummary.objects.filter(date__range=(start, end)).values_list(
+            "date", flat=True
+        )
+    )
+
+    built = 0
+    day = start
+    while day <= end:
+        if day not in existing:
+            refresh_day(day)
+            built += 1
+        day += timedelta(days=1)
+    return built
+
+
+def sales_by_day(start, end) -> dict:
+    """
+    ``{date: totals}`` for every day from ``start`` to ``end``.
+    Closed days come from the rollup table; the current day and closed
+    days without a row are aggregated live.
+    """
+    today = business_date()
+    rows = {
+        summary.date: summary
+        for summary in DailySalesSummary.objects.filter(date__range=(start, end))
+    }
+    empty = dict.fromkeys(SUMMARY_FIELDS, 0)
+
+    days = []
+    day = start
+    while day <= min(end, today):
+        days.append(day)
+        day += timedelta(days=1)
+    live = aggregate_sales_by_day(
+        [day for day in days if day == today or day not in rows]
+    )
+
+    result = {}
+    day = start
+    while day <= end:
+        if day in rows and day != today:
+            result[day] = _as_dict(rows[day])
+        else:
+            result[day] = live.get(day, empty)
+        day += timedelta(days=1)
+
+    return result
+
+
+def sum_sales(totals) -> dict:
+    """Add up the per-day dicts returned by ``sales_by_day()``."""
+    summed = dict.fromkeys(SUMMARY_FIELDS, 0)
+    for day_totals in totals:
+        for field in SUMMARY_FIELDS:
+            summed[field] += day_totals[field]
+    return summed
@@ -0,0 +1,36 @@
+from django.db import connections
+from django.db.models.signals import post_delete
+
+from billing.signals import bill_finalized
+
+from .rollups import add_bill, refresh_day
+
+
+def refresh_sales_rollup(sender, bill, items=None, created=False, **kwargs):
+    if created:
+        add_bill(bill, items)
+    else:
+        refresh_day(bill.business_date)
+
+
+def refresh_sales_rollup_on_delete(sender, instance, **kwargs):
+    # Bills from before business_date existed count towards no day yet
+    if instance.business_date is None:
+        return
+    refresh_day(instance.business_date)
+
+
+bill_finalized.connect(refresh_sales_rollup, dispatch_uid="sales-rollup-finalized")
+post_delete.connect(
+    refresh_sales_rollup_on_delete,
+    sender="billing.Bill",
+    dispatch_uid="sales-rollup-deleted",
+)
+
+
+def create_trigram_extension(sender, using, **kwargs):
+    # Customer search indexes use gin_trgm_ops; must exist before tables
+    connection = connections[using]
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
@@ -0,0 +1,354 @@
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from administration.models import Customer, DailySalesSummary
+from administration.rollups import (
+    SUMMARY_FIELDS,
+    add_bill,
+    aggregate_sales,
+    bills_between,
+    sales_by_day,
+)
+from billing.models import Bill, BillItem
+from core.business_day import business_date
+from home.models import Category, Item
+
+
+def make_bill(item, days_ago=0, payment_mode="CASH", quantity=1, **fields):
+    bill = Bill.objects.create(
+        customer_name="Asha",
+        customer_phone="9999999999",
+        payment_mode=payment_mode,
+        gst_percentage=Decimal("5.00"),
+        created_at=timezone.now() - timedelta(days=days_ago),
+        **fields,
+    )
+    items = BillItem.objects.bulk_create(
+        [BillItem(bill=bill, item=item, price=Decimal("100"), quantity=quantity)]
+    )
+    # As at checkout
+    bill.finalize(items=items, created=True)
+    return bill
+
+
+class SalesRollupTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name="Coffee")
+        self.latte = Item.objects.create(category=category, name="Latte")
+        self.today = business_date()
+
+    def test_finalize_keeps_the_day_current(self):
+        make_bill(self.latte, days_ago=2, quantity=2)
+
+        summary = DailySalesSummary.objects.get(date=self.today - timedelta(days=2))
+        self.assertEqual(summary.bill_count, 1)
+        self.assertEqual(summary.gross, Decimal("210.00"))
+        self.assertEqual(summary.item_quantity, 2)
+
+    def test_checkout_adds_the_bill_to_the_day(self):
+        day = self.today - timedelta(days=1)
+        make_bill(self.latte, days_ago=1, quantity=2)
+        bill = make_bill(self.latte, days_ago=1, payment_mode="UPI")
+        make_bill(
+            self.latte,
+            days_ago=1,
+            payment_mode="SPLIT",
+            quantity=3,
+            cash_received=Decimal("100.00"),
+        )
+
+        summary = DailySalesSummary.objects.get(date=day)
+        self.assertEqual(summary.bill_count, 3)
+        self.assertEqual(summary.split_cash, Decimal("100.00"))
+        self.assertEqual(
+            {field: getattr(summary, field) for field in SUMMARY_FIELDS},
+            aggregate_sales(bills_between(day)),
+        )
+
+        # One UPDATE, however many bills the day has
+        items = list(bill.items.all())
+        with self.assertNumQueries(1):
+            add_bill(bill, items=items)
+
+    def test_edited_bill_recomputes_the_day(self):
+        bill = make_bill(self.latte, days_ago=1)
+        make_bill(self.latte, days_ago=1)
+
+        # Edited in the admin and finalized again
+        bill.items.update(quantity=4)
+        bill.payment_mode = "UPI"
+        bill.save()
+        bill.finalize()
+
+        summary = DailySalesSummary.objects.get(date=self.today - timedelta(days=1))
+        self.assertEqual(summary.bill_count, 2)
+        self.assertEqual(summary.item_quantity, 5)
+        self.assertEqual(summary.upi, Decimal("420.00"))
+        self.assertEqual(summary.cash, Decimal("105.00"))
+
+    def test_deleting_a_bill_without_business_date(self):
+        # Saved before bills had a business_date
+        bill = make_bill(self.latte, days_ago=1)
+        Bill.objects.filter(id=bill.id).update(business_date=None)
+        bill.refresh_from_db()
+
+        bill.delete()
+
+        self.assertFalse(Bill.objects.exists())
+
+    def test_reading_a_day_without_a_row_writes_nothing(self):
+        # History from before the rollups existed
+        make_bill(self.latte, days_ago=3)
+        make_bill(self.latte, days_ago=3, payment_mode="UPI", quantity=3)
+        make_bill(self.latte)
+        DailySalesSummary.objects.all().delete()
+
+        start = self.today - timedelta(days=5)
+        with self.assertNumQueries(3):
+            by_day = sales_by_day(start, self.today)
+
+        self.assertFalse(DailySalesSummary.objects.exists())
+        past = by_day[self.today - timedelta(days=3)]
+        self.assertEqual(past["bill_count"], 2)
+        self.assertEqual(past["gross"], Decimal("420.00"))
+        self.assertEqual(past["upi"], Decimal("315.00"))
+        self.assertEqual(past["item_quantity"], 4)
+        self.assertEqual(by_day[self.today]["bill_count"], 1)
+        self.assertEqual(by_day[start]["bill_count"], 0)
+
+        # The dashboard is a read as well
+        admin = User.objects.create_superuser("admin", "a@a.com", "pw")
+        self.client.force_login(admin)
+        response = self.client.get(
+            reverse("administration:dashboard"),
+            {"date": (self.today - timedelta(days=3)).isoformat()},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(DailySalesSummary.objects.exists())
+
+    def test_rebuild_missing_days(self):
+        make_bill(self.latte, days_ago=3)
+        make_bill(self.latte)
+        DailySalesSummary.objects.all().delete()
+        start = self.today - timedelta(days=3)
+        live = sales_by_day(start, self.today)
+
+        call_command("rebuild_sales_rollups", missing=True, stdout=StringIO())
+
+        # Closed days only: today stays live
+        self.assertEqual(
+            sorted(DailySalesSummary.objects.values_list("date", "bill_count")),
+            [
+                (self.today - timedelta(days=3), 1),
+                (self.today - timedelta(days=2), 0),
+                (self.today - timedelta(days=1), 0),
+            ],
+        )
+        self.assertEqual(sales_by_day(start, self.today), live)
+
+
+class CustomerStatsTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name="Coffee")
+        self.latte = Item.objects.create(category=category, name="Latte")
+        self.asha = Customer.objects.create(name="Asha", phone="9876543210")
+
+    def checkout(self, days_ago=0, quantity=1):
+        bill = make_bill(
+            self.latte, days_ago=days_ago, quantity=quantity, customer=self.asha
+        )
+        Customer.objects.record_bill(bill)
+        return bill
+
+    def test_each_bill_adds_a_visit_and_its_total(self):
+        self.checkout(days_ago=1)
+        bill = make_bill(self.latte, quantity=2, customer=self.asha)
+        # One UPDATE, however many bills the customer has
+        with self.assertNumQueries(1):
+            Customer.objects.record_bill(bill)
+
+        self.asha.refresh_from_db()
+        self.assertEqual(self.asha.total_visits, 2)
+        self.assertEqual(self.asha.total_spent, Decimal("315.00"))
+        self.assertEqual(self.asha.last_visited, bill.created_at)
+
+    def test_last_visited_keeps_the_latest_bill(self):
+        latest = self.checkout(days_ago=1)
+        # Entered late: an older bill must not move last_visited back
+        self.checkout(days_ago=3)
+
+        self.asha.refresh_from_db()
+        self.assertEqual(self.asha.last_visited, latest.created_at)
+        self.assertEqual(self.asha.total_visits, 2)
+
+    def test_reconcile_fixes_drift(self):
+        self.checkout(days_ago=2)
+        latest = self.checkout(quantity=2)
+        Customer.objects.filter(id=self.asha.id).update(
+            total_visits=7, total_spent=Decimal("1.00"), last_visited=None
+        )
+
+        out = StringIO()
+        call_command("reconcile_customer_stats", dry_run=True, stdout=out)
+        self.assertIn("1 customer(s) would fix", out.getvalue())
+        self.assertEqual(Customer.objects.get(id=self.asha.id).total_visits, 7)
+
+        call_command("reconcile_customer_stats", stdout=StringIO())
+
+        self.asha.refresh_from_db()
+        self.assertEqual(self.asha.total_visits, 2)
+        self.assertEqual(self.asha.total_spent, Decimal("315.00"))
+        self.assertEqual(self.asha.last_visited, latest.created_at)
+
+        out = StringIO()
+        call_command("reconcile_customer_stats", stdout=out)
+        self.assertIn("0 customer(s) fixed", out.getvalue())
+
+
+class CustomerPhoneTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name="Coffee")
+        self.latte = Item.objects.create(category=category, name="Latte")
+
+    def test_punctuation_alone_is_not_a_phone_search(self):
+        Customer.objects.create(name="Asha", phone="9876543210")
+        Customer.objects.create(name="Ravi", phone="9123456780")
+
+        for q in ("+", " - ", "+ -"):
+            with self.subTest(q=q):
+                self.assertFalse(Customer.objects.search(q).exists())
+        self.assertEqual(
+            list(Customer.objects.search("987-65").values_list("name", flat=True)),
+            ["Asha"],
+        )
+
+    def test_backfill_normalizes_and_merges(self):
+        # Saved before Customer.save() normalized phones
+        asha, asha_plus, asha_zero, ravi, blank = Customer.objects.bulk_create(
+            [
+                Customer(name="Asha", phone="9876543210", notes="Oat milk"),
+                Customer(name="Asha S", phone="+91 98765-43210"),
+                Customer(name="asha", phone="098765 43210", notes="Window seat"),
+                Customer(name="Ravi", phone="91234-56780"),
+                Customer(name="Walk-in", phone="--"),
+            ]
+        )
+        for customer in (asha, asha_plus, asha_zero, asha_zero):
+            bill = make_bill(self.latte)
+            Bill.objects.filter(id=bill.id).update(customer=customer)
+
+        call_command("normalize_customer_phones", stdout=StringIO())
+
+        self.assertEqual(
+            sorted(Customer.objects.values_list("id", "phone")),
+            [(asha.id, "9876543210"), (ravi.id, "9123456780"), (blank.id, "--")],
+        )
+        asha.refresh_from_db()
+        self.assertEqual(asha.bills.count(), 4)
+        self.assertEqual(asha.total_visits, 4)
+        self.assertEqual(asha.total_spent, Decimal("420.00"))
+        self.assertEqual(asha.notes, "Oat milk\nWindow seat")
+        self.assertEqual(list(Customer.objects.search("98765 43210")), [asha])
+
+    def test_backfill_dry_run(self):
+        Customer.objects.bulk_create(
+            [
+                Customer(name="Asha", phone="+91 98765-43210"),
+                Customer(name="Asha S", phone="098765 43210"),
+            ]
+        )
+        out = StringIO()
+
+        call_command("normalize_customer_phones", dry_run=True, stdout=out)
+
+        self.assertIn("1 phone(s) would be normalized, 1 duplicate(s)", out.getvalue())
+        self.assertEqual(Customer.objects.count(), 2)
+
+
+class CustomerListTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name="Coffee")
+        latte = Item.objects.create(category=category, name="Latte")
+        now = timezone.now()
+        names = ["Asha", "Ravi", "Meena", "Asha", "Kiran", "Ravi"]
+        # Ties on every sort column: 3 distinct values each
+        self.customers = Customer.objects.bulk_create(
+            Customer(
+                name=names[n % len(names)],
+                phone=f"98765{n:05d}",
+                total_visits=n % 3,
+                total_spent=Decimal(100 * (n % 3)),
+                # Two never visited: the NULL tail of the recent sort
+                last_visited=now - timedelta(days=n % 3) if n < 14 else None,
+            )
+            for n in range(16)
+        )
+        for customer in self.customers[:4]:
+            bill = make_bill(latte)
+            Bill.objects.filter(id=bill.id).update(customer=customer)
+
+        admin = User.objects.create_superuser("admin", "a@a.com", "pw")
+        self.client.force_login(admin)
+
+    def walk(self, sort, budgets):
+        """
+        Follow the Next links from the first page, each page within its
+        query budget. Returns the customer ids in page order.
+        """
+        url = reverse("administration:customer_list")
+        seen, after = [], None
+        for budget in budgets:
+            params = {"sort": sort}
+            if after:
+                params["after"] = after
+            with self.assertNumQueries(budget):
+                response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            seen += [c.id for c in response.context["customers"]]
+            after = response.context["next_cursor"]
+        self.assertIsNone(after)
+        return seen
+
+    @mock.patch("administration.views.CUSTOMER_PAGE_SIZE", 5)
+    def test_every_sort_pages_through_everyone_once(self):
+        # Session, user, one page query; the recent page that runs out of
+        # visits also reads the start of the never-visited tail
+        sorts = {
+            "recent": (
+                [3, 3, 4, 3],
+                lambda c: (
+                    c.last_visited is None,
+                    -c.last_visited.timestamp() if c.last_visited else 0,
+                    -c.id,
+                ),
+            ),
+            "spent": ([3, 3, 3, 3], lambda c: (-c.total_spent, -c.id)),
+            "visits": ([3, 3, 3, 3], lambda c: (-c.total_visits, -c.id)),
+            "name": ([3, 3, 3, 3], lambda c: (c.name, c.id)),
+        }
+        for sort, (budgets, key) in sorts.items():
+            with self.subTest(sort=sort):
+                self.assertEqual(
+                    self.walk(sort, budgets),
+                    [c.id for c in sorted(self.customers, key=key)],
+                )
+
+    def test_page_stats_come_from_the_bills(self):
+        response = self.client.get(
+            reverse("administration:customer_list"), {"sort": "name"}
+        )
+
+        stats = {
+            c.id: (c.computed_visits, c.computed_spent)
+            for c in response.context["customers"]
+        }
+        self.assertEqual(stats[self.customers[0].id], (1, Decimal("105.00")))
+        self.assertEqual(stats[self.customers[4].id], (0, Decimal("0.00")))
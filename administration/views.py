@@ -1,15 +1,26 @@
 from datetime import datetime, timedelta
 from decimal import Decimal
 
-from django.db.models import Q, Sum
+from django.core.exceptions import ValidationError
+from django.db.models import Count, F, Max, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
 from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
-from django.utils import timezone
 
-from billing.models import Bill, BillItem
+from billing.models import Bill
+from core.business_day import business_date
 from core.decorators import admin_required
+from dashboard.models import SalesFact
 
-from .models import CashTransaction, Customer, DailyCashCounter, Expense, Staff
+from .models import (
+    CashTransaction,
+    Customer,
+    DailyCashCounter,
+    Expense,
+    Staff,
+    normalize_phone,
+)
+from .rollups import ZERO, bills_between, sales_by_day, sum_sales
 
 
 # ═══════════════════════════════════════════════════
@@ -22,33 +33,34 @@ def admin_dashboard(request):
         try:
             today = datetime.strptime(date_str, "%Y-%m-%d").date()
         except ValueError:
-            today = timezone.localdate()
+            today = business_date()
     else:
-        today = timezone.localdate()
+        today = business_date()
 
     yesterday = today - timedelta(days=1)
     first_of_month = today.replace(day=1)
 
-    # ── Today's Sales ──
-    today_bills = Bill.objects.filter(created_at__date=today)
-    today_revenue = sum(b.total_amount() for b in today_bills)
-    today_bill_count = today_bills.count()
+    # ── Sales: rollups for closed days, live for the current day ──
+    last7_start = today - timedelta(days=6)
+    by_day = sales_by_day(min(first_of_month, last7_start), today)
+
+    today_stats = by_day[today]
+    today_revenue = today_stats["gross"]
+    today_bill_count = today_stats["bill_count"]
     # Cash = full amount for CASH bills + cash_received portion for SPLIT bills
-    today_cash = sum(b.total_amount() for b in today_bills.filter(payment_mode="CASH"))
-    today_cash += sum(
-        (b.cash_received or 0) for b in today_bills.filter(payment_mode="SPLIT")
-    )
-    today_upi = sum(b.total_amount() for b in today_bills.filter(payment_mode="UPI"))
+    today_cash = today_stats["cash"] + today_stats["split_cash"]
+    today_upi = today_stats["upi"]
 
     # ── Yesterday's Sales (for comparison) ──
-    yest_bills = Bill.objects.filter(created_at__date=yesterday)
-    yest_revenue = sum(b.total_amount() for b in yest_bills)
-    yest_bill_count = yest_bills.count()
+    yest_revenue = by_day[yesterday]["gross"]
+    yest_bill_count = by_day[yesterday]["bill_count"]
 
     # ── Monthly ──
-    monthly_bills = Bill.objects.filter(created_at__date__gte=first_of_month)
-    monthly_revenue = sum(b.total_amount() for b in monthly_bills)
-    monthly_bill_count = monthly_bills.count()
+    monthly_stats = sum_sales(
+        totals for day, totals in by_day.items() if day >= first_of_month
+    )
+    monthly_revenue = monthly_stats["gross"]
+    monthly_bill_count = monthly_stats["bill_count"]
 
     monthly_expenses = Expense.objects.filter(date__gte=first_of_month).aggregate(
         total=Sum("amount")
@@ -61,21 +73,13 @@ def admin_dashboard(request):
     net = monthly_revenue - monthly_expenses - total_salary
 
     # ── Last 7 days revenue ──
-    last7_start = today - timedelta(days=6)
     daily_data = []
     for i in range(7):
         d = last7_start + timedelta(days=i)
-        day_bills = Bill.objects.filter(created_at__date=d)
-        day_rev = sum(b.total_amount() for b in day_bills)
-        daily_data.append({"day": d, "revenue": float(day_rev)})
+        daily_data.append({"day": d, "revenue": float(by_day[d]["gross"])})
 
     # ── Top 5 selling items today ──
-    top_items = (
-        BillItem.objects.filter(bill__created_at__date=today)
-        .values("item__name")
-        .annotate(qty=Sum("quantity"))
-        .order_by("-qty")[:5]
-    )
+    top_items = SalesFact.objects.between(today).rollup("item").order_by("-qty")[:5]
 
     # ── Expense category breakdown (this month) ──
     cat_data = (
@@ -136,7 +140,7 @@ def admin_dashboard(request):
 # ═══════════════════════════════════════════════════
 @admin_required
 def cash_counter_view(request):
-    today = timezone.localdate()
+    today = business_date()
     counter, _ = DailyCashCounter.objects.get_or_create(date=today)
 
     if request.method == "POST":
@@ -176,16 +180,12 @@ def cash_counter_view(request):
         return redirect("administration:cash_counter")
 
     # ── Calculations ──
-    today_cash_bills = sum(
-        bill.total_amount()
-        for bill in Bill.objects.filter(created_at__date=today, payment_mode="CASH")
-    )
-
-    # Add cash portion from SPLIT bills
-    today_cash_bills += sum(
-        (bill.cash_received or Decimal("0"))
-        for bill in Bill.objects.filter(created_at__date=today, payment_mode="SPLIT")
+    # CASH bills in full + cash portion from SPLIT bills
+    cash_stats = bills_between(today).aggregate(
+        cash=Coalesce(Sum("grand_total", filter=Q(payment_mode="CASH")), ZERO),
+        split_cash=Coalesce(Sum("cash_received", filter=Q(payment_mode="SPLIT")), ZERO),
     )
+    today_cash_bills = cash_stats["cash"] + cash_stats["split_cash"]
 
     withdrawals = counter.transactions.filter(
         tx_type=CashTransaction.TransactionType.OUT
@@ -201,7 +201,7 @@ def cash_counter_view(request):
     expected_cash = counter.opening_balance + today_cash_in - total_withdrawn
 
     # Today's all bills for display
-    today_bills = Bill.objects.filter(created_at__date=today).order_by("-created_at")
+    today_bills = bills_between(today).order_by("-created_at")
 
     return render(
         request,
@@ -288,7 +288,7 @@ def staff_detail_view(request, staff_id):
 # ═══════════════════════════════════════════════════
 @admin_required
 def expense_list_view(request):
-    today = timezone.localdate()
+    today = business_date()
     first_of_month = today.replace(day=1)
 
     if request.method == "POST":
@@ -331,22 +331,113 @@ def expense_list_view(request):
 # ═══════════════════════════════════════════════════
 #  CUSTOMERS
 # ═══════════════════════════════════════════════════
+CUSTOMER_PAGE_SIZE = 48
+
+# ?sort= -> (stored column, descending). Every sort ends on id, so the
+# (value, id) of the last row is a stable cursor for the next page.
+CUSTOMER_SORTS = {
+    "recent": ("last_visited", True),
+    "spent": ("total_spent", True),
+    "visits": ("total_visits", True),
+    "name": ("name", False),
+}
+
+
+def _customer_bill_stat(aggregate):
+    bills = (
+        Bill.objects.filter(customer=OuterRef("pk"))
+        .order_by()
+        .values("customer")
+        .annotate(value=aggregate)
+        .values("value")
+    )
+    return Subquery(bills)
+
+
+def _parse_cursor(model_field, raw):
+    """``"<value>|<id>"`` -> ``(value, id)``, or None if malformed."""
+    value, _, last_id = raw.rpartition("|")
+    try:
+        return (model_field.to_python(value) if value else None), int(last_id)
+    except (ValueError, ValidationError):
+        return None
+
+
+def _keyset_page(customers, field, descending, after, size):
+    """
+    Up to ``size`` customers in ``field`` order (NULLs last), starting
+    after cursor ``after``. The sort column is always filtered by range,
+    so each page is an index scan however deep it is.
+    """
+    model_field = Customer._meta.get_field(field)
+    past = "lt" if descending else "gt"
+    if descending:
+        # NULLS LAST only where NULLs exist, or the index can't serve it
+        column = F(field).desc(nulls_last=True) if model_field.null else F(field).desc()
+        ordering = [column, "-id"]
+    else:
+        ordering = [F(field).asc(), "id"]
+
+    cursor = _parse_cursor(model_field, after) if after else None
+    if cursor is None:
+        return list(customers.order_by(*ordering)[:size])
+
+    value, last_id = cursor
+    nulls = customers.filter(**{f"{field}__isnull": True}).order_by(*ordering)
+    if value is None:
+        # Already into the trailing NULLs
+        return list(nulls.filter(**{f"id__{past}": last_id})[:size])
+
+    page = list(
+        customers.filter(**{f"{field}__{past}e": value})
+        .filter(Q(**{f"{field}__{past}": value}) | Q(**{f"id__{past}": last_id}))
+        .order_by(*ordering)[:size]
+    )
+    if model_field.null and len(page) < size:
+        page += nulls[: size - len(page)]
+    return page
+
+
 @admin_required
 def customer_list_view(request):
     q = request.GET.get("q", "")
-    customers = Customer.objects.all()
+    sort = request.GET.get("sort", "recent")
+    if sort not in CUSTOMER_SORTS:
+        sort = "recent"
+    field, descending = CUSTOMER_SORTS[sort]
 
+    customers = Customer.objects.all()
     if q:
-        customers = customers.filter(Q(name__icontains=q) | Q(phone__icontains=q))
+        customers = customers.matching(q)
+
+    # Keyset page on the stored counters; spend / visits / last bill are
+    # read from the bills of these rows only
+    customers = customers.annotate(
+        computed_spent=Coalesce(_customer_bill_stat(Sum("grand_total")), ZERO),
+        computed_visits=Coalesce(_customer_bill_stat(Count("id")), 0),
+        last_bill_at=_customer_bill_stat(Max("created_at")),
+    )
+    after = request.GET.get("after")
+    page = _keyset_page(customers, field, descending, after, CUSTOMER_PAGE_SIZE + 1)
 
-    # Update total_spent from bills for all visible customers
-    for c in customers:
-        c.computed_spent = sum(b.total_amount() for b in c.bills.all())
+    next_cursor = None
+    if len(page) > CUSTOMER_PAGE_SIZE:
+        page = page[:CUSTOMER_PAGE_SIZE]
+        last = page[-1]
+        value = Customer._meta.get_field(field).value_to_string(last)
+        next_cursor = f"{value}|{last.id}"
 
     return render(
         request,
         "administration/customer_list.html",
-        {"customers": customers, "query": q},
+        {
+            "customers": page,
+            "query": q,
+            "sort": sort,
+            "sorts": CUSTOMER_SORTS,
+            "next_cursor": next_cursor,
+            "is_first_page": not after,
+        },
     )
 
 
@@ -360,7 +451,7 @@ def customer_detail_view(request, customer_id):
         return redirect("administration:customer_detail", customer_id=customer.id)
 
     bills = customer.bills.all().order_by("-created_at")
-    total_spent = sum(b.total_amount() for b in bills)
+    total_spent = bills.aggregate(total=Coalesce(Sum("grand_total"), ZERO))["total"]
 
     return render(
         request,
@@ -375,7 +466,7 @@ def customer_detail_view(request, customer_id):
 
 @admin_required
 def get_customer_by_phone(request):
-    phone = request.GET.get("phone", "").strip()
+    phone = normalize_phone(request.GET.get("phone"))
     if not phone:
         return JsonResponse(
             {"status": "error", "message": "Phone required"}, status=400
@@ -399,9 +490,8 @@ def search_customers(request):
     if not q:
         return JsonResponse({"status": "success", "customers": []})
 
-    customers = Customer.objects.filter(Q(name__icontains=q) | Q(phone__icontains=q))[
-        :10
-    ]  # Limit to 10 results for performance
+    # Ranked, index-backed; limit to 10 results for the dropdown
+    customers = Customer.objects.search(q).only("id", "name", "phone")[:10]
 
     results = []
     for c in customers:
@@ -1,6 +1,8 @@
 from django.contrib import admin
+from django.utils import timezone
 
-from .models import Bill, BillItem, CafeConfig
+from .models import Bill, BillItem, CafeConfig, PrintJob, RenderJob
+from .rendering import schedule_bill_pdf
 
 # Register your models here.
 # superuser: admin@mtc.com  password: mtc@1234
@@ -28,19 +30,22 @@ class BillAdmin(admin.ModelAdmin):
         "bill_number",
         "customer_name",
         "customer_phone",
-        "subtotal_display",
+        "subtotal",
         "discount_amount",
         "gst_amount_display",
-        "total_amount_display",
+        "grand_total",
         "created_at",
     )
 
     readonly_fields = (
         "bill_number",
         "created_at",
-        "subtotal_display",
-        "gst_amount_display",
-        "total_amount_display",
+        "subtotal",
+        "taxable",
+        "cgst",
+        "sgst",
+        "round_off",
+        "grand_total",
     )
 
     inlines = [BillItemInline]
@@ -50,20 +55,23 @@ class BillAdmin(admin.ModelAdmin):
     ordering = ("-created_at",)
 
     # ---------- DISPLAY HELPERS ----------
-    def subtotal_display(self, obj):
-        return obj.subtotal()
-
-    subtotal_display.short_description = "Subtotal"
-
     def gst_amount_display(self, obj):
         return obj.gst_amount()
 
     gst_amount_display.short_description = "GST Amount"
 
-    def total_amount_display(self, obj):
-        return obj.total_amount()
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        bill = form.instance
+        # Items edited inline change the totals
+        totals_changed = bill.finalize()
 
-    total_amount_display.short_description = "Total Amount"
+        edited = form.has_changed() or any(fs.has_changed() for fs in formsets)
+        if change and (totals_changed or edited):
+            # The stored PDF shows the old bill: render the new one
+            bill.discard_pdf()
+            bill.save(update_fields=Bill.PDF_FIELDS)
+            schedule_bill_pdf(bill)
 
 
 # ---------- CAFE CONFIG ----------
@@ -76,3 +84,52 @@ class CafeConfigAdmin(admin.ModelAdmin):
         if CafeConfig.objects.exists():
             return False
         return True
+
+
+# ---------- PRINT QUEUE ----------
+@admin.register(PrintJob)
+class PrintJobAdmin(admin.ModelAdmin):
+    list_display = (
+        "id",
+        "printer_name",
+        "file_path",
+        "status",
+        "attempts",
+        "next_attempt_at",
+        "created_at",
+    )
+    list_filter = ("status", "printer_name")
+    readonly_fields = ("created_at", "printed_at", "last_error")
+    actions = ["retry_jobs"]
+
+    @admin.action(description="Retry selected jobs")
+    def retry_jobs(self, request, queryset):
+        queryset.update(
+            status=PrintJob.Status.PENDING, attempts=0, next_attempt_at=timezone.now()
+        )
+
+
+# ---------- RENDER QUEUE ----------
+@admin.register(RenderJob)
+class RenderJobAdmin(admin.ModelAdmin):
+    list_display = (
+        "id",
+        "kind",
+        "bill",
+        "printer_name",
+        "status",
+        "attempts",
+        "next_attempt_at",
+        "created_at",
+    )
+    list_filter = ("status", "kind")
+    readonly_fields = ("created_at", "rendered_at", "last_error")
+    actions = ["retry_jobs"]
+
+    @admin.action(description="Retry selected jobs")
+    def retry_jobs(self, request, queryset):
+        queryset.update(
+            status=RenderJob.Status.PENDING,
+            attempts=0,
+            next_attempt_at=timezone.now(),
+        )
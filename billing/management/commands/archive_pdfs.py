@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from billing.models import PrintJob
+from utils.pdf_store import archive_month, stored_months
+
+
+class Command(BaseCommand):
+    help = "Pack bill / kitchen slip files of closed months into monthly zip archives"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--month",
+            help="Archive only this month (YYYY-MM); it must be closed",
+        )
+
+    def handle(self, *args, **options):
+        today = timezone.localdate()
+
+        if options["month"]:
+            try:
+                year, month = (int(part) for part in options["month"].split("-"))
+            except ValueError:
+                raise CommandError("--month must look like 2025-01")
+            if not 1 <= month <= 12:
+                raise CommandError("--month must look like 2025-01")
+            if (year, month) >= (today.year, today.month):
+                raise CommandError(
+                    f"{options['month']} is not closed yet: bills are still "
+                    "being written to it"
+                )
+            months = [(year, month)]
+        else:
+            months = [m for m in stored_months() if m < (today.year, today.month)]
+
+        # The print worker reads these from disk: they are left loose
+        # until printed and packed on a later run
+        queued = set(
+            PrintJob.objects.filter(status=PrintJob.Status.PENDING).values_list(
+                "file_path", flat=True
+            )
+        )
+
+        for year, month in months:
+            archived = archive_month(year, month, keep=queued)
+            self.stdout.write(f"{year:04d}-{month:02d}: archived {archived} file(s)")
+
+        self.stdout.write(self.style.SUCCESS("Archive up to date"))
+
+
+# python manage.py archive_pdfs
+# python manage.py archive_pdfs --month 2025-01
@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from billing.models import Bill
+
+TOTAL_FIELDS = ["subtotal", "taxable", "cgst", "sgst", "round_off", "grand_total"]
+
+
+class Command(BaseCommand):
+    help = "Compute and store totals for bills created before totals were persisted"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Recompute every bill, not only bills without a stored total",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of bills updated per query",
+        )
+
+    def handle(self, *args, **options):
+        # Totals are computed by the database, no per-bill item queries
+        bills = Bill.objects.with_totals().order_by("id")
+
+        if not options["all"]:
+            bills = bills.filter(grand_total=0)
+
+        batch_size = options["batch_size"]
+        batch = []
+        updated = 0
+
+        for bill in bills.iterator(chunk_size=batch_size):
+            for field in TOTAL_FIELDS:
+                setattr(bill, field, getattr(bill, f"calc_{field}"))
+            batch.append(bill)
+
+            if len(batch) >= batch_size:
+                updated += self._flush(batch)
+                batch = []
+
+        updated += self._flush(batch)
+
+        self.stdout.write(self.style.SUCCESS(f"Backfilled totals for {updated} bills"))
+
+    def _flush(self, batch):
+        if not batch:
+            return 0
+        with transaction.atomic():
+            Bill.objects.bulk_update(batch, TOTAL_FIELDS)
+        return len(batch)
+
+
+# python manage.py backfill_bill_totals
+# python manage.py backfill_bill_totals --all
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from billing.models import Bill
+from core.business_day import business_date_expression
+from orders.models import Order, OrderHistory
+
+
+class Command(BaseCommand):
+    help = "Fill in business_date on bills and orders saved before it existed"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Recompute every row (after changing BUSINESS_DAY_CUTOFF_HOUR)",
+        )
+
+    def handle(self, *args, **options):
+        for model in (Bill, Order, OrderHistory):
+            rows = model.objects.all()
+            if not options["all"]:
+                rows = rows.filter(business_date__isnull=True)
+
+            updated = rows.update(business_date=business_date_expression())
+            self.stdout.write(f"{model._meta.verbose_name_plural}: {updated}")
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                "Done. Run rebuild_sales_rollups and rebuild_sales_facts next."
+            )
+        )
+
+
+# python manage.py backfill_business_dates
+# python manage.py backfill_business_dates --all
@@ -0,0 +1,87 @@
+import time
+from io import BytesIO
+
+from django.core.management.base import BaseCommand, CommandError
+
+from billing.models import Bill
+from orders.models import Recipe
+from utils.escpos import render_bill_escpos, render_kitchen_escpos
+from utils.pdf import draw_bill_pdf, draw_kitchen_pdf
+
+
+class Command(BaseCommand):
+    help = "Render the latest bill and kitchen slip repeatedly and report ms and bytes per receipt"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--count",
+            type=int,
+            default=1000,
+            help="Number of renders per receipt type",
+        )
+        parser.add_argument(
+            "--bill",
+            help="Bill number to render (default: latest bill)",
+        )
+
+    def handle(self, *args, **options):
+        bills = Bill.objects.order_by("-id")
+        if options["bill"]:
+            bills = bills.filter(bill_number=options["bill"])
+        bill = bills.first()
+        if bill is None:
+            raise CommandError("No bill to render")
+
+        # Load everything up front so only rendering is timed
+        bill_items = list(bill.items.select_related("item").all())
+        count = options["count"]
+
+        self._report(
+            "Bill PDF",
+            count,
+            lambda: self._pdf(draw_bill_pdf, bill=bill, items=bill_items),
+        )
+        self._report(
+            "Bill ESC/POS",
+            count,
+            lambda: render_bill_escpos(bill=bill, items=bill_items),
+        )
+
+        recipe = Recipe.objects.select_related("order__table").order_by("-id").first()
+        if recipe is None:
+            return
+
+        recipe_items = list(recipe.items.all())
+
+        self._report(
+            "KOT PDF",
+            count,
+            lambda: self._pdf(draw_kitchen_pdf, recipe=recipe, items=recipe_items),
+        )
+        self._report(
+            "KOT ESC/POS",
+            count,
+            lambda: render_kitchen_escpos(recipe=recipe, items=recipe_items),
+        )
+
+    @staticmethod
+    def _pdf(draw, **kwargs):
+        buffer = BytesIO()
+        draw(output=buffer, **kwargs)
+        return buffer.getvalue()
+
+    def _report(self, label, count, render):
+        total_bytes = 0
+        started = time.perf_counter()
+        for _ in range(count):
+            total_bytes += len(render())
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(
+            f"{label:<14} {elapsed * 1000 / count:8.3f} ms/receipt"
+            f" {total_bytes / count:10.0f} bytes/receipt"
+        )
+
+
+# python manage.py benchmark_receipts
+# python manage.py benchmark_receipts --count 1000 --bill 202601050001
@@ -0,0 +1,50 @@
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Max, Min
+
+from billing.models import Bill, PastCustomerName
+
+
+class Command(BaseCommand):
+    help = "Refill the checkout name autocomplete from the whole bill history"
+
+    def handle(self, *args, **options):
+        rows = (
+            Bill.objects.exclude(customer_name__isnull=True)
+            # "Table N" is the fallback for table bills without a name
+            .exclude(customer_name__startswith="Table ")
+            .values("customer_name")
+            .annotate(
+                bill_count=Count("id"),
+                first_used=Min("created_at"),
+                last_used=Max("created_at"),
+            )
+        )
+
+        # One row per name whatever the case, spelled as first used
+        names = {}
+        for row in rows.iterator():
+            name = " ".join(row["customer_name"].split())[:100]
+            if name.upper() in PastCustomerName.IGNORED:
+                continue
+            first = (row["first_used"], name)
+            past = names.setdefault(name.upper(), [first, 0, row["last_used"]])
+            past[0] = min(past[0], first)
+            past[1] += row["bill_count"]
+            past[2] = max(past[2], row["last_used"])
+
+        past_names = [
+            PastCustomerName(name=name, bill_count=bill_count, last_used=last_used)
+            for (_, name), bill_count, last_used in names.values()
+        ]
+
+        with transaction.atomic():
+            PastCustomerName.objects.all().delete()
+            PastCustomerName.objects.bulk_create(past_names, batch_size=1000)
+            transaction.on_commit(lambda: cache.delete(PastCustomerName.CACHE_KEY))
+
+        self.stdout.write(self.style.SUCCESS(f"{len(past_names)} names"))
+
+
+# python manage.py rebuild_past_customer_names
@@ -0,0 +1,51 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from billing.printing import process_pending_jobs
+from billing.rendering import process_render_jobs, requeue_stale_bills
+
+
+class Command(BaseCommand):
+    help = "Render unfinished bill / kitchen slip PDFs and send queued print jobs"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Process the current queue and exit",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=1.0,
+            help="Seconds to wait between polls",
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS("Print worker started"))
+
+        requeued = requeue_stale_bills()
+        if requeued:
+            self.stdout.write(f"Re-queued {requeued} bill PDF(s) left unrendered")
+
+        while True:
+            close_old_connections()
+            rendered = process_render_jobs()
+            if rendered:
+                self.stdout.write(f"Rendered {rendered} PDF job(s)")
+
+            attempted = process_pending_jobs()
+
+            if attempted:
+                self.stdout.write(f"Processed {attempted} print job(s)")
+
+            if options["once"]:
+                break
+
+            time.sleep(options["interval"])
+
+
+# python manage.py run_print_worker
+# python manage.py run_print_worker --once
@@ -1,10 +1,27 @@
-from decimal import ROUND_HALF_UP, Decimal
-
-from django.db import models
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import IntegrityError, models, transaction
+from django.db.models import (
+    DecimalField,
+    ExpressionWrapper,
+    F,
+    OuterRef,
+    Subquery,
+    Sum,
+    Value,
+)
+from django.db.models.functions import Coalesce, Greatest, Round, Upper
 from django.utils import timezone
 
+from core.business_day import business_date
 from home.models import Item
 
+from .pricing import totals_for_bill
+from .signals import bill_finalized
+
+MONEY = DecimalField(max_digits=12, decimal_places=2)
+
 
 class CafeConfig(models.Model):
     """
@@ -24,6 +41,118 @@ class CafeConfig(models.Model):
         verbose_name_plural = "Cafe Configuration"
 
 
+class BillSequence(models.Model):
+    """
+    One row per day holding the last bill number issued that day.
+    The row is locked by the increment, so two counters billing at the
+    same moment can never be handed the same number.
+    """
+
+    date = models.DateField(unique=True)
+    last_number = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.date} → {self.last_number}"
+
+    @classmethod
+    def next_number(cls, day) -> int:
+        """
+        Atomically allocate the next bill number for ``day``.
+        """
+        with transaction.atomic():
+            if not cls._increment(day):
+                try:
+                    with transaction.atomic():
+                        cls.objects.create(date=day, last_number=cls._seed(day) + 1)
+                except IntegrityError:
+                    # Another counter created the day's row first
+                    cls._increment(day)
+
+            return cls._current(day)
+
+    @classmethod
+    def _increment(cls, day) -> bool:
+        # UPDATE takes the row lock and holds it until the bill commits
+        return bool(
+            cls.objects.filter(date=day).update(last_number=F("last_number") + 1)
+        )
+
+    @classmethod
+    def _current(cls, day) -> int:
+        return cls.objects.filter(date=day).values_list("last_number", flat=True).get()
+
+    @staticmethod
+    def _seed(day) -> int:
+        """
+        Last number already used on ``day`` by bills created before the
+        sequence row existed.
+        """
+        last_bill = (
+            Bill.objects.filter(bill_number__startswith=day.strftime("%Y%m%d"))
+            .order_by("-bill_number")
+            .first()
+        )
+        return int(last_bill.bill_number[8:]) if last_bill else 0
+
+
+def _money(expression):
+    return ExpressionWrapper(expression, output_field=MONEY)
+
+
+class BillQuerySet(models.QuerySet):
+    def with_totals(self):
+        """
+        Annotate each bill with totals computed in the database from its
+        BillItems, following the same rules as ``pricing.compute_totals``.
+
+        Annotations are prefixed with ``calc_`` so they can be compared
+        against the stored columns.
+        """
+        line_subtotal = (
+            BillItem.objects.filter(bill=OuterRef("pk"))
+            .order_by()
+            .values("bill")
+            .annotate(total=Sum(_money(F("price") * F("quantity"))))
+            .values("total")
+        )
+
+        return (
+            self.annotate(
+                calc_subtotal=Coalesce(
+                    Subquery(line_subtotal, output_field=MONEY), Decimal("0.00")
+                ),
+            )
+            .annotate(
+                calc_taxable=Greatest(
+                    _money(F("calc_subtotal") - F("discount_amount")),
+                    Decimal("0.00"),
+                    output_field=MONEY,
+                ),
+            )
+            .annotate(
+                calc_cgst=Round(
+                    _money(F("calc_taxable") * F("gst_percentage") / Decimal("200")),
+                    2,
+                    output_field=MONEY,
+                ),
+            )
+            .annotate(calc_sgst=F("calc_cgst"))
+            .annotate(
+                calc_grand_total=Round(
+                    _money(F("calc_taxable") + F("calc_cgst") + F("calc_sgst")),
+                    0,
+                    output_field=MONEY,
+                ),
+            )
+            .annotate(
+                calc_round_off=_money(
+                    F("calc_grand_total")
+                    - (F("calc_taxable") + F("calc_cgst") + F("calc_sgst"))
+                ),
+            )
+        )
+
+
 class Bill(models.Model):
     """
     Represents a single customer bill / invoice.
@@ -71,8 +200,45 @@ class Bill(models.Model):
     discount_percent = models.DecimalField(max_digits=5, decimal_places=2, default=0)
 
     gst_percentage = models.DecimalField(max_digits=5, decimal_places=2)
+
+    # STORED TOTALS (written once by finalize())
+    subtotal = models.DecimalField(
+        max_digits=12, decimal_places=2, default=Decimal("0.00")
+    )
+    taxable = models.DecimalField(
+        max_digits=12, decimal_places=2, default=Decimal("0.00")
+    )
+    cgst = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal("0.00"))
+    sgst = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal("0.00"))
+    round_off = models.DecimalField(
+        max_digits=6, decimal_places=2, default=Decimal("0.00")
+    )
+    grand_total = models.DecimalField(
+        max_digits=12, decimal_places=2, default=Decimal("0.00")
+    )
+
+    class PdfStatus(models.TextChoices):
+        NONE = "NONE", "Not rendered"
+        QUEUED = "QUEUED", "Queued"
+        RENDERING = "RENDERING", "Rendering"
+        READY = "READY", "Ready"
+        FAILED = "FAILED", "Failed"
+
+    # Filled in by billing.rendering once the file exists on disk
     bill_pdf_path = models.CharField(max_length=255, blank=True, default="")
-    created_at = models.DateTimeField(default=timezone.now)
+    pdf_status = models.CharField(
+        max_length=10,
+        choices=PdfStatus.choices,
+        default=PdfStatus.NONE,
+    )
+    # SHA-256 of the stored file, served as its ETag
+    pdf_sha256 = models.CharField(max_length=64, blank=True, default="")
+    PDF_FIELDS = ("bill_pdf_path", "pdf_status", "pdf_sha256")
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+    # Trading day the bill counts towards (see core.business_day)
+    business_date = models.DateField(null=True, editable=False, db_index=True)
+
+    objects = BillQuerySet.as_manager()
 
     def __str__(self):
         return self.bill_number
@@ -80,42 +246,70 @@ class Bill(models.Model):
     # ---------- AUTO BILL NUMBER ----------
     def save(self, *args, **kwargs):
         if not self.bill_number:
-            curr_local_time = timezone.localtime(timezone.now())
-            date_str = curr_local_time.strftime("%Y%m%d")
-
-            last_bill = (
-                Bill.objects.filter(bill_number__startswith=date_str)
-                .order_by("-bill_number")
-                .first()
-            )
+            today = timezone.localdate()
+            new_seq = BillSequence.next_number(today)
 
-            if last_bill:
-                last_seq = int(last_bill.bill_number[-4:])
-                new_seq = last_seq + 1
-            else:
-                new_seq = 1
+            self.bill_number = f"{today.strftime('%Y%m%d')}{new_seq:04d}"
 
-            self.bill_number = f"{date_str}{new_seq:04d}"
+        if not self.business_date:
+            self.business_date = business_date(self.created_at)
 
         super().save(*args, **kwargs)
 
     # ---------- CALCULATIONS ----------
-    def subtotal(self):
-        return sum(item.line_total() for item in self.items.all())
+    def calculate_totals(self, items=None):
+        """
+        Compute the bill totals from its line items.
+        """
+        return totals_for_bill(self, items=items)
+
+    def finalize(self, items=None, created=False) -> bool:
+        """
+        Persist the computed totals on the bill.
+        Call once all BillItems and the discount are in place;
+        ``created=True`` at checkout, when the bill is finalized the
+        first time (running totals can then just add it).
+
+        Returns True if the totals changed; a PDF stored for the old
+        totals is then discarded.
+        """
+        changed = False
+        for field, value in self.calculate_totals(items=items).as_fields().items():
+            changed |= getattr(self, field) != value
+            setattr(self, field, value)
+
+        update_fields = None
+        if changed:
+            self.discard_pdf()
+        elif self.pk:
+            # Keep the PDF fields as billing.rendering last wrote them
+            update_fields = [
+                f.name
+                for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in self.PDF_FIELDS
+            ]
+        self.save(update_fields=update_fields)
+
+        bill_finalized.send(sender=Bill, bill=self, items=items, created=created)
+        return changed
+
+    def discard_pdf(self):
+        """
+        Forget the stored PDF (and its ETag) so the next request or
+        render job makes a new one. Call ``save()`` afterwards.
+        """
+        self.bill_pdf_path = ""
+        self.pdf_sha256 = ""
+        self.pdf_status = self.PdfStatus.NONE
 
     def gst_amount(self):
-        taxable_amount = self.subtotal() - self.discount_amount
-        if taxable_amount < 0:
-            taxable_amount = Decimal("0.00")
-        return taxable_amount * (self.gst_percentage / Decimal("100"))
+        return self.cgst + self.sgst
 
     def total_amount(self):
-        exact_total = self.subtotal() - self.discount_amount + self.gst_amount()
-        return exact_total.quantize(Decimal("1"), rounding=ROUND_HALF_UP)
+        return self.grand_total
 
     def round_off_diff(self):
-        exact = self.subtotal() - self.discount_amount + self.gst_amount()
-        return self.total_amount() - exact
+        return self.round_off
 
 
 class BillItem(models.Model):
@@ -144,3 +338,178 @@ class BillItem(models.Model):
 
     def __str__(self):
         return f"{self.item.name} ({self.size}) x {self.quantity}"
+
+
+class PrintJob(models.Model):
+    """
+    A file waiting to be printed.
+
+    Views only insert rows; the ``run_print_worker`` command picks them
+    up once the billing transaction has committed. Jobs for the same
+    printer are printed strictly in order.
+    """
+
+    class Status(models.TextChoices):
+        PENDING = "PENDING", "Pending"
+        DONE = "DONE", "Done"
+        DEAD = "DEAD", "Dead"
+
+    printer_name = models.CharField(max_length=100)
+    # Relative to MEDIA_ROOT
+    file_path = models.CharField(max_length=255)
+
+    status = models.CharField(
+        max_length=10,
+        choices=Status.choices,
+        default=Status.PENDING,
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True, default="")
+
+    created_at = models.DateTimeField(default=timezone.now)
+    printed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["id"]
+        indexes = [
+            models.Index(fields=["status", "printer_name", "id"]),
+        ]
+
+    def __str__(self):
+        return f"{self.printer_name}: {self.file_path} ({self.status})"
+
+
+class RenderJob(models.Model):
+    """
+    A bill PDF or a set of kitchen slips still to be rendered (and then
+    queued for printing).
+
+    Written in the same transaction as the bill or recipes, so the work
+    survives a restart: the render pool takes it straight after commit,
+    and ``run_print_worker`` picks up any job the pool did not finish.
+    """
+
+    class Kind(models.TextChoices):
+        BILL = "BILL", "Bill"
+        KOT = "KOT", "Kitchen slips"
+
+    class Status(models.TextChoices):
+        PENDING = "PENDING", "Pending"
+        DONE = "DONE", "Done"
+        DEAD = "DEAD", "Dead"
+
+    kind = models.CharField(max_length=10, choices=Kind.choices)
+    bill = models.ForeignKey(
+        Bill, on_delete=models.CASCADE, null=True, blank=True, related_name="+"
+    )
+    # KOT: [[recipe_id, [recipe_item_id, ...]], ...]
+    slips = models.JSONField(default=list, blank=True)
+    per_station = models.BooleanField(default=True)
+    # Blank: store the files, print nothing
+    printer_name = models.CharField(max_length=100, blank=True, default="")
+
+    status = models.CharField(
+        max_length=10,
+        choices=Status.choices,
+        default=Status.PENDING,
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True, default="")
+
+    created_at = models.DateTimeField(default=timezone.now)
+    rendered_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["id"]
+        indexes = [
+            models.Index(fields=["status", "next_attempt_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.id} ({self.status})"
+
+
+class PastCustomerName(models.Model):
+    """
+    Customer names typed at checkout, with how often and how recently
+    each was used; "asha" and "Asha" are one name, spelled as first
+    typed. Feeds the POS name autocomplete without scanning the bill
+    history; ``python manage.py rebuild_past_customer_names`` refills it
+    from the bills.
+    """
+
+    CACHE_KEY = "billing:past_customer_names"
+    # Placeholders, not names
+    IGNORED = frozenset({"", "GUEST"})
+    # A use this many days old counts half as much as one today
+    HALF_LIFE_DAYS = 30
+
+    name = models.CharField(max_length=100)
+    bill_count = models.PositiveIntegerField(default=0)
+    last_used = models.DateTimeField(db_index=True)
+
+    class Meta:
+        ordering = ["-last_used"]
+        constraints = [
+            models.UniqueConstraint(Upper("name"), name="unique_past_customer_name")
+        ]
+
+    def __str__(self):
+        return f"{self.name} ×{self.bill_count}"
+
+    @classmethod
+    def record(cls, name, at=None):
+        """
+        Count one more bill for ``name``. Safe under concurrent checkouts.
+        """
+        name = " ".join((name or "").split())[:100]
+        if name.upper() in cls.IGNORED:
+            return
+        at = at or timezone.now()
+
+        with transaction.atomic():
+            if not cls._bump(name, at):
+                try:
+                    with transaction.atomic():
+                        cls.objects.create(name=name, bill_count=1, last_used=at)
+                except IntegrityError:
+                    # Another counter added the name first
+                    cls._bump(name, at)
+
+        transaction.on_commit(lambda: cache.delete(cls.CACHE_KEY))
+
+    @classmethod
+    def _bump(cls, name, at) -> bool:
+        return bool(
+            cls.objects.alias(key=Upper("name"))
+            .filter(key=Upper(Value(name)))
+            .update(
+                bill_count=F("bill_count") + 1,
+                last_used=Greatest("last_used", Value(at)),
+            )
+        )
+
+    @classmethod
+    def ranked(cls, limit=100) -> list:
+        """
+        Top ``limit`` names by bill count, older uses fading with
+        ``HALF_LIFE_DAYS``. Only the most recently used rows are scored.
+        """
+        now = timezone.now()
+
+        def score(row):
+            age_days = (now - row.last_used).total_seconds() / 86400
+            return row.bill_count * 0.5 ** (age_days / cls.HALF_LIFE_DAYS)
+
+        recent = cls.objects.only("name", "bill_count", "last_used")[: limit * 5]
+        return [row.name for row in sorted(recent, key=score, reverse=True)[:limit]]
+
+    @classmethod
+    def cached_ranked(cls) -> list:
+        """
+        ``ranked()`` from the shared cache; ``record()`` clears it after
+        each bill commits, and it expires hourly so the decay moves on.
+        """
+        return cache.get_or_set(cls.CACHE_KEY, cls.ranked, 60 * 60)
@@ -0,0 +1,85 @@
+"""
+Bill pricing rules.
+
+One place that defines how a bill is totalled:
+subtotal → discount → taxable → CGST/SGST (half of GST each, 2 dp)
+→ grand total rounded to the nearest rupee (half up).
+
+``compute_totals`` works on already loaded values. The same rules are
+expressed as database expressions in ``BillQuerySet.with_totals()``.
+"""
+
+from dataclasses import asdict, dataclass
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Iterable, Tuple
+
+ZERO = Decimal("0.00")
+PAISA = Decimal("0.01")
+RUPEE = Decimal("1")
+
+
+@dataclass(frozen=True)
+class BillTotals:
+    subtotal: Decimal
+    taxable: Decimal
+    cgst: Decimal
+    sgst: Decimal
+    round_off: Decimal
+    grand_total: Decimal
+
+    @property
+    def gst(self) -> Decimal:
+        return self.cgst + self.sgst
+
+    def as_fields(self) -> dict:
+        """
+        Values keyed by the stored Bill field names.
+        """
+        return asdict(self)
+
+
+def compute_totals(
+    *,
+    lines: Iterable[Tuple[Decimal, int]],
+    discount_amount: Decimal,
+    gst_percentage: Decimal,
+) -> BillTotals:
+    """
+    Total a bill from (price, quantity) pairs.
+    """
+    subtotal = sum((price * quantity for price, quantity in lines), ZERO)
+
+    taxable = max(subtotal - (discount_amount or ZERO), ZERO)
+
+    # GST is split equally between CGST and SGST
+    cgst = (taxable * (gst_percentage or ZERO) / Decimal("200")).quantize(
+        PAISA, rounding=ROUND_HALF_UP
+    )
+    sgst = cgst
+
+    exact_total = taxable + cgst + sgst
+    grand_total = exact_total.quantize(RUPEE, rounding=ROUND_HALF_UP)
+
+    return BillTotals(
+        subtotal=subtotal,
+        taxable=taxable,
+        cgst=cgst,
+        sgst=sgst,
+        round_off=grand_total - exact_total,
+        grand_total=grand_total,
+    )
+
+
+def totals_for_bill(bill, items=None) -> BillTotals:
+    """
+    Total a loaded bill. Pass ``items`` when the BillItems are already
+    in memory to avoid another query.
+    """
+    if items is None:
+        items = bill.items.all()
+
+    return compute_totals(
+        lines=((item.price, item.quantity) for item in items),
+        discount_amount=bill.discount_amount,
+        gst_percentage=bill.gst_percentage,
+    )
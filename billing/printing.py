@@ -0,0 +1,263 @@
+"""
+Print spooler.
+
+``enqueue_print()`` is the only thing the request path calls: it adds a
+``PrintJob`` row inside the current transaction. The
+``run_print_worker`` management command sends committed jobs to the
+printer backend configured in ``settings.PRINTERS``.
+
+Jobs for one printer go out in FIFO order. A failing job is retried
+with exponential backoff and blocks the jobs queued behind it on that
+printer; after ``MAX_ATTEMPTS`` it is moved to the DEAD state so the
+queue can move on.
+
+A worker claims a job in a short transaction and prints after that
+commits, so a slow or offline printer holds no row locks.
+"""
+
+import logging
+import shutil
+import socket
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import PrintJob
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 5
+BACKOFF_BASE_SECONDS = 5
+BACKOFF_MAX_SECONDS = 300
+# A claimed job is left to its worker this long; if the worker dies
+# mid-print the job becomes due again afterwards
+CLAIM_SECONDS = 120
+
+DEFAULT_BACKEND = "billing.printing.WindowsShellBackend"
+
+FORMAT_PDF = "pdf"
+FORMAT_ESCPOS = "escpos"
+
+
+class PrinterError(Exception):
+    """Raised by a backend when a job could not be printed."""
+
+
+# ---------- BACKENDS ----------
+class WindowsShellBackend:
+    """
+    Prints through the Windows shell "printto" verb (the original
+    counter setup). Requires pywin32.
+    """
+
+    def __init__(self, printer_name):
+        self.printer_name = printer_name
+
+    def send(self, file_path: Path) -> None:
+        import win32api
+        import win32print
+
+        handle = win32print.OpenPrinter(self.printer_name)
+        try:
+            win32api.ShellExecute(
+                0, "printto", str(file_path), f'"{self.printer_name}"', ".", 0
+            )
+        finally:
+            win32print.ClosePrinter(handle)
+
+
+class WindowsRawBackend:
+    """
+    Hands the file to the Windows spooler as a RAW job, bypassing the
+    driver. Use with ``"FORMAT": "escpos"``. Requires pywin32.
+    """
+
+    def __init__(self, printer_name):
+        self.printer_name = printer_name
+
+    def send(self, file_path: Path) -> None:
+        import win32print
+
+        handle = win32print.OpenPrinter(self.printer_name)
+        try:
+            win32print.StartDocPrinter(handle, 1, (file_path.name, None, "RAW"))
+            try:
+                win32print.StartPagePrinter(handle)
+                win32print.WritePrinter(handle, file_path.read_bytes())
+                win32print.EndPagePrinter(handle)
+            finally:
+                win32print.EndDocPrinter(handle)
+        finally:
+            win32print.ClosePrinter(handle)
+
+
+class RawTcpBackend:
+    """
+    Streams the file unchanged to a network printer's raw port
+    (ESC/POS printers usually listen on 9100).
+    """
+
+    def __init__(self, printer_name, host, port=9100, timeout=5):
+        self.printer_name = printer_name
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+
+    def send(self, file_path: Path) -> None:
+        data = file_path.read_bytes()
+        with socket.create_connection(
+            (self.host, self.port), timeout=self.timeout
+        ) as conn:
+            conn.sendall(data)
+
+
+class FileSinkBackend:
+    """
+    Copies each job into a directory instead of printing.
+    Stand-in printer for development and tests.
+    """
+
+    def __init__(self, printer_name, directory):
+        self.printer_name = printer_name
+        self.directory = Path(directory)
+
+    def send(self, file_path: Path) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(file_path, self.directory / file_path.name)
+
+
+def _printer_config(printer_name):
+    return getattr(settings, "PRINTERS", {}).get(printer_name, {})
+
+
+def get_backend(printer_name):
+    """
+    Build the backend configured for ``printer_name`` in
+    ``settings.PRINTERS``.
+    """
+    config = _printer_config(printer_name)
+    backend_class = import_string(config.get("BACKEND", DEFAULT_BACKEND))
+    return backend_class(printer_name, **config.get("OPTIONS", {}))
+
+
+def printer_format(printer_name) -> str:
+    """
+    What the printer is fed: ``"pdf"`` (default) or ``"escpos"`` for
+    raw ESC/POS tickets.
+    """
+    return _printer_config(printer_name).get("FORMAT", FORMAT_PDF)
+
+
+# ---------- QUEUE ----------
+def enqueue_print(*, file_relative_path: str, printer_name: str) -> PrintJob:
+    """
+    Queue a file under MEDIA_ROOT for printing.
+    """
+    return PrintJob.objects.create(
+        printer_name=printer_name,
+        file_path=file_relative_path,
+    )
+
+
+def _backoff(attempts: int) -> timedelta:
+    seconds = BACKOFF_BASE_SECONDS * 2 ** (attempts - 1)
+    return timedelta(seconds=min(seconds, BACKOFF_MAX_SECONDS))
+
+
+def _print_job(job: PrintJob) -> None:
+    file_path = Path(settings.MEDIA_ROOT) / job.file_path
+    if not file_path.exists():
+        raise PrinterError(f"File not found: {file_path}")
+
+    try:
+        get_backend(job.printer_name).send(file_path)
+    except PrinterError:
+        raise
+    except Exception as exc:
+        raise PrinterError(str(exc)) from exc
+
+
+def _claim(printer_name: str, now):
+    """
+    Take the head of one printer's queue, if it is due, and commit the
+    claim so the printer I/O runs outside any transaction.
+    """
+    head_id = (
+        PrintJob.objects.filter(
+            printer_name=printer_name, status=PrintJob.Status.PENDING
+        )
+        .order_by("id")
+        .values_list("id", flat=True)
+        .first()
+    )
+    if head_id is None:
+        return None
+
+    with transaction.atomic():
+        job = (
+            PrintJob.objects.select_for_update(skip_locked=True)
+            .filter(id=head_id, status=PrintJob.Status.PENDING)
+            .first()
+        )
+
+        # Head of the queue is taken by another worker or still backing off
+        if job is None or job.next_attempt_at > now:
+            return None
+
+        job.attempts += 1
+        job.next_attempt_at = now + timedelta(seconds=CLAIM_SECONDS)
+        job.save(update_fields=["attempts", "next_attempt_at"])
+
+    return job
+
+
+def process_printer_queue(printer_name: str) -> bool:
+    """
+    Try the oldest pending job of one printer.
+    Returns True if a job was attempted.
+    """
+    now = timezone.now()
+    job = _claim(printer_name, now)
+    if job is None:
+        return False
+
+    try:
+        _print_job(job)
+    except PrinterError as exc:
+        job.last_error = str(exc)
+        if job.attempts >= MAX_ATTEMPTS:
+            job.status = PrintJob.Status.DEAD
+            logger.error("Print job %s moved to dead letter: %s", job.id, exc)
+        else:
+            job.next_attempt_at = now + _backoff(job.attempts)
+            logger.warning("Print job %s failed, will retry: %s", job.id, exc)
+    else:
+        job.status = PrintJob.Status.DONE
+        job.printed_at = timezone.now()
+        job.last_error = ""
+
+    job.save(update_fields=["status", "next_attempt_at", "last_error", "printed_at"])
+    return True
+
+
+def process_pending_jobs() -> int:
+    """
+    One pass over every printer with pending jobs.
+    Returns the number of jobs attempted.
+    """
+    printers = (
+        PrintJob.objects.filter(status=PrintJob.Status.PENDING)
+        .values_list("printer_name", flat=True)
+        .distinct()
+        .order_by()
+    )
+
+    attempted = 0
+    for printer_name in list(printers):
+        while process_printer_queue(printer_name):
+            attempted += 1
+    return attempted
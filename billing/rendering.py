@@ -0,0 +1,320 @@
+"""
+Background PDF rendering for bills and kitchen slips.
+
+Views call ``schedule_bill_pdf()`` / ``schedule_kot_pdfs()`` inside the
+billing transaction. They only add a ``RenderJob`` row; once the
+transaction commits, the job runs on a small thread pool so the request
+can return as soon as the data is saved.
+
+The row is what makes the work durable. A job the pool never finished
+(process restarted, render failed) is retried by ``run_print_worker``
+through ``process_render_jobs()``. A job is claimed before it runs, so
+the pool and the worker never render the same one twice, and the
+rendered files are queued for printing in the same transaction that
+marks the job done.
+
+Progress is tracked on ``Bill.pdf_status``. ``Bill.bill_pdf_path`` is
+only set once the file is stored (see ``utils.pdf_store``).
+
+The PDF is always kept for the archive. Printers configured with
+``"FORMAT": "escpos"`` are sent an ESC/POS ticket (``.bin``) instead.
+"""
+
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from io import BytesIO
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from orders.models import Recipe, RecipeItem
+from utils.escpos import render_bill_escpos, render_kitchen_escpos
+from utils.pdf import draw_bill_pdf, draw_kitchen_slips_pdf
+from utils.pdf_store import open_stored, store_file
+
+from .models import Bill, RenderJob
+from .printing import FORMAT_ESCPOS, _backoff, enqueue_print, printer_format
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 5
+# The worker leaves fresh jobs to the pool for this long
+POOL_GRACE_SECONDS = 30
+# A claimed job is left to whoever claimed it this long
+CLAIM_SECONDS = 120
+
+_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, "PDF_RENDER_WORKERS", 2),
+    thread_name_prefix="pdf-render",
+)
+
+
+def _render_pdf(draw, **kwargs) -> bytes:
+    buffer = BytesIO()
+    draw(output=buffer, **kwargs)
+    return buffer.getvalue()
+
+
+def _enqueue(*, pdf_path, day, printer_name, render_ticket):
+    """
+    Queue the PDF, or an ESC/POS ticket stored next to it if that is
+    what the printer takes.
+    """
+    file_path = pdf_path
+    if printer_format(printer_name) == FORMAT_ESCPOS:
+        file_path = store_file(render_ticket(), day=day, suffix=".bin").path
+
+    enqueue_print(file_relative_path=file_path, printer_name=printer_name)
+
+
+def _run_in_pool(job_id):
+    def task():
+        close_old_connections()
+        try:
+            job = _claim(job_id=job_id)
+            if job is not None:
+                run_render_job(job)
+        except Exception:
+            logger.exception("PDF rendering failed")
+        finally:
+            close_old_connections()
+
+    _executor.submit(task)
+
+
+def _schedule(**fields) -> RenderJob:
+    job = RenderJob.objects.create(
+        next_attempt_at=timezone.now() + timedelta(seconds=POOL_GRACE_SECONDS),
+        **fields,
+    )
+    transaction.on_commit(lambda: _run_in_pool(job.id))
+    return job
+
+
+# ---------- JOBS ----------
+def _claim(*, job_id=None, now=None):
+    """
+    Take one pending job and commit the claim. With ``job_id``, that
+    job if nobody has tried it yet (the pool, right after commit);
+    otherwise the oldest job that is due (the worker).
+    """
+    now = now or timezone.now()
+
+    with transaction.atomic():
+        jobs = RenderJob.objects.select_for_update(skip_locked=True).filter(
+            status=RenderJob.Status.PENDING
+        )
+        if job_id is not None:
+            job = jobs.filter(id=job_id, attempts=0).first()
+        else:
+            job = jobs.filter(next_attempt_at__lte=now).order_by("id").first()
+        if job is None:
+            return None
+
+        job.attempts += 1
+        job.next_attempt_at = now + timedelta(seconds=CLAIM_SECONDS)
+        job.save(update_fields=["attempts", "next_attempt_at"])
+
+        if job.kind == RenderJob.Kind.BILL:
+            Bill.objects.filter(id=job.bill_id).update(
+                pdf_status=Bill.PdfStatus.RENDERING
+            )
+
+    return job
+
+
+def run_render_job(job) -> None:
+    """
+    Render a claimed job; on failure leave it for a retry, or DEAD
+    after ``MAX_ATTEMPTS``.
+    """
+    try:
+        with transaction.atomic():
+            if job.kind == RenderJob.Kind.BILL:
+                render_bill_pdf(job.bill_id, job.printer_name)
+            else:
+                render_kot_pdfs(job.slips, job.printer_name, job.per_station)
+
+            job.status = RenderJob.Status.DONE
+            job.rendered_at = timezone.now()
+            job.last_error = ""
+            job.save(update_fields=["status", "rendered_at", "last_error"])
+    except Exception as exc:
+        job.last_error = str(exc) or exc.__class__.__name__
+        if job.attempts >= MAX_ATTEMPTS:
+            job.status = RenderJob.Status.DEAD
+            pdf_status = Bill.PdfStatus.FAILED
+            logger.exception("Render job %s moved to dead letter", job.id)
+        else:
+            job.next_attempt_at = timezone.now() + _backoff(job.attempts)
+            pdf_status = Bill.PdfStatus.QUEUED
+            logger.exception("Render job %s failed, will retry", job.id)
+        job.save(update_fields=["status", "next_attempt_at", "last_error"])
+
+        if job.kind == RenderJob.Kind.BILL:
+            Bill.objects.filter(id=job.bill_id).update(pdf_status=pdf_status)
+
+
+def process_render_jobs() -> int:
+    """
+    Run every due render job. Returns the number attempted.
+    """
+    attempted = 0
+    while (job := _claim()) is not None:
+        run_render_job(job)
+        attempted += 1
+    return attempted
+
+
+def requeue_stale_bills() -> int:
+    """
+    Give a render job to bills left QUEUED / RENDERING without one
+    (scheduled before render jobs were kept). Only the PDF is made:
+    which printer they were meant for is not known.
+    """
+    pending = RenderJob.objects.filter(
+        kind=RenderJob.Kind.BILL, status=RenderJob.Status.PENDING
+    ).values("bill_id")
+    stale = Bill.objects.filter(
+        pdf_status__in=[Bill.PdfStatus.QUEUED, Bill.PdfStatus.RENDERING]
+    ).exclude(id__in=pending)
+
+    jobs = RenderJob.objects.bulk_create(
+        RenderJob(kind=RenderJob.Kind.BILL, bill_id=bill_id)
+        for bill_id in stale.values_list("id", flat=True)
+    )
+    return len(jobs)
+
+
+# ---------- BILL ----------
+def schedule_bill_pdf(bill, *, printer_name=None) -> None:
+    """
+    Render the bill PDF after commit, then queue it for printing.
+    """
+    bill.pdf_status = Bill.PdfStatus.QUEUED
+    bill.save(update_fields=["pdf_status"])
+
+    _schedule(kind=RenderJob.Kind.BILL, bill=bill, printer_name=printer_name or "")
+
+
+def render_bill_pdf(bill_id, printer_name=None) -> None:
+    bill = Bill.objects.get(id=bill_id)
+    items = list(bill.items.select_related("item").all())
+    _store_bill_pdf(bill, items=items)
+
+    if printer_name:
+        _enqueue(
+            pdf_path=bill.bill_pdf_path,
+            day=timezone.localdate(bill.created_at),
+            printer_name=printer_name,
+            render_ticket=lambda: render_bill_escpos(bill=bill, items=items),
+        )
+
+
+def ensure_bill_pdf(bill) -> None:
+    """
+    Make sure a PDF is stored for the bill and ``bill.pdf_sha256`` is
+    filled in, rendering it if needed.
+    """
+    if bill.bill_pdf_path:
+        try:
+            file, _ = open_stored(bill.bill_pdf_path)
+        except FileNotFoundError:
+            pass
+        else:
+            with file:
+                if not bill.pdf_sha256:
+                    # Stored before hashes were kept
+                    bill.pdf_sha256 = hashlib.sha256(file.read()).hexdigest()
+                    Bill.objects.filter(id=bill.id).update(pdf_sha256=bill.pdf_sha256)
+            return
+
+    _store_bill_pdf(bill)
+
+
+def open_bill_pdf(bill):
+    """
+    Open the stored bill PDF (from disk or the month archive).
+    Returns ``(file, size)``.
+    """
+    try:
+        return open_stored(bill.bill_pdf_path)
+    except FileNotFoundError:
+        # Lost file: renders are deterministic, so the hash is unchanged
+        _store_bill_pdf(bill)
+        return open_stored(bill.bill_pdf_path)
+
+
+def _store_bill_pdf(bill, items=None) -> None:
+    stored = store_file(
+        _render_pdf(draw_bill_pdf, bill=bill, items=items),
+        day=timezone.localdate(bill.created_at),
+    )
+
+    bill.bill_pdf_path = stored.path
+    bill.pdf_sha256 = stored.sha256
+    bill.pdf_status = Bill.PdfStatus.READY
+    Bill.objects.filter(id=bill.id).update(
+        bill_pdf_path=bill.bill_pdf_path,
+        pdf_sha256=bill.pdf_sha256,
+        pdf_status=bill.pdf_status,
+    )
+
+
+# ---------- KITCHEN SLIP ----------
+def schedule_kot_pdfs(recipes_with_items, *, printer_name=None, per_station=True):
+    """
+    Render the kitchen slips of one order after commit, as one job,
+    then queue them for printing.
+
+    ``per_station`` queues one file per station; otherwise every
+    station goes on one canvas as a single job.
+    """
+    slips = [
+        [recipe.id, [item.id for item in recipe_items]]
+        for recipe, recipe_items in recipes_with_items
+    ]
+    if not slips:
+        return
+
+    _schedule(
+        kind=RenderJob.Kind.KOT,
+        slips=slips,
+        per_station=per_station,
+        printer_name=printer_name or "",
+    )
+
+
+def render_kot_pdfs(slips, printer_name=None, per_station=True) -> None:
+    item_ids = [item_id for _, ids in slips for item_id in ids]
+
+    recipes = Recipe.objects.select_related("order__table").in_bulk(
+        [recipe_id for recipe_id, _ in slips]
+    )
+    items = {}
+    for item in RecipeItem.objects.filter(id__in=item_ids):
+        items.setdefault(item.recipe_id, []).append(item)
+
+    loaded = [(recipes[recipe_id], items.get(recipe_id, [])) for recipe_id, _ in slips]
+    jobs = [[slip] for slip in loaded] if per_station else [loaded]
+
+    for job_slips in jobs:
+        day = timezone.localdate(job_slips[0][0].created_at)
+        stored = store_file(
+            _render_pdf(draw_kitchen_slips_pdf, slips=job_slips),
+            day=day,
+        )
+
+        if printer_name:
+            _enqueue(
+                pdf_path=stored.path,
+                day=day,
+                printer_name=printer_name,
+                render_ticket=lambda job_slips=job_slips: b"".join(
+                    render_kitchen_escpos(recipe=recipe, items=recipe_items)
+                    for recipe, recipe_items in job_slips
+                ),
+            )
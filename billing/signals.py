@@ -0,0 +1,8 @@
+from django.dispatch import Signal
+
+# Sent by Bill.finalize() inside the billing transaction, once the
+# stored totals are saved. Receivers get ``bill`` and ``items`` (the
+# BillItems used for the totals, or None if they were read from the DB)
+# and ``created`` (True the first time, at checkout; False when an
+# edited bill is finalized again).
+bill_finalized = Signal()
@@ -1 +1,827 @@
-# Create your tests here.
+import json
+import shutil
+import tempfile
+import threading
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+from zoneinfo import ZoneInfo
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from billing import rendering
+from billing.models import (
+    Bill,
+    BillItem,
+    BillSequence,
+    PastCustomerName,
+    PrintJob,
+    RenderJob,
+)
+from billing.pricing import totals_for_bill
+from billing.printing import (
+    BACKOFF_BASE_SECONDS,
+    MAX_ATTEMPTS,
+    _claim,
+    enqueue_print,
+    process_pending_jobs,
+    process_printer_queue,
+)
+from home.catalog import bump_catalog_version
+from home.models import Category, Item, ItemSize
+from orders.models import Order, Recipe, RecipeItem, Table
+from utils.escpos import Ticket, render_bill_escpos, render_kitchen_escpos
+from utils.pdf_store import open_stored, store_file
+
+AT = datetime(2026, 1, 5, 14, 30, tzinfo=ZoneInfo("Asia/Kolkata"))
+
+RESET = b"\x1b@\x1bt\x13"
+RULE = b"-" * 48 + b"\n"
+BOLD_ON, BOLD_OFF = b"\x1bE\x01", b"\x1bE\x00"
+NORMAL, TALL, BIG = b"\x1d!\x00", b"\x1d!\x01", b"\x1d!\x11"
+LEFT, CENTER = b"\x1ba\x00", b"\x1ba\x01"
+FEED_CUT = b"\x1bd\x03\x1dVB\x00"
+
+
+class TicketTests(SimpleTestCase):
+    def test_commands(self):
+        t = Ticket()
+        t.bold().size(double_height=True, double_width=True).align(1)
+        t.feed(2).cut()
+
+        self.assertEqual(
+            t.getvalue(),
+            RESET + BOLD_ON + BIG + CENTER + b"\x1bd\x02" + b"\x1dVB\x00",
+        )
+
+    def test_pair_fills_the_line(self):
+        t = Ticket()
+        t.pair("Sub-Total:", "590.00", indent=10)
+
+        self.assertEqual(
+            t.getvalue(), RESET + b" " * 10 + b"Sub-Total:" + b" " * 22 + b"590.00\n"
+        )
+
+    def test_double_width_halves_columns(self):
+        t = Ticket().size(double_width=True)
+        t.rule()
+
+        self.assertEqual(t.getvalue(), RESET + b"\x1d!\x10" + b"-" * 24 + b"\n")
+
+    def test_wrapped_keeps_hanging_indent(self):
+        t = Ticket(width=16)
+        t.wrapped("PANEER BUTTER MASALA", indent="2 x ")
+
+        self.assertEqual(t.getvalue(), RESET + b"2 x PANEER\n    BUTTER\n    MASALA\n")
+
+    def test_unencodable_text_is_replaced(self):
+        t = Ticket().line("चाय ₹")
+
+        self.assertEqual(t.getvalue(), RESET + b"??? ?\n")
+
+
+class KitchenTicketTests(SimpleTestCase):
+    def test_golden(self):
+        recipe = Recipe(
+            order=Order(id=7, table=Table(number="4")),
+            station="KITCHEN",
+            created_at=AT,
+        )
+        items = [
+            RecipeItem(item_name="Paneer Tikka", quantity=2, notes="less spicy"),
+            RecipeItem(item_name="Cold Coffee", quantity=1, size="L", notes=""),
+        ]
+
+        expected = (
+            RESET
+            + CENTER
+            + BOLD_ON
+            + BIG
+            + b"KITCHEN SLIP\n"
+            + TALL
+            + b"STATION: KITCHEN\n"
+            + NORMAL
+            + BOLD_OFF
+            + b"TABLE 4 | KOT 7 | 02:30 PM\n"
+            + LEFT
+            + RULE
+            + BOLD_ON
+            + TALL
+            + b"2 x PANEER TIKKA\n"
+            + NORMAL
+            + b"  >> less spicy\n"
+            + BOLD_OFF
+            + RULE
+            + BOLD_ON
+            + TALL
+            + b"1 x COLD COFFEE (L)\n"
+            + NORMAL
+            + BOLD_OFF
+            + RULE
+            + FEED_CUT
+        )
+
+        self.assertEqual(render_kitchen_escpos(recipe=recipe, items=items), expected)
+
+    def test_takeaway(self):
+        recipe = Recipe(order=Order(id=9), station="BARISTA", created_at=AT)
+
+        ticket = render_kitchen_escpos(recipe=recipe, items=[])
+
+        self.assertIn(b"TABLE TAKEAWAY | KOT 9 | 02:30 PM\n", ticket)
+
+
+class BillTicketTests(SimpleTestCase):
+    def make_bill(self, **kwargs):
+        bill = Bill(
+            bill_number="202601050001",
+            customer_name="Asha",
+            gst_percentage=Decimal("5.00"),
+            created_at=AT,
+            **kwargs,
+        )
+        items = [
+            BillItem(
+                item=Item(name="Paneer Tikka"),
+                size="M",
+                price=Decimal("220.00"),
+                quantity=2,
+            ),
+            BillItem(
+                item=Item(name="Cold Coffee"),
+                size="L",
+                price=Decimal("150.00"),
+                quantity=1,
+            ),
+        ]
+        return bill, items
+
+    def test_golden(self):
+        bill, items = self.make_bill()
+
+        expected = (
+            RESET
+            + CENTER
+            + BOLD_ON
+            + BIG
+            + b"MAHAKAAL THEMES CAFE\n"
+            + NORMAL
+            + BOLD_OFF
+            + b"Plot 92, Lakhuja Heights, Bhilwara\n"
+            + b"GST: 08MAQPS9885M1ZX | 9530301414\n"
+            + LEFT
+            + RULE
+            + BOLD_ON
+            + b"BILL: 202601050001\n"
+            + BOLD_OFF
+            + b"DATE: 05/01/26 02:30PM\n"
+            + b"CUST: Asha\n"
+            + BOLD_ON
+            + b"ITEM DESCRIPTION" + b" " * 27 + b"PRICE\n"
+            + BOLD_OFF
+            + RULE
+            + BOLD_ON
+            + b"PANEER TIKKA (M)" + b" " * 26 + b"440.00\n"
+            + BOLD_OFF
+            + b"  2 x 220.00\n"
+            + BOLD_ON
+            + b"COLD COFFEE (L)" + b" " * 27 + b"150.00\n"
+            + BOLD_OFF
+            + b"  1 x 150.00\n"
+            + RULE
+            + b" " * 10 + b"Sub-Total:" + b" " * 22 + b"590.00\n"
+            + b" " * 10 + b"CGST 2.50%:" + b" " * 22 + b"14.75\n"
+            + b" " * 10 + b"SGST 2.50%:" + b" " * 22 + b"14.75\n"
+            + b"\x1bd\x01"
+            + BOLD_ON
+            + TALL
+            + b" " * 4 + b"GRAND TOTAL:" + b" " * 24 + b"Rs 620/-\n"
+            + NORMAL
+            + b"\x1bd\x01"
+            + CENTER
+            + b"THANK YOU! VISIT AGAIN\n"
+            + BOLD_OFF
+            + LEFT
+            + FEED_CUT
+        )  # fmt: skip
+
+        self.assertEqual(render_bill_escpos(bill=bill, items=items), expected)
+
+    def test_discount_row(self):
+        bill, items = self.make_bill(discount_amount=Decimal("90.00"))
+
+        ticket = render_bill_escpos(bill=bill, items=items)
+
+        self.assertIn(b"Discount:" + b" " * 23 + b"-90.00\n", ticket)
+        self.assertIn(b"Rs 525/-\n", ticket)
+
+
+class WithTotalsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Coffee")
+        cls.latte = Item.objects.create(category=category, name="Latte")
+
+    def make_bill(self, lines, discount="0", gst="5.00"):
+        bill = Bill.objects.create(
+            customer_name="Asha",
+            customer_phone="9999999999",
+            discount_amount=Decimal(discount),
+            gst_percentage=Decimal(gst),
+        )
+        items = BillItem.objects.bulk_create(
+            BillItem(bill=bill, item=self.latte, price=Decimal(price), quantity=qty)
+            for price, qty in lines
+        )
+        bill.finalize(items=items)
+        return bill
+
+    def test_sql_matches_python(self):
+        bills = [
+            self.make_bill([("220.00", 2), ("150.00", 1)]),
+            self.make_bill([("220.00", 2), ("150.00", 1)], discount="59.00"),
+            # CGST of exactly half a paisa, grand total of exactly x.50
+            self.make_bill([("0.20", 1)]),
+            self.make_bill([("10.00", 1)]),
+            self.make_bill([("99.90", 3)], discount="33.30", gst="18.00"),
+            # Discount larger than the subtotal
+            self.make_bill([("50.00", 1)], discount="80.00"),
+            self.make_bill([]),
+        ]
+
+        annotated = Bill.objects.with_totals().in_bulk([b.id for b in bills])
+        for bill in bills:
+            with self.subTest(bill=bill.bill_number):
+                row = annotated[bill.id]
+                expected = totals_for_bill(bill)
+                self.assertEqual(
+                    {
+                        field: getattr(row, f"calc_{field}")
+                        for field in expected.as_fields()
+                    },
+                    expected.as_fields(),
+                )
+
+    def test_admin_list_query_count_is_flat(self):
+        admin = User.objects.create_superuser("admin", "a@a.com", "pw")
+        self.client.force_login(admin)
+        url = reverse("admin:billing_bill_changelist")
+
+        self.make_bill([("220.00", 2)])
+        with CaptureQueriesContext(connection) as one_bill:
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+        for _ in range(10):
+            self.make_bill([("220.00", 2), ("150.00", 1)], discount="20.00")
+        # Totals are stored columns: no per-row item or total queries
+        with self.assertNumQueries(len(one_bill)):
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+
+class CheckoutQueryCountTests(TestCase):
+    """
+    Prices come from the catalog and lines are bulk-created: a checkout
+    runs as many queries for 15 lines as for one.
+    """
+
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            category = Category.objects.create(name="Coffee")
+            self.items = Item.objects.bulk_create(
+                Item(category=category, name=f"Coffee {n}") for n in range(15)
+            )
+            ItemSize.objects.bulk_create(
+                ItemSize(item=item, size="M", price=Decimal("100"))
+                for item in self.items
+            )
+            # bulk_create sends no post_save
+            bump_catalog_version()
+        self.table = Table.objects.create(number="T1")
+
+        staff = User.objects.create_user("staff", password="pw", is_staff=True)
+        self.client.force_login(staff)
+
+    def counter_cart(self, lines):
+        return json.dumps(
+            {
+                str(item.id): {"item_id": item.id, "size": "M", "qty": 2}
+                for item in self.items[:lines]
+            }
+        )
+
+    def table_cart(self, lines):
+        return json.dumps(
+            {
+                str(item.id): {"id": item.id, "size": "M", "qty": 2}
+                for item in self.items[:lines]
+            }
+        )
+
+    def assertFlat(self, post):
+        # The day's first bill also creates its sequence and rollup rows
+        post(1)
+        with CaptureQueriesContext(connection) as one_line:
+            post(1)
+        with self.assertNumQueries(len(one_line)):
+            post(15)
+
+    def test_create_bill(self):
+        def post(lines):
+            response = self.client.post(
+                reverse("billing:create_bill"),
+                {
+                    "customer_name": "Asha",
+                    "customer_phone": "9876543210",
+                    "payment_mode": "CASH",
+                    "items_payload": self.counter_cart(lines),
+                },
+            )
+            self.assertEqual(response.status_code, 200)
+
+        self.assertFlat(post)
+        self.assertEqual(
+            Bill.objects.order_by("-id").first().subtotal, Decimal("3000.00")
+        )
+
+    def test_table_kot_and_bill(self):
+        def post(lines):
+            url = reverse("billing:table_order")
+            for action_type in ("KOT", "BILL"):
+                response = self.client.post(
+                    url,
+                    {
+                        "table_id": self.table.id,
+                        "action_type": action_type,
+                        "customer_name": "Asha",
+                        "customer_phone": "9876543210",
+                        "payment_mode": "UPI",
+                        "items_payload": self.table_cart(lines),
+                    },
+                )
+                self.assertEqual(response.status_code, 302)
+
+        self.assertFlat(post)
+        # Served items plus the same lines added at the bill
+        self.assertEqual(Bill.objects.order_by("-id").first().items.count(), 2 * 15)
+
+
+class PastCustomerNameTests(TestCase):
+    def setUp(self):
+        cache.delete(PastCustomerName.CACHE_KEY)
+        self.now = timezone.now()
+
+    def record(self, name, days_ago=0):
+        with self.captureOnCommitCallbacks(execute=True):
+            PastCustomerName.record(name, at=self.now - timedelta(days=days_ago))
+
+    def test_ranked_by_use_fading_with_age(self):
+        for _ in range(3):
+            self.record("Ravi", days_ago=90)
+        for _ in range(2):
+            self.record("Asha", days_ago=1)
+        self.record("Meena")
+        self.record("Kiran", days_ago=200)
+
+        # Ravi: 3 uses three half-lives ago score below one use today
+        self.assertEqual(PastCustomerName.ranked(), ["Asha", "Meena", "Ravi", "Kiran"])
+        self.assertEqual(PastCustomerName.ranked(limit=2), ["Asha", "Meena"])
+
+    def test_same_name_in_any_case_is_one_row(self):
+        self.record("asha  s", days_ago=2)
+        self.record("Asha S")
+        self.record(" ASHA S ", days_ago=1)
+        # Placeholders are not names
+        self.record("Guest")
+        self.record("  ")
+
+        past = PastCustomerName.objects.get()
+        self.assertEqual(past.name, "asha s")
+        self.assertEqual(past.bill_count, 3)
+        self.assertEqual(past.last_used, self.now)
+
+    def test_record_clears_the_cached_list(self):
+        self.record("Asha")
+        self.assertEqual(PastCustomerName.cached_ranked(), ["Asha"])
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            PastCustomerName.record("Ravi")
+            PastCustomerName.record("Ravi")
+            # Cleared only once the bill commits
+            self.assertEqual(PastCustomerName.cached_ranked(), ["Asha"])
+        for callback in callbacks:
+            callback()
+
+        self.assertEqual(PastCustomerName.cached_ranked(), ["Ravi", "Asha"])
+
+    def test_rebuild_from_bills(self):
+        for name, days_ago in [("asha", 5), ("Asha", 1), ("Table 4", 0), ("", 0)]:
+            Bill.objects.create(
+                customer_name=name,
+                customer_phone="9999999999",
+                gst_percentage=Decimal("5.00"),
+                created_at=self.now - timedelta(days=days_ago),
+            )
+        self.record("Old Name")
+
+        call_command("rebuild_past_customer_names", stdout=StringIO())
+
+        self.assertEqual(
+            list(PastCustomerName.objects.values_list("name", "bill_count")),
+            [("asha", 2)],
+        )
+
+    def test_json_endpoint(self):
+        self.record("Asha")
+        staff = User.objects.create_user("staff", password="pw", is_staff=True)
+        self.client.force_login(staff)
+
+        response = self.client.get(reverse("billing:api_past_customers"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"names": ["Asha"]})
+        self.assertIn("private", response["Cache-Control"])
+        self.assertIn("max-age=60", response["Cache-Control"])
+
+
+class BillSequenceConcurrencyTests(TransactionTestCase):
+    THREADS = 10
+    BILLS_PER_THREAD = 20
+
+    def test_parallel_bills_get_contiguous_numbers(self):
+        start = threading.Barrier(self.THREADS)
+        errors = []
+
+        def counter():
+            try:
+                start.wait()
+                for _ in range(self.BILLS_PER_THREAD):
+                    Bill.objects.create(
+                        customer_name="Asha",
+                        customer_phone="9999999999",
+                        gst_percentage=Decimal("5.00"),
+                    )
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        # All threads race for the day's first number, before its row exists
+        threads = [threading.Thread(target=counter) for _ in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        total = self.THREADS * self.BILLS_PER_THREAD
+        prefix = timezone.localdate().strftime("%Y%m%d")
+        self.assertEqual(
+            sorted(Bill.objects.values_list("bill_number", flat=True)),
+            [f"{prefix}{n:04d}" for n in range(1, total + 1)],
+        )
+        self.assertEqual(
+            BillSequence.objects.get(date=timezone.localdate()).last_number, total
+        )
+
+
+class FailingBackend:
+    def __init__(self, printer_name):
+        pass
+
+    def send(self, file_path):
+        raise OSError("Printer offline")
+
+
+class SpoolerTestCase(TestCase):
+    """
+    Empty MEDIA_ROOT, a file-sink COUNTER printer and an OFFLINE one.
+    """
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.sink = Path(tempfile.mkdtemp())
+        for directory in (media_root, self.sink):
+            self.addCleanup(shutil.rmtree, directory)
+        self.media_root = Path(media_root)
+
+        settings = self.settings(
+            MEDIA_ROOT=media_root,
+            PRINTERS={
+                "COUNTER": {
+                    "BACKEND": "billing.printing.FileSinkBackend",
+                    "OPTIONS": {"directory": str(self.sink)},
+                },
+                "OFFLINE": {"BACKEND": "billing.tests.FailingBackend"},
+            },
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+
+class PrintQueueTests(SpoolerTestCase):
+    def enqueue(self, name, printer_name="COUNTER"):
+        (self.media_root / name).write_bytes(name.encode())
+        return enqueue_print(file_relative_path=name, printer_name=printer_name)
+
+    def make_due(self, job):
+        PrintJob.objects.filter(id=job.id).update(next_attempt_at=timezone.now())
+
+    def test_prints_in_order(self):
+        first, second = self.enqueue("a.pdf"), self.enqueue("b.pdf")
+
+        self.assertEqual(process_pending_jobs(), 2)
+
+        for job in (first, second):
+            job.refresh_from_db()
+            self.assertEqual(job.status, PrintJob.Status.DONE)
+            self.assertEqual(job.attempts, 1)
+            self.assertIsNotNone(job.printed_at)
+        self.assertEqual((self.sink / "b.pdf").read_bytes(), b"b.pdf")
+
+    def test_claimed_job_is_left_to_its_worker(self):
+        job = self.enqueue("a.pdf")
+
+        claimed = _claim("COUNTER", timezone.now())
+
+        self.assertEqual(claimed.id, job.id)
+        self.assertEqual(claimed.attempts, 1)
+        # Another worker polling meanwhile skips it
+        self.assertFalse(process_printer_queue("COUNTER"))
+        self.assertFalse((self.sink / "a.pdf").exists())
+
+    def test_failure_backs_off_and_blocks_the_queue(self):
+        failing = self.enqueue("a.pdf", printer_name="OFFLINE")
+        before = timezone.now()
+
+        self.assertTrue(process_printer_queue("OFFLINE"))
+
+        failing.refresh_from_db()
+        self.assertEqual(failing.status, PrintJob.Status.PENDING)
+        self.assertEqual(failing.last_error, "Printer offline")
+        self.assertGreaterEqual(
+            failing.next_attempt_at, before + timedelta(seconds=BACKOFF_BASE_SECONDS)
+        )
+        # Still backing off
+        self.assertFalse(process_printer_queue("OFFLINE"))
+
+        self.make_due(failing)
+        self.assertTrue(process_printer_queue("OFFLINE"))
+        failing.refresh_from_db()
+        self.assertEqual(failing.attempts, 2)
+        self.assertGreaterEqual(
+            failing.next_attempt_at,
+            before + timedelta(seconds=2 * BACKOFF_BASE_SECONDS),
+        )
+
+    def test_dead_after_max_attempts(self):
+        failing = self.enqueue("a.pdf", printer_name="OFFLINE")
+        behind = self.enqueue("b.pdf", printer_name="OFFLINE")
+
+        for _ in range(MAX_ATTEMPTS):
+            self.make_due(failing)
+            self.assertTrue(process_printer_queue("OFFLINE"))
+            # The job behind waits its turn
+            behind.refresh_from_db()
+            self.assertEqual(behind.attempts, 0)
+
+        failing.refresh_from_db()
+        self.assertEqual(failing.status, PrintJob.Status.DEAD)
+        self.assertEqual(failing.attempts, MAX_ATTEMPTS)
+
+        # Dead letter no longer blocks the queue
+        self.assertTrue(process_printer_queue("OFFLINE"))
+        behind.refresh_from_db()
+        self.assertEqual(behind.attempts, 1)
+
+    def test_missing_file_is_a_failure(self):
+        job = enqueue_print(file_relative_path="gone.pdf", printer_name="COUNTER")
+
+        process_printer_queue("COUNTER")
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, PrintJob.Status.PENDING)
+        self.assertIn("File not found", job.last_error)
+
+
+class RenderJobTests(SpoolerTestCase):
+    def setUp(self):
+        super().setUp()
+        category = Category.objects.create(name="Coffee")
+        self.latte = Item.objects.create(category=category, name="Latte")
+        self.bill = Bill.objects.create(
+            customer_name="Asha",
+            customer_phone="9999999999",
+            gst_percentage=Decimal("5.00"),
+        )
+        items = BillItem.objects.bulk_create(
+            [
+                BillItem(
+                    bill=self.bill, item=self.latte, price=Decimal("120"), quantity=2
+                )
+            ]
+        )
+        self.bill.finalize(items=items)
+
+    def make_due(self):
+        RenderJob.objects.update(next_attempt_at=timezone.now())
+
+    def test_job_outlives_the_process(self):
+        # Commit happens, but the pool never runs (process restarted)
+        with self.captureOnCommitCallbacks() as callbacks:
+            rendering.schedule_bill_pdf(self.bill, printer_name="COUNTER")
+        self.assertEqual(len(callbacks), 1)
+
+        job = RenderJob.objects.get()
+        self.assertEqual(job.status, RenderJob.Status.PENDING)
+        # Left to the pool at first
+        self.assertEqual(rendering.process_render_jobs(), 0)
+
+        self.make_due()
+        self.assertEqual(rendering.process_render_jobs(), 1)
+
+        job.refresh_from_db()
+        self.bill.refresh_from_db()
+        self.assertEqual(job.status, RenderJob.Status.DONE)
+        self.assertEqual(self.bill.pdf_status, Bill.PdfStatus.READY)
+        self.assertTrue((self.media_root / self.bill.bill_pdf_path).exists())
+        self.assertEqual(
+            list(PrintJob.objects.values_list("printer_name", "file_path")),
+            [("COUNTER", self.bill.bill_pdf_path)],
+        )
+
+    def test_claim_is_exclusive(self):
+        with self.captureOnCommitCallbacks():
+            rendering.schedule_bill_pdf(self.bill)
+        job = RenderJob.objects.get()
+
+        self.assertEqual(rendering._claim(job_id=job.id).id, job.id)
+        self.bill.refresh_from_db()
+        self.assertEqual(self.bill.pdf_status, Bill.PdfStatus.RENDERING)
+
+        # Neither a second pool task nor the worker gets it while claimed
+        self.assertIsNone(rendering._claim(job_id=job.id))
+        self.assertIsNone(rendering._claim(now=timezone.now() + timedelta(seconds=60)))
+
+    def test_kitchen_slips(self):
+        order = Order.objects.create(customer_name="Asha")
+        recipes = []
+        for station in ("KITCHEN", "BARISTA"):
+            recipe = Recipe.objects.create(order=order, station=station)
+            item = RecipeItem.objects.create(
+                recipe=recipe, item_name="Latte", quantity=1, priority=1
+            )
+            recipes.append((recipe, [item]))
+
+        with self.captureOnCommitCallbacks():
+            rendering.schedule_kot_pdfs(recipes, printer_name="COUNTER")
+        rendering.run_render_job(rendering._claim(job_id=RenderJob.objects.get().id))
+
+        self.assertEqual(PrintJob.objects.filter(printer_name="COUNTER").count(), 2)
+
+    def test_failed_render_is_retried_then_dead(self):
+        with self.captureOnCommitCallbacks():
+            rendering.schedule_bill_pdf(self.bill, printer_name="COUNTER")
+
+        with mock.patch(
+            "billing.rendering.draw_bill_pdf", side_effect=ValueError("bad font")
+        ):
+            for attempt in range(1, rendering.MAX_ATTEMPTS + 1):
+                self.make_due()
+                self.assertEqual(rendering.process_render_jobs(), 1)
+
+                job = RenderJob.objects.get()
+                self.bill.refresh_from_db()
+                self.assertEqual(job.attempts, attempt)
+                self.assertEqual(job.last_error, "bad font")
+
+        self.assertEqual(job.status, RenderJob.Status.DEAD)
+        self.assertEqual(self.bill.pdf_status, Bill.PdfStatus.FAILED)
+        self.assertFalse(PrintJob.objects.exists())
+
+    def test_stale_bills_are_requeued(self):
+        # Scheduled before render jobs were kept
+        Bill.objects.filter(id=self.bill.id).update(pdf_status=Bill.PdfStatus.RENDERING)
+
+        self.assertEqual(rendering.requeue_stale_bills(), 1)
+        self.assertEqual(rendering.requeue_stale_bills(), 0)
+
+        self.assertEqual(rendering.process_render_jobs(), 1)
+
+        self.bill.refresh_from_db()
+        self.assertEqual(self.bill.pdf_status, Bill.PdfStatus.READY)
+        # Nobody knows where it was meant to print
+        self.assertFalse(PrintJob.objects.exists())
+
+
+class BillEditTests(SpoolerTestCase):
+    def setUp(self):
+        super().setUp()
+        category = Category.objects.create(name="Coffee")
+        latte = Item.objects.create(category=category, name="Latte")
+        self.bill = Bill.objects.create(
+            customer_name="Asha",
+            customer_phone="9999999999",
+            gst_percentage=Decimal("5.00"),
+        )
+        items = BillItem.objects.bulk_create(
+            [BillItem(bill=self.bill, item=latte, price=Decimal("120"), quantity=2)]
+        )
+        self.bill.finalize(items=items)
+
+        admin = User.objects.create_superuser("admin", "a@a.com", "pw")
+        self.client.force_login(admin)
+        self.pdf_url = reverse("billing:bill_pdf", args=[self.bill.id])
+        self.old_etag = self.client.get(self.pdf_url)["ETag"]
+
+    def change_form_data(self, url):
+        """
+        The admin change form as the browser would post it back.
+        """
+        response = self.client.get(url)
+        forms = [response.context["adminform"].form]
+        data = {}
+        for inline in response.context["inline_admin_formsets"]:
+            formset = inline.formset
+            forms += formset.forms
+            for name, field in formset.management_form.fields.items():
+                data[formset.management_form.add_prefix(name)] = (
+                    formset.management_form[name].value()
+                )
+        for form in forms:
+            for name in form.fields:
+                value = form[name].value()
+                if value is not None and value is not False:
+                    data[form.add_prefix(name)] = value
+        return data
+
+    def test_admin_edit_replaces_the_pdf(self):
+        url = reverse("admin:billing_bill_change", args=[self.bill.id])
+        data = self.change_form_data(url)
+        data["items-0-quantity"] = 3
+
+        with self.captureOnCommitCallbacks():
+            response = self.client.post(url, data)
+        self.assertEqual(response.status_code, 302)
+
+        self.bill.refresh_from_db()
+        self.assertEqual(self.bill.subtotal, Decimal("360.00"))
+        self.assertEqual(self.bill.pdf_sha256, "")
+        self.assertEqual(self.bill.pdf_status, Bill.PdfStatus.QUEUED)
+        self.assertTrue(
+            RenderJob.objects.filter(bill=self.bill, printer_name="").exists()
+        )
+
+        # The old ETag no longer matches: the browser gets the new bill
+        response = self.client.get(self.pdf_url, HTTP_IF_NONE_MATCH=self.old_etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], self.old_etag)
+        self.assertEqual(response["Cache-Control"], "private, no-cache")
+
+    def test_refinalize_without_changes_keeps_the_pdf(self):
+        self.assertFalse(self.bill.finalize())
+
+        self.bill.refresh_from_db()
+        self.assertNotEqual(self.bill.pdf_sha256, "")
+        response = self.client.get(self.pdf_url, HTTP_IF_NONE_MATCH=self.old_etag)
+        self.assertEqual(response.status_code, 304)
+
+
+class ArchivePdfsTests(SpoolerTestCase):
+    def test_pending_print_files_stay_on_disk(self):
+        day = date(2025, 1, 14)
+        printed = store_file(b"printed", day=day)
+        queued = store_file(b"queued", day=day)
+        enqueue_print(file_relative_path=queued.path, printer_name="COUNTER")
+
+        call_command("archive_pdfs", month="2025-01", stdout=StringIO())
+
+        self.assertFalse((self.media_root / printed.path).exists())
+        self.assertTrue((self.media_root / queued.path).exists())
+        file, _ = open_stored(printed.path)
+        with file:
+            self.assertEqual(file.read(), b"printed")
+
+        # Printed now: the next run packs it
+        self.assertEqual(process_pending_jobs(), 1)
+        call_command("archive_pdfs", stdout=StringIO())
+        self.assertFalse((self.media_root / queued.path).exists())
+        file, _ = open_stored(queued.path)
+        with file:
+            self.assertEqual(file.read(), b"queued")
+
+    def test_open_month_is_refused(self):
+        today = timezone.localdate()
+
+        with self.assertRaisesMessage(CommandError, "not closed"):
+            call_command("archive_pdfs", month=f"{today:%Y-%m}")
+        with self.assertRaisesMessage(CommandError, "2025-01"):
+            call_command("archive_pdfs", month="2025-13")
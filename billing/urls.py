@@ -8,8 +8,18 @@ urlpatterns = [
     path("create/", views.create_bill, name="create_bill"),
     path("detail/<int:bill_id>/", views.bill_detail, name="bill_detail"),
     path("pdf/<int:bill_id>/", views.bill_pdf, name="bill_pdf"),
+    path(
+        "api/pdf-status/<int:bill_id>/",
+        views.bill_pdf_status,
+        name="api_bill_pdf_status",
+    ),
     path("kitchen_pdf/<int:order_id>/", views.kitchen_pdf, name="kitchen_pdf"),
     path("table-order/", views.table_order_view, name="table_order"),
+    path(
+        "api/past-customers/",
+        views.past_customers,
+        name="api_past_customers",
+    ),
     path(
         "api/table-order/<int:table_id>/",
         views.get_table_order,
@@ -1,12 +1,6 @@
 import json
-import os
-import time
 from decimal import Decimal
-from io import BytesIO
 
-import win32api
-import win32print
-from django.conf import settings
 from django.db import transaction
 from django.db.models import IntegerField
 from django.db.models.functions import Cast, Substr
@@ -14,24 +8,31 @@ from django.http import HttpResponse, JsonResponse
 
 # Create your views here.
 from django.shortcuts import get_object_or_404, redirect, render
-from django.utils import timezone
+from django.utils.cache import patch_cache_control
 
-from administration.models import Customer
+from administration.models import Customer, normalize_phone
 from core.decorators import staff_required
-from home.models import Category, Item
+from home.catalog import get_catalog
 from orders.models import Order, OrderHistory, OrderItem, Table
 from orders.service import generate_recipes_for_order
-from utils.pdf import draw_bill_pdf, draw_kitchen_pdf
-from utils.save_pdf import save_pdf_once
+from utils.file_response import REVALIDATE_CACHE_CONTROL, serve_immutable_file
+from utils.pdf import draw_kitchen_slips_pdf
 
-from .models import Bill, BillItem, CafeConfig
+from .models import Bill, BillItem, PastCustomerName
+from .pricing import totals_for_bill
+from .rendering import (
+    ensure_bill_pdf,
+    open_bill_pdf,
+    schedule_bill_pdf,
+    schedule_kot_pdfs,
+)
 
 
 @staff_required
 def create_bill(request):
-    items = Item.objects.prefetch_related("sizes").filter(is_available=True)
-    cafe = CafeConfig.objects.first()
-    gst_percentage = cafe.gst_percentage if cafe else Decimal("0")
+    catalog = get_catalog()
+    items = catalog.available_items()
+    gst_percentage = catalog.gst_percentage
     cgst_percentage = gst_percentage / Decimal("2")
     sgst_percentage = gst_percentage / Decimal("2")
 
@@ -74,15 +75,15 @@ def create_bill(request):
             # --------------------
             # 3. ADD ITEMS
             # --------------------
+            lines = [data for data in items_data.values() if int(data["qty"]) > 0]
+
+            bill_items = []
             order_items = []
 
-            for data in items_data.values():
+            for data in lines:
                 qty = int(data["qty"])
-                if qty <= 0:
-                    continue
-
-                item = Item.objects.select_related().get(id=int(data["item_id"]))
-                price = item.get_price_for_size(data["size"])
+                item = catalog.item(int(data["item_id"]))
+                price = item.price_for_size(data["size"])
                 priority = int(data.get("priority", 1))
                 notes = data.get("notes", "")
 
@@ -90,25 +91,28 @@ def create_bill(request):
                 subtotal += line_total
 
                 # BILL ITEM
-                BillItem.objects.create(
-                    bill=bill,
-                    item=item,
-                    size=data["size"],
-                    price=price,
-                    quantity=qty,
+                bill_items.append(
+                    BillItem(
+                        bill=bill,
+                        item_id=item.id,
+                        size=data["size"],
+                        price=price,
+                        quantity=qty,
+                    )
                 )
 
                 # ORDER ITEM
                 order_items.append(
                     OrderItem(
                         order=order,
-                        item=item,
+                        item_id=item.id,
                         quantity=qty,
                         priority=priority,
                         notes=notes,
                     )
                 )
 
+            BillItem.objects.bulk_create(bill_items)
             OrderItem.objects.bulk_create(order_items)
 
             # --------------------
@@ -118,7 +122,8 @@ def create_bill(request):
                 (subtotal * discount_percent) / Decimal("100"), subtotal
             )
             bill.discount_amount = discount_amount
-            bill.save()
+            bill.finalize(items=bill_items, created=True)
+            PastCustomerName.record(customer_name)
 
             # --------------------
             # 5. GENERATE RECIPES
@@ -132,28 +137,8 @@ def create_bill(request):
             # --------------------
             # 7. PRINT KITCHEN SLIPS
             # --------------------
-            for recipe, recipe_items in recipes_with_items:
-
-                recipe_buffer = BytesIO()
-
-                draw_kitchen_pdf(
-                    recipe=recipe,
-                    output=recipe_buffer,
-                    items=recipe_items,
-                )
-
-                recipe_filename = f"order_{order.id}_{recipe.station}.pdf"
-
-                save_pdf_once(
-                    pdf_buffer=recipe_buffer,
-                    filename=recipe_filename,
-                )
-
-                recipe_relative_path = f"bills/{recipe_filename}"
-
-                send_to_printer(
-                    file_relative_path=recipe_relative_path, printer_name="POS-80C BT"
-                )
+            # Rendered and queued for printing after commit
+            schedule_kot_pdfs(recipes_with_items, printer_name="POS-80C BT")
 
     return render(
         request,
@@ -169,27 +154,9 @@ def create_bill(request):
 @staff_required
 def bill_detail(request, bill_id):
     bill = get_object_or_404(Bill, id=bill_id)
-    items = bill.items.select_related("item")
-
-    # 1. Basic Calculations
-    subtotal = sum(i.line_total() for i in items)
-    taxable_amount = subtotal - bill.discount_amount
+    items = list(bill.items.select_related("item"))
 
-    # 2. GST Calculations (2.5% each if total is 5%)
-    # Agar bill.gst_percentage 5 hai, toh split_rate 2.5 hoga
-    gst_split_rate = bill.gst_percentage / Decimal("2")
-    cgst_amount = (taxable_amount * gst_split_rate) / Decimal("100")
-    sgst_amount = (taxable_amount * gst_split_rate) / Decimal("100")
-
-    # 3. Total before rounding
-    total_before_round = taxable_amount + cgst_amount + sgst_amount
-
-    # 4. Final Rounding Logic
-    # Decimal ko float mein convert karke round karenge phir wapas Decimal
-    final_total = Decimal(round(float(total_before_round)))
-
-    # Difference nikal rahe hain (e.g. +0.25 ya -0.40)
-    round_off_val = final_total - total_before_round
+    totals = totals_for_bill(bill, items=items)
 
     return render(
         request,
@@ -197,11 +164,11 @@ def bill_detail(request, bill_id):
         {
             "bill": bill,
             "items": items,
-            "subtotal": subtotal,
-            "cgst_amount": cgst_amount,
-            "sgst_amount": sgst_amount,
-            "total_amount": final_total,  # Rounded figure
-            "round_off": round_off_val,  # Difference for UI
+            "subtotal": totals.subtotal,
+            "cgst_amount": totals.cgst,
+            "sgst_amount": totals.sgst,
+            "total_amount": totals.grand_total,  # Rounded figure
+            "round_off": totals.round_off,  # Difference for UI
         },
     )
 
@@ -210,11 +177,32 @@ def bill_detail(request, bill_id):
 def bill_pdf(request, bill_id):
     bill = get_object_or_404(Bill, id=bill_id)
 
-    response = HttpResponse(content_type="application/pdf")
-    response["Content-Disposition"] = f'inline; filename="{bill.bill_number}.pdf"'
+    # Reprints are a disk read (or a 304); a bill edited in the admin
+    # gets a new file and ETag, so the browser must revalidate
+    if not bill.pdf_sha256:
+        ensure_bill_pdf(bill)
 
-    draw_bill_pdf(bill=bill, output=response)
-    return response
+    return serve_immutable_file(
+        request,
+        lambda: open_bill_pdf(bill),
+        etag=bill.pdf_sha256,
+        content_type="application/pdf",
+        filename=f"{bill.bill_number}.pdf",
+        cache_control=REVALIDATE_CACHE_CONTROL,
+    )
+
+
+@staff_required
+def bill_pdf_status(request, bill_id):
+    bill = get_object_or_404(
+        Bill.objects.only("id", "pdf_status", "bill_pdf_path"), id=bill_id
+    )
+    return JsonResponse(
+        {
+            "status": bill.pdf_status,
+            "pdf_path": bill.bill_pdf_path,
+        }
+    )
 
 
 @staff_required
@@ -236,39 +224,24 @@ def kitchen_pdf(request, order_id):
     response = HttpResponse(content_type="application/pdf")
     response["Content-Disposition"] = f'inline; filename="KOT_{order.id}.pdf"'
 
-    for recipe in recipes:
-        draw_kitchen_pdf(
-            recipe=recipe,
-            output=response,
-        )
+    # One document, one page per station
+    draw_kitchen_slips_pdf(
+        slips=[(recipe, None) for recipe in recipes],
+        output=response,
+    )
 
     return response
 
 
-def send_to_printer(file_relative_path, printer_name):
-    file_path = os.path.join(settings.MEDIA_ROOT, file_relative_path)
-
-    if not os.path.exists(file_path):
-        print("File not found:", file_path)
-        return
-
-    # Set printer
-    handle = win32print.OpenPrinter(printer_name)
-
-    try:
-        win32api.ShellExecute(0, "printto", file_path, f'"{printer_name}"', ".", 0)
-    finally:
-        win32print.ClosePrinter(handle)
-
-
 @staff_required
 def table_order_view(request):
     tables = Table.objects.annotate(
         num=Cast(Substr("number", 2), IntegerField())
     ).order_by("num")
 
-    items = Item.objects.filter(is_available=True)
-    categories = Category.objects.all()
+    catalog = get_catalog()
+    items = catalog.available_items()
+    categories = catalog.categories.values()
 
     if request.method == "POST":
         table_id = request.POST.get("table_id")
@@ -297,22 +270,19 @@ def table_order_view(request):
                         status=Order.Status.NEW,
                     )
 
-                created_items = []
-
-                for data in items_data.values():
-
-                    item = Item.objects.get(id=int(data["id"]))
-
-                    oi = OrderItem.objects.create(
-                        order=order,
-                        item=item,
-                        quantity=int(data["qty"]),
-                        size=data["size"],
-                        notes=data.get("notes", ""),
-                        is_sent_to_kitchen=False,
-                    )
-
-                    created_items.append(oi)
+                OrderItem.objects.bulk_create(
+                    [
+                        OrderItem(
+                            order=order,
+                            item_id=catalog.item(int(data["id"])).id,
+                            quantity=int(data["qty"]),
+                            size=data["size"],
+                            notes=data.get("notes", ""),
+                            is_sent_to_kitchen=False,
+                        )
+                        for data in items_data.values()
+                    ]
+                )
 
                 # create recipes
                 unsent_items = order.items.filter(is_sent_to_kitchen=False)
@@ -323,30 +293,7 @@ def table_order_view(request):
                         order, items=unsent_items
                     )
 
-                    for recipe, recipe_items in recipes_with_items:
-
-                        recipe_buffer = BytesIO()
-
-                        draw_kitchen_pdf(
-                            recipe=recipe, output=recipe_buffer, items=recipe_items
-                        )
-
-                        timestamp = int(time.time())
-                        recipe_filename = (
-                            f"KOT_{order.id}_{timestamp}_{recipe.station}.pdf"
-                        )
-
-                        save_pdf_once(
-                            pdf_buffer=recipe_buffer,
-                            filename=recipe_filename,
-                        )
-
-                        recipe_relative_path = f"bills/{recipe_filename}"
-
-                        send_to_printer(
-                            file_relative_path=recipe_relative_path,
-                            printer_name="POS-80C BT",
-                        )
+                    schedule_kot_pdfs(recipes_with_items, printer_name="POS-80C BT")
 
                     unsent_items.update(is_sent_to_kitchen=True)
 
@@ -378,12 +325,11 @@ def table_order_view(request):
                 cust_phone = request.POST.get("customer_phone")
                 cash_amount = Decimal(request.POST.get("cash_amount") or 0)
 
-                cafe = CafeConfig.objects.first()
                 bill = Bill.objects.create(
                     customer_name=cust_name,
                     customer_phone=cust_phone,
                     payment_mode=payment_mode,
-                    gst_percentage=cafe.gst_percentage if cafe else 0,
+                    gst_percentage=catalog.gst_percentage,
                     discount_percent=discount_percent,
                     cash_received=(
                         cash_amount if payment_mode in ("CASH", "SPLIT") else None
@@ -393,8 +339,8 @@ def table_order_view(request):
                 # ── Customer Profile Handling (Partial) ──
                 # We'll link the bill now, but update stats AFTER items are added
                 customer = None
-                if cust_phone and len(cust_phone.strip()) >= 10:
-                    cust_phone_clean = cust_phone.strip()[-10:]
+                cust_phone_clean = normalize_phone(cust_phone)
+                if len(cust_phone_clean) == 10:
                     customer, _ = Customer.objects.get_or_create(
                         phone=cust_phone_clean,
                         defaults={"name": cust_name},
@@ -405,27 +351,42 @@ def table_order_view(request):
 
                 subtotal = Decimal("0.00")
 
+                # Saare pending items ek query mein
+                pending_orders = list(pending_orders.order_by("created_at"))
+                pending_items = list(
+                    OrderItem.objects.filter(order__in=pending_orders).order_by("id")
+                )
+
+                items_by_order = {}
+                for ot in pending_items:
+                    items_by_order.setdefault(ot.order_id, []).append(ot)
+
+                bill_items = []
+
                 # Step A: Purane (Already served) items add karein
                 for order in pending_orders:
 
                     items_snapshot = []
 
-                    for ot in order.items.select_related("item"):
+                    for ot in items_by_order.get(order.id, []):
 
-                        price = ot.item.get_price_for_size(ot.size)
+                        item = catalog.item(ot.item_id)
+                        price = item.price_for_size(ot.size)
                         subtotal += price * ot.quantity
 
-                        BillItem.objects.create(
-                            bill=bill,
-                            item=ot.item,
-                            size=ot.size,
-                            quantity=ot.quantity,
-                            price=price,
+                        bill_items.append(
+                            BillItem(
+                                bill=bill,
+                                item_id=item.id,
+                                size=ot.size,
+                                quantity=ot.quantity,
+                                price=price,
+                            )
                         )
 
                         items_snapshot.append(
                             {
-                                "item_name": ot.item.name,
+                                "item_name": item.name,
                                 "quantity": ot.quantity,
                                 "size": ot.size,
                                 "price": str(price),
@@ -434,28 +395,13 @@ def table_order_view(request):
                             }
                         )
 
-                    order.bill = bill
-                    order.is_billed = True
-                    order.save()
-
-                # ── Final Customer Stats Update ──
-                if bill.customer:
-
-                    c = bill.customer
-                    c.name = cust_name  # Refresh name if changed
-
-                    # Refreshing to ensure the model knows about the new bill linked in DB
-                    c.refresh_from_db()
-
-                    c.total_visits = c.bills.count()
-                    all_bills = list(c.bills.all())
-                    c.total_spent = sum(b.total_amount() for b in all_bills)
-
-                    c.last_visited = timezone.now()
-                    c.save()
+                Order.objects.filter(id__in=[o.id for o in pending_orders]).update(
+                    bill=bill, is_billed=True
+                )
 
+                if bill.customer and pending_orders:
                     OrderHistory.objects.create(
-                        order=order,
+                        order=pending_orders[-1],
                         bill_number=bill.bill_number,
                         customer_name=bill.customer_name,
                         customer_phone=bill.customer_phone,
@@ -471,47 +417,42 @@ def table_order_view(request):
                     )
 
                 # Step B: Naye items (Screen se direct bill)
-                for key, data in items_data.items():
-                    item = Item.objects.get(id=int(data["id"]))
-                    price = item.get_price_for_size(data["size"])
+                for data in items_data.values():
+                    item = catalog.item(int(data["id"]))
+                    price = item.price_for_size(data["size"])
                     qty = int(data["qty"])
                     subtotal += price * qty
-                    BillItem.objects.create(
-                        bill=bill,
-                        item=item,
-                        size=data["size"],
-                        quantity=qty,
-                        price=price,
+                    bill_items.append(
+                        BillItem(
+                            bill=bill,
+                            item_id=item.id,
+                            size=data["size"],
+                            quantity=qty,
+                            price=price,
+                        )
                     )
 
+                BillItem.objects.bulk_create(bill_items)
+
                 # Step C: Discount & Final Save
                 discount_amount = (subtotal * discount_percent) / Decimal("100")
                 bill.discount_amount = discount_amount
-                bill.save()
-
-                # Bill PDF Generation (Existing logic)
-                bill_buffer = BytesIO()
-                draw_bill_pdf(bill=bill, output=bill_buffer)
-                bill_filename = f"BILL_{bill.bill_number}.pdf"
-                save_pdf_once(pdf_buffer=bill_buffer, filename=bill_filename)
-                bill.bill_pdf_path = f"bills/{bill_filename}"
-                send_to_printer(
-                    file_relative_path=bill.bill_pdf_path, printer_name="POS-80C USB"
-                )
-                bill.save()
+                bill.finalize(items=bill_items, created=True)
+
+                # ── Customer Stats: one UPDATE, however many past visits ──
+                if bill.customer_id:
+                    Customer.objects.record_bill(bill)
+
+                # Only names actually typed, not the "Table N" fallback
+                PastCustomerName.record(request.POST.get("customer_name"))
+
+                # Bill PDF: rendered and queued for printing after commit
+                schedule_bill_pdf(bill, printer_name="POS-80C USB")
 
                 table.is_occupied = False
                 table.save()
                 return redirect("billing:table_order")
 
-    # Past customer names for autocomplete
-    past_customers = list(
-        Bill.objects.exclude(customer_name__in=["", "Guest"])
-        .values_list("customer_name", flat=True)
-        .distinct()
-        .order_by("customer_name")[:100]
-    )
-
     return render(
         request,
         "billing/table_order.html",
@@ -519,29 +460,41 @@ def table_order_view(request):
             "categories": categories,
             "items": items,
             "tables": tables,
-            "past_customers": past_customers,
         },
     )
 
 
+@staff_required
+def past_customers(request):
+    """
+    Names for the checkout autocomplete, most used and most recent first.
+    """
+    response = JsonResponse({"names": PastCustomerName.cached_ranked()})
+    # The POS page asks once per load; a minute old is fine
+    patch_cache_control(response, private=True, max_age=60)
+    return response
+
+
 @staff_required
 def get_table_order(request, table_id):
     """Specific table ke saare active items fetch karne ke liye"""
     table = get_object_or_404(Table, id=table_id)
     # Saare orders uthao jo abhi tak bill nahi hue hain
     active_orders = Order.objects.filter(table=table, is_billed=False).prefetch_related(
-        "items__item"
+        "items"
     )
+    catalog = get_catalog()
 
     data = []
     for order in active_orders:
         for oi in order.items.all():
+            item = catalog.item(oi.item_id)
             data.append(
                 {
-                    "name": oi.item.name,
+                    "name": item.name,
                     "qty": oi.quantity,
                     "size": oi.size,
-                    "price": float(oi.item.get_price_for_size(oi.size)),
+                    "price": float(item.price_for_size(oi.size)),
                     "notes": oi.notes,
                 }
             )
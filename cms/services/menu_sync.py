@@ -1,53 +1,252 @@
-from decimal import Decimal
+"""
+Google Sheet → database menu sync.
+
+The sheet has one row per item size (Category, Item Name, Price Label,
+Current Price, Image URL, ...). ``sync_menu(rows)`` loads the current
+categories, items and sizes in a handful of queries, works out what
+differs from the rows and writes only that, with bulk_create /
+bulk_update in one transaction. Rows that match the database are not
+touched, and nothing is bumped when nothing changed.
+
+Same rules as the old row-by-row sync:
+
+* items are matched by name, whichever category they are in now
+* an item's category follows the sheet; its image is replaced only by
+  a non-empty Image URL
+* a category only gets an image if it has none
+* new items are available; ``is_available`` is otherwise left to staff
+
+With ``remove_missing``, sheet items that lost a size have it deleted
+and items no longer in the sheet are marked unavailable (never deleted:
+bills point at them). Such an item is made available again once it is
+back in the sheet; items staff made unavailable stay so.
+"""
+
+import csv
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation
+from typing import Dict, Iterable, List
+
+from django.db import transaction
 
 from cms.services.sheet_editor import get_all_rows
-from home.models import Category, Item, ItemSize
+from home.catalog import bump_catalog_version
+from home.models import Category, Item, ItemSize, RemoteImage
+
+
+class MenuSyncError(Exception):
+    """Raised when a sheet row cannot be read."""
 
 
 def normalize_category(value: str) -> str:
     return value.replace("_", " ").title()
 
 
-def sync_menu_from_sheet():
-    rows = get_all_rows()
+@dataclass
+class SheetItem:
+    name: str
+    category: str
+    image: str = ""
+    prices: Dict[str, Decimal] = field(default_factory=dict)
 
-    for row in rows:
 
-        row = {k.lower(): v for k, v in row.items()}
+@dataclass
+class SyncReport:
+    """
+    One line per category / item / size, by what the sync did to it.
+    """
 
-        category_name = normalize_category(row["category"])
-        item_name = row["item name"].strip()
+    added: List[str] = field(default_factory=list)
+    updated: List[str] = field(default_factory=list)
+    unchanged: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
 
-        size = row["price label"].upper()
-        price = Decimal(str(row["current price"]))
+    @property
+    def changed(self) -> bool:
+        return bool(self.added or self.updated or self.removed)
 
-        image = row.get("image url", "")
+    def __str__(self):
+        return ", ".join(
+            f"{len(getattr(self, name))} {name}"
+            for name in ("added", "updated", "unchanged", "removed")
+        )
 
-        category, _ = Category.objects.get_or_create(name=category_name)
 
-        if not category.image and image:
-            category.image = image
-            category.save(update_fields=["image"])
+def parse_rows(rows: Iterable[dict]) -> Dict[str, SheetItem]:
+    """
+    Sheet records (``get_all_records()`` or a CSV export) → items by name.
+    Rows without a category or item name are skipped.
+    """
+    items: Dict[str, SheetItem] = {}
+
+    # Row 1 is the header
+    for number, row in enumerate(rows, start=2):
+        row = {k.lower().strip(): v for k, v in row.items()}
+
+        category = normalize_category(str(row.get("category") or "").strip())
+        name = str(row.get("item name") or "").strip()
+        if not category or not name:
+            continue
+
+        size = str(row.get("price label") or "").strip().upper()
+        try:
+            price = Decimal(str(row["current price"]).strip())
+        except (KeyError, InvalidOperation):
+            price = None
+        if not size or price is None:
+            raise MenuSyncError(
+                f"Row {number}: bad price label / price for {name}: "
+                f"{row.get('price label')!r}, {row.get('current price')!r}"
+            )
 
-        item = Item.objects.filter(name=item_name).first()
+        item = items.setdefault(name, SheetItem(name=name, category=category))
+        # Later rows win, as when every row was saved in turn
+        item.category = category
+        image = str(row.get("image url") or "").strip()
+        if image:
+            item.image = image
+        item.prices[size] = price
+
+    return items
+
+
+def rows_from_csv(path) -> List[dict]:
+    """
+    Rows of a CSV export of the sheet, shaped like ``get_all_records()``.
+    """
+    with open(path, newline="", encoding="utf-8") as f:
+        return list(csv.DictReader(f))
+
+
+def _image_hash(image, remote_hashes):
+    # Resized copies already exist for remote URLs downloaded before
+    return remote_hashes.get(image, "")
+
+
+def sync_menu(rows: Iterable[dict], *, remove_missing=False) -> SyncReport:
+    """
+    Bring categories, items and sizes in line with the sheet ``rows``.
+    """
+    sheet = parse_rows(rows)
+    report = SyncReport()
+
+    with transaction.atomic():
+        categories = {c.name: c for c in Category.objects.order_by("id")}
+        items: Dict[str, Item] = {}
+        for item in Item.objects.order_by("-id"):
+            # Lowest id wins on duplicate names, as .first() did
+            items[item.name] = item
+        sizes = {(s.item_id, s.size): s for s in ItemSize.objects.all()}
+        remote_hashes = dict(
+            RemoteImage.objects.exclude(path="").values_list("url", "sha256")
+        )
 
-        if not item:
-            item = Item.objects.create(
-                name=item_name,
-                category=category,
-                image=image,
-                is_available=True,
-            )
-        else:
+        # ---------- CATEGORIES ----------
+        new_categories, categories_with_image = [], []
+        for sheet_item in sheet.values():
+            category = categories.get(sheet_item.category)
+            if category is None:
+                category = Category(name=sheet_item.category)
+                categories[category.name] = category
+                new_categories.append(category)
+            if not category.image and sheet_item.image:
+                category.image = sheet_item.image
+                category.image_hash = _image_hash(sheet_item.image, remote_hashes)
+                if category.pk:
+                    categories_with_image.append(category)
+
+        Category.objects.bulk_create(new_categories)
+        Category.objects.bulk_update(categories_with_image, ["image", "image_hash"])
+        report.added += [f"Category {c.name}" for c in new_categories]
+        report.updated += [f"Category {c.name}" for c in categories_with_image]
+
+        # ---------- ITEMS ----------
+        new_items, changed_items, unchanged_items = [], [], []
+        for sheet_item in sheet.values():
+            category = categories[sheet_item.category]
+            item = items.get(sheet_item.name)
+
+            if item is None:
+                item = Item(
+                    name=sheet_item.name,
+                    category=category,
+                    image=sheet_item.image,
+                    image_hash=_image_hash(sheet_item.image, remote_hashes),
+                    is_available=True,
+                )
+                items[item.name] = item
+                new_items.append(item)
+                continue
+
+            changed = item.category_id != category.id
             item.category = category
+            if sheet_item.image and sheet_item.image != item.image.name:
+                item.image = sheet_item.image
+                item.image_hash = _image_hash(sheet_item.image, remote_hashes)
+                changed = True
+            if item.removed_from_sheet:
+                item.is_available = True
+                item.removed_from_sheet = False
+                changed = True
+            (changed_items if changed else unchanged_items).append(item)
+
+        Item.objects.bulk_create(new_items)
+        Item.objects.bulk_update(
+            changed_items,
+            ["category", "image", "image_hash", "is_available", "removed_from_sheet"],
+        )
+        report.added += [f"Item {i.name}" for i in new_items]
+        report.updated += [f"Item {i.name}" for i in changed_items]
+        report.unchanged += [f"Item {i.name}" for i in unchanged_items]
+
+        # ---------- SIZES ----------
+        new_sizes, changed_sizes = [], []
+        for sheet_item in sheet.values():
+            item = items[sheet_item.name]
+            for size, price in sheet_item.prices.items():
+                label = f"Size {item.name} / {size}"
+                current = sizes.pop((item.id, size), None)
+                if current is None:
+                    new_sizes.append(ItemSize(item=item, size=size, price=price))
+                    report.added.append(label)
+                elif current.price != price:
+                    current.price = price
+                    changed_sizes.append(current)
+                    report.updated.append(label)
+                else:
+                    report.unchanged.append(label)
+
+        ItemSize.objects.bulk_create(new_sizes)
+        ItemSize.objects.bulk_update(changed_sizes, ["price"])
+
+        # ---------- REMOVED FROM THE SHEET ----------
+        if remove_missing:
+            sheet_item_ids = {items[name].id for name in sheet}
+            dropped_sizes = [
+                s for (item_id, _), s in sizes.items() if item_id in sheet_item_ids
+            ]
+            ItemSize.objects.filter(id__in=[s.id for s in dropped_sizes]).delete()
+            names = {item.id: item.name for item in items.values()}
+            report.removed += [
+                f"Size {names[s.item_id]} / {s.size}" for s in dropped_sizes
+            ]
+
+            dropped_items = [
+                item
+                for name, item in items.items()
+                if name not in sheet and item.is_available
+            ]
+            Item.objects.filter(id__in=[i.id for i in dropped_items]).update(
+                is_available=False, removed_from_sheet=True
+            )
+            report.removed += [f"Item {i.name}" for i in dropped_items]
 
-            if image:
-                item.image = image
+        if report.changed:
+            # Bulk writes send no post_save
+            bump_catalog_version()
 
-            item.save(update_fields=["category", "image"])
+    return report
 
-        ItemSize.objects.update_or_create(
-            item=item,
-            size=size,
-            defaults={"price": price},
-        )
+
+def sync_menu_from_sheet(remove_missing=False) -> SyncReport:
+    return sync_menu(get_all_rows(), remove_missing=remove_missing)
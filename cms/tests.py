@@ -1 +1,156 @@
-# Create your tests here.
+import json
+from decimal import Decimal
+from pathlib import Path
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from cms.services.menu_sync import MenuSyncError, rows_from_csv, sync_menu
+from home.models import Category, Item, ItemSize
+
+# Stands in for the Google Sheet: same columns as a CSV export of it
+FIXTURE = Path(__file__).parent / "fixtures" / "menu_sheet.csv"
+
+
+class MenuSyncTests(TestCase):
+    def sync(self, rows=None, **kwargs):
+        with self.captureOnCommitCallbacks():
+            return sync_menu(rows or rows_from_csv(FIXTURE), **kwargs)
+
+    def prices(self):
+        return {
+            (s.item.name, s.size): s.price
+            for s in ItemSize.objects.select_related("item")
+        }
+
+    def test_first_sync_adds_everything(self):
+        report = self.sync()
+
+        self.assertEqual(len(report.added), 3 + 5 + 6)
+        self.assertEqual(report.updated, [])
+        self.assertEqual(
+            sorted(Category.objects.values_list("name", flat=True)),
+            ["Cold Coffee", "Hot Coffee", "Maggi"],
+        )
+        self.assertEqual(self.prices()[("Cappuccino", "LARGE")], Decimal("169"))
+
+        # Category image from its first row that has one
+        self.assertEqual(
+            Category.objects.get(name="Maggi").image.name,
+            "https://example.com/img/masala-maggi.jpg",
+        )
+        self.assertTrue(Item.objects.get(name="Cheese Maggi").is_available)
+
+    def test_resync_changes_nothing(self):
+        self.sync()
+
+        with CaptureQueriesContext(connection) as queries:
+            report = self.sync()
+
+        self.assertFalse(report.changed)
+        self.assertEqual(len(report.unchanged), 5 + 6)
+        # Catalog loads only (plus the transaction), whatever the sheet size
+        self.assertLessEqual(len(queries), 6)
+
+    def test_only_changed_rows_are_written(self):
+        self.sync()
+        rows = rows_from_csv(FIXTURE)
+        rows[0]["Current Price"] = "135"  # Cappuccino / Small
+        rows[2]["Category"] = "cold_coffee"  # Cafe Latte moves
+        rows[5]["Image URL"] = "https://example.com/img/cheese-maggi.jpg"
+
+        report = self.sync(rows)
+
+        self.assertEqual(
+            sorted(report.updated),
+            ["Item Cafe Latte", "Item Cheese Maggi", "Size Cappuccino / SMALL"],
+        )
+        self.assertEqual(report.added, [])
+        self.assertEqual(self.prices()[("Cappuccino", "SMALL")], Decimal("135"))
+        self.assertEqual(
+            Item.objects.get(name="Cafe Latte").category.name, "Cold Coffee"
+        )
+
+    def test_items_are_matched_by_name_across_categories(self):
+        other = Category.objects.create(name="Old Menu")
+        latte = Item.objects.create(name="Cafe Latte", category=other, image="x.jpg")
+
+        self.sync()
+
+        latte.refresh_from_db()
+        self.assertEqual(Item.objects.filter(name="Cafe Latte").count(), 1)
+        self.assertEqual(latte.category.name, "Hot Coffee")
+        # Blank Image URL keeps the current image
+        self.assertEqual(latte.image.name, "x.jpg")
+
+    def test_remove_missing(self):
+        self.sync()
+        rows = rows_from_csv(FIXTURE)
+        del rows[1]  # Cappuccino / Large
+        del rows[4]  # Cheese Maggi
+
+        self.assertEqual(self.sync(rows).removed, [])
+
+        report = self.sync(rows, remove_missing=True)
+
+        self.assertEqual(
+            sorted(report.removed), ["Item Cheese Maggi", "Size Cappuccino / LARGE"]
+        )
+        self.assertNotIn(("Cappuccino", "LARGE"), self.prices())
+        # Kept for old bills, just off the menu
+        self.assertFalse(Item.objects.get(name="Cheese Maggi").is_available)
+
+    def test_item_back_in_the_sheet_is_available_again(self):
+        self.sync()
+        rows = rows_from_csv(FIXTURE)
+        del rows[5]  # Cheese Maggi
+        self.sync(rows, remove_missing=True)
+
+        report = self.sync()
+
+        self.assertEqual(report.updated, ["Item Cheese Maggi"])
+        cheese = Item.objects.get(name="Cheese Maggi")
+        self.assertTrue(cheese.is_available)
+        self.assertFalse(cheese.removed_from_sheet)
+
+    def test_items_hidden_by_staff_stay_hidden(self):
+        self.sync()
+        # Out of stock, unticked in the admin
+        Item.objects.filter(name="Cappuccino").update(is_available=False)
+
+        report = self.sync()
+
+        self.assertFalse(report.changed)
+        self.assertFalse(Item.objects.get(name="Cappuccino").is_available)
+
+    def test_bad_row_writes_nothing(self):
+        rows = rows_from_csv(FIXTURE)
+        rows[3]["Current Price"] = "free"
+
+        with self.assertRaisesMessage(MenuSyncError, "Row 5"):
+            self.sync(rows)
+        self.assertFalse(Item.objects.exists())
+
+
+class CmsMenuViewTests(TestCase):
+    def setUp(self):
+        staff = User.objects.create_user("staff", password="pw", is_staff=True)
+        self.client.force_login(staff)
+
+    @mock.patch("cms.views.get_sheet")
+    @mock.patch("cms.views.sync_menu_from_sheet")
+    def test_bad_sheet_row_is_a_400(self, sync_menu_from_sheet, get_sheet):
+        sync_menu_from_sheet.side_effect = MenuSyncError("Row 5: bad price")
+
+        response = self.client.post(
+            reverse("cms-menu"),
+            {"action": "update", "row": 5, "values": json.dumps(["maggi"])},
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"error": "Row 5: bad price"})
+        get_sheet.return_value.update.assert_called_once_with("A5", [["maggi"]])
@@ -7,7 +7,7 @@ from django.http import HttpRequest, HttpResponse, JsonResponse
 from django.shortcuts import render
 from google.oauth2.service_account import Credentials
 
-from cms.services.menu_sync import sync_menu_from_sheet
+from cms.services.menu_sync import MenuSyncError, sync_menu_from_sheet
 from core.decorators import staff_required
 
 SCOPES = ["https://www.googleapis.com/auth/spreadsheets"]
@@ -64,6 +64,10 @@ def cms_menu(request: HttpRequest) -> HttpResponse:
 
                 return JsonResponse({"status": "updated"})
 
+            except MenuSyncError as exc:
+                # The sheet has the row; the menu keeps its last good sync
+                return JsonResponse({"error": str(exc)}, status=400)
+
             except (ValueError, json.JSONDecodeError):
                 return JsonResponse(
                     {"error": "Invalid request payload"},
@@ -0,0 +1,30 @@
+"""
+Business day helpers.
+
+The cafe trades past midnight: anything sold before
+``BUSINESS_DAY_CUTOFF_HOUR`` (local time) belongs to the previous day's
+takings. Bills and orders store the result in ``business_date`` so
+reports filter on an indexed column instead of converting every
+``created_at`` to local time.
+"""
+
+from datetime import date, datetime, timedelta
+
+from django.conf import settings
+from django.db.models import F
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+
+def cutoff() -> timedelta:
+    return timedelta(hours=getattr(settings, "BUSINESS_DAY_CUTOFF_HOUR", 0))
+
+
+def business_date(moment: datetime | None = None) -> date:
+    """Business day of ``moment`` (default: now)."""
+    return (timezone.localtime(moment) - cutoff()).date()
+
+
+def business_date_expression(field="created_at"):
+    """SQL version of ``business_date()``, for backfills."""
+    return TruncDate(F(field) - cutoff())
@@ -0,0 +1,171 @@
+"""
+Every breakdown on the sales dashboard, without touching the raw bill
+tables.
+
+Item-level figures (items, hours, days, categories, tables) come from
+one ``GROUPING SETS`` scan of the ``SalesFact`` cube; weekdays are
+folded from the per-day rows in Python. Bill-level figures (count,
+sales, discount, GST, payment split) add up the ``DailySalesSummary``
+rollups.
+
+Days that have bills but no facts yet (history from before the cube,
+until ``rebuild_sales_facts --missing`` runs) are read from the bill
+tables in the same scan, so both dashboards show the same history.
+"""
+
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import connection
+from django.utils import timezone
+
+from administration.rollups import sales_by_day, sum_sales
+from core.business_day import cutoff
+from orders.models import Table
+
+from .cube import facts_select_sql
+from .models import SalesFact
+
+ZERO = Decimal("0.00")
+
+# GROUPING(item_name, hour, date, category_name, table_id):
+# a set bit means that column was rolled up in the row
+_ITEM, _HOUR, _DAY, _CATEGORY, _TABLE, _TOTAL = 15, 23, 27, 29, 30, 31
+
+
+def _table(model):
+    return connection.ops.quote_name(model._meta.db_table)
+
+
+_FACT_COLUMNS = "date, hour, item_name, category_name, table_id, quantity, revenue"
+
+
+def _source_sql(missing_days):
+    facts = f"""
+        SELECT {_FACT_COLUMNS} FROM {_table(SalesFact)}
+        WHERE date BETWEEN %(start)s AND %(end)s
+    """
+    if not missing_days:
+        return facts
+
+    live = facts_select_sql("b.business_date = ANY(%(missing)s)")
+    return f"{facts} UNION ALL SELECT {_FACT_COLUMNS} FROM ({live}) live"
+
+
+def _facts_sql(missing_days):
+    # Names are stored on the facts; only the table number is looked up
+    return f"""
+        WITH grouped AS (
+            SELECT
+                GROUPING(item_name, hour, date, category_name, table_id)
+                    AS grouping,
+                item_name, hour, date, category_name, table_id,
+                SUM(quantity) AS qty, SUM(revenue) AS revenue
+            FROM ({_source_sql(missing_days)}) facts
+            GROUP BY GROUPING SETS (
+                (), (item_name), (hour), (date), (category_name), (table_id)
+            )
+        )
+        SELECT g.grouping, g.item_name, g.hour, g.date, g.category_name,
+            t.number, g.qty, g.revenue
+        FROM grouped g
+        LEFT JOIN {_table(Table)} t ON t.id = g.table_id
+    """
+
+
+def _fetch(sql, params):
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def sales_breakdown(start, end) -> dict:
+    """
+    Dashboard figures for the dates ``start`` to ``end`` (inclusive).
+    Keys and row shapes match what ``dashboard/index.html`` expects.
+    """
+    # ── Bill level ──
+    by_day = sales_by_day(start, end)
+    totals = sum_sales(by_day.values())
+    total_bills = totals["bill_count"]
+    total_sales = totals["gross"]
+
+    split_total = total_sales - totals["cash"] - totals["upi"]
+    payment_split = [
+        {"payment_mode": mode, "revenue": revenue}
+        for mode, revenue in (
+            ("CASH", totals["cash"]),
+            ("UPI", totals["upi"]),
+            ("SPLIT", split_total),
+        )
+        if revenue
+    ]
+
+    # ── Item level ──
+    fact_days = set(
+        SalesFact.objects.between(start, end)
+        .values_list("date", flat=True)
+        .distinct()
+        .order_by()
+    )
+    missing_days = [
+        day
+        for day, day_totals in by_day.items()
+        if day_totals["bill_count"] and day not in fact_days
+    ]
+
+    total_qty = 0
+    items, hourly, daily, categories, tables = [], [], [], [], []
+    for grouping, item, hour, day, category, table, qty, revenue in _fetch(
+        _facts_sql(missing_days),
+        {
+            "start": start,
+            "end": end,
+            "missing": missing_days,
+            "tz": timezone.get_current_timezone_name(),
+        },
+    ):
+        if grouping == _TOTAL:
+            total_qty = qty or 0
+        elif grouping == _ITEM:
+            items.append({"item__name": item, "qty": qty, "revenue": revenue})
+        elif grouping == _HOUR:
+            hourly.append({"hour": hour, "revenue": revenue})
+        elif grouping == _DAY:
+            daily.append({"day": day, "revenue": revenue})
+        elif grouping == _CATEGORY:
+            categories.append(
+                {"item__category__name": category, "revenue": revenue, "qty": qty}
+            )
+        elif grouping == _TABLE:
+            tables.append({"bill__orders__table__number": table, "total_items": qty})
+
+    cutoff_hour = cutoff().seconds // 3600
+
+    # 1 = Sunday … 7 = Saturday, same as ExtractWeekDay
+    by_weekday = defaultdict(lambda: ZERO)
+    for row in daily:
+        by_weekday[row["day"].isoweekday() % 7 + 1] += row["revenue"]
+
+    return {
+        "total_bills": total_bills,
+        "total_sales": total_sales,
+        "total_discount": totals["discount"],
+        "total_gst": totals["gst"],
+        "total_qty": total_qty,
+        "avg_bill": total_sales / total_bills if total_bills else ZERO,
+        "payment_split": payment_split,
+        "top_items": sorted(items, key=lambda row: -row["qty"]),
+        "top_revenue_items": sorted(items, key=lambda row: -row["revenue"])[:10],
+        # Hours in trading order: after midnight comes last
+        "hourly_sales": sorted(
+            hourly, key=lambda row: (row["hour"] - cutoff_hour) % 24
+        ),
+        "daily_sales": sorted(daily, key=lambda row: row["day"]),
+        "weekly_sales": [
+            {"week": week, "revenue": revenue}
+            for week, revenue in sorted(by_weekday.items())
+        ],
+        "category_sales": sorted(categories, key=lambda row: -row["revenue"]),
+        "busiest_tables": sorted(tables, key=lambda row: -row["total_items"])[:10],
+    }
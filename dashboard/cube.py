@@ -0,0 +1,125 @@
+"""
+Maintenance of the ``SalesFact`` cube.
+
+Facts are kept per bill. ``refresh_bill_facts()`` runs inside the
+billing transaction that finalized a bill and replaces only that bill's
+rows, so its cost does not grow with the day's sales; a bill finalized
+again after an admin edit simply gets its rows replaced. Deleting a
+bill deletes its facts (cascade).
+
+``refresh_facts()`` rebuilds whole days (``rebuild_sales_facts``;
+``build_missing_days()`` only those with bills but no facts yet). It
+takes each day's advisory lock exclusively; bill refreshes take it
+shared, so they only wait for a rebuild of their day, never for each
+other.
+"""
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from billing.models import Bill, BillItem
+from home.models import Category, Item
+from orders.models import Order
+
+from .models import SalesFact
+
+_LOCK_KEY = "hashtext('sales-fact:' || d::date)"
+
+
+def _lock_days(start, end, shared=False):
+    function = "pg_advisory_xact_lock_shared" if shared else "pg_advisory_xact_lock"
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT {function}({_LOCK_KEY})"
+            " FROM generate_series(%s::date, %s::date, '1 day') AS d",
+            [start, end],
+        )
+
+
+def _table(model):
+    return connection.ops.quote_name(model._meta.db_table)
+
+
+def facts_select_sql(where):
+    """
+    The fact rows of the bills matching ``where`` (SQL on ``b``, the
+    bill), computed from the bill tables. Takes a ``tz`` parameter.
+    """
+    return f"""
+        SELECT
+            b.business_date AS date,
+            EXTRACT(HOUR FROM b.created_at AT TIME ZONE %(tz)s)::int AS hour,
+            b.id AS bill_id,
+            bi.item_id,
+            i.name AS item_name,
+            i.category_id,
+            c.name AS category_name,
+            b.payment_mode,
+            first_order.table_id,
+            SUM(bi.quantity) AS quantity,
+            SUM(bi.price * bi.quantity) AS revenue
+        FROM {_table(BillItem)} bi
+        JOIN {_table(Bill)} b ON b.id = bi.bill_id
+        JOIN {_table(Item)} i ON i.id = bi.item_id
+        JOIN {_table(Category)} c ON c.id = i.category_id
+        LEFT JOIN LATERAL (
+            SELECT o.table_id FROM {_table(Order)} o
+            WHERE o.bill_id = b.id ORDER BY o.id LIMIT 1
+        ) first_order ON TRUE
+        WHERE {where}
+        GROUP BY 1, 2, 3, 4, 5, 6, 7, 8, 9
+    """
+
+
+def _insert_facts(where, params) -> int:
+    sql = f"""
+        INSERT INTO {_table(SalesFact)}
+            (date, hour, bill_id, item_id, item_name, category_id,
+             category_name, payment_mode, table_id, quantity, revenue)
+        {facts_select_sql(where)}
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, {**params, "tz": timezone.get_current_timezone_name()})
+        return cursor.rowcount
+
+
+def refresh_bill_facts(bill) -> int:
+    """
+    Replace the facts of one bill. Returns the number of rows written.
+    """
+    with transaction.atomic():
+        _lock_days(bill.business_date, bill.business_date, shared=True)
+        SalesFact.objects.filter(bill_id=bill.id).delete()
+        return _insert_facts("b.id = %(bill)s", {"bill": bill.id})
+
+
+def refresh_facts(start, end=None) -> int:
+    """
+    Recompute the facts of the days ``start`` to ``end`` (inclusive).
+    Returns the number of fact rows written.
+    """
+    end = end or start
+
+    with transaction.atomic():
+        _lock_days(start, end)
+        SalesFact.objects.between(start, end).delete()
+        return _insert_facts(
+            "b.business_date BETWEEN %(start)s AND %(end)s",
+            {"start": start, "end": end},
+        )
+
+
+def build_missing_days(start, end) -> int:
+    """
+    Build the facts of the days ``start`` to ``end`` that have bills but
+    no facts (history from before the cube). Returns the number of days.
+    """
+    days = set(
+        Bill.objects.filter(business_date__range=(start, end))
+        .values_list("business_date", flat=True)
+        .distinct()
+    ) - set(SalesFact.objects.between(start, end).values_list("date", flat=True))
+
+    for day in sorted(days):
+        refresh_facts(day)
+    return len(days)
@@ -0,0 +1,160 @@
+import random
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from administration.rollups import build_missing_days
+from billing.models import Bill, BillItem
+from billing.pricing import compute_totals
+from core.business_day import business_date
+from dashboard.cube import refresh_facts
+from dashboard.views import dashboard_home
+from home.models import Item
+from orders.models import Order, Table
+
+GST = Decimal("5.00")
+
+
+class Command(BaseCommand):
+    help = (
+        "Load a synthetic year of bills, time the sales dashboard on it, "
+        "then roll everything back"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--year", type=int, default=2000)
+        parser.add_argument("--bills-per-day", type=int, default=150)
+        parser.add_argument("--items-per-bill", type=int, default=3)
+        parser.add_argument(
+            "--repeat", type=int, default=3, help="Timed page loads per mode"
+        )
+
+    def handle(self, *args, **options):
+        items = list(Item.objects.only("id")[:60])
+        if not items:
+            raise CommandError("Load the menu first (the benchmark bills use it)")
+
+        with transaction.atomic():
+            started = time.perf_counter()
+            bill_count, line_count = self._load(items, options)
+            self.stdout.write(
+                f"Loaded {bill_count} bills / {line_count} items "
+                f"in {time.perf_counter() - started:.1f}s"
+            )
+
+            # bulk_create skips the bill_finalized receivers
+            started = time.perf_counter()
+            first, last = date(options["year"], 1, 1), date(options["year"], 12, 31)
+            facts = refresh_facts(first, last)
+            build_missing_days(first, last)
+            self.stdout.write(
+                f"Built {facts} fact rows and the daily rollups "
+                f"in {time.perf_counter() - started:.1f}s"
+            )
+
+            self._time_page(
+                {"mode": "year", "year": options["year"]}, options["repeat"]
+            )
+            self._time_page(
+                {"mode": "month", "year": options["year"], "month": 6},
+                options["repeat"],
+            )
+            self._time_page(
+                {"mode": "day", "date": f"{options['year']}-06-15"}, options["repeat"]
+            )
+
+            # Nothing generated here is kept
+            transaction.set_rollback(True)
+
+    def _load(self, items, options):
+        rng = random.Random(options["year"])
+        year = options["year"]
+        # Own table names, kept apart from the real ones
+        tables = [Table(number=f"BENCH{n}") for n in range(1, 13)]
+        Table.objects.bulk_create(tables)
+
+        bills, lines = [], []
+        day = date(year, 1, 1)
+        while day.year == year:
+            for n in range(options["bills_per_day"]):
+                created_at = timezone.make_aware(
+                    datetime.combine(day, datetime.min.time())
+                    + timedelta(hours=rng.randint(9, 22), minutes=rng.randint(0, 59))
+                )
+                bill_lines = [
+                    (
+                        rng.choice(items),
+                        Decimal(rng.choice([60, 90, 120, 150, 220])),
+                        rng.randint(1, 3),
+                    )
+                    for _ in range(options["items_per_bill"])
+                ]
+                totals = compute_totals(
+                    lines=[(price, qty) for _, price, qty in bill_lines],
+                    discount_amount=Decimal("0"),
+                    gst_percentage=GST,
+                )
+                bill = Bill(
+                    bill_number=f"B{day:%Y%m%d}{n:05d}",
+                    customer_name="Bench",
+                    customer_phone="",
+                    payment_mode=rng.choice(Bill.PaymentMode.values),
+                    gst_percentage=GST,
+                    created_at=created_at,
+                    business_date=business_date(created_at),
+                    **totals.as_fields(),
+                )
+                bills.append(bill)
+                lines.append(bill_lines)
+            day += timedelta(days=1)
+
+        Bill.objects.bulk_create(bills, batch_size=2000)
+
+        bill_items = [
+            BillItem(bill=bill, item=item, price=price, quantity=qty)
+            for bill, bill_lines in zip(bills, lines)
+            for item, price, qty in bill_lines
+        ]
+        BillItem.objects.bulk_create(bill_items, batch_size=5000)
+
+        orders = [
+            Order(
+                table=rng.choice(tables),
+                bill=bill,
+                customer_name="Bench",
+                is_billed=True,
+                created_at=bill.created_at,
+                business_date=bill.business_date,
+            )
+            for bill in bills
+        ]
+        Order.objects.bulk_create(orders, batch_size=2000)
+
+        return len(bills), len(bill_items)
+
+    def _time_page(self, params, repeat):
+        request = RequestFactory().get("/dashboard/", params)
+        request.user = get_user_model()(username="bench", is_staff=True)
+
+        timings = []
+        for _ in range(repeat):
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                response = dashboard_home(request)
+                timings.append(time.perf_counter() - started)
+
+        self.stdout.write(
+            f"mode={params['mode']:<6} {min(timings) * 1000:9.1f} ms "
+            f"(best of {repeat}), {len(queries)} queries, status {response.status_code}"
+        )
+
+
+# python manage.py benchmark_dashboard
+# python manage.py benchmark_dashboard --bills-per-day 300 --repeat 5
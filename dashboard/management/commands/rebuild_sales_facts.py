@@ -0,0 +1,66 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Min
+
+from billing.models import Bill
+from core.business_day import business_date
+from dashboard.cube import build_missing_days, refresh_facts
+
+
+class Command(BaseCommand):
+    help = "Recompute SalesFact rows for a date range"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--from", dest="start", help="First day (YYYY-MM-DD)")
+        parser.add_argument("--to", dest="end", help="Last day (YYYY-MM-DD)")
+        parser.add_argument(
+            "--missing",
+            action="store_true",
+            help="Only build days that have bills but no facts yet",
+        )
+
+    def handle(self, *args, **options):
+        first = Bill.objects.aggregate(first=Min("business_date"))["first"]
+        if first is None and not options["start"]:
+            self.stdout.write("No bills yet")
+            return
+
+        try:
+            start = date.fromisoformat(options["start"]) if options["start"] else first
+            end = (
+                date.fromisoformat(options["end"])
+                if options["end"]
+                else business_date()
+            )
+        except ValueError:
+            raise CommandError("Dates must look like 2025-01-31")
+
+        if options["missing"]:
+            built = build_missing_days(start, end)
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Built {built} missing day(s) from {start} to {end}"
+                )
+            )
+            return
+
+        # A month per transaction keeps each rebuild short
+        written = 0
+        chunk_start = start
+        while chunk_start <= end:
+            next_month = (chunk_start.replace(day=1) + timedelta(days=31)).replace(
+                day=1
+            )
+            chunk_end = min(next_month - timedelta(days=1), end)
+            written += refresh_facts(chunk_start, chunk_end)
+            chunk_start = next_month
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Wrote {written} fact row(s) from {start} to {end}")
+        )
+
+
+# python manage.py rebuild_sales_facts
+# python manage.py rebuild_sales_facts --missing
+# python manage.py rebuild_sales_facts --from 2025-01-01 --to 2025-01-31
@@ -1 +1,84 @@
-# Create your models here.
+from decimal import Decimal
+
+from django.db import models
+from django.db.models import Sum
+from django.db.models.functions import Coalesce
+
+from billing.models import Bill
+from home.models import Category, Item
+from orders.models import Table
+
+
+class SalesFactQuerySet(models.QuerySet):
+    # Dimension name -> field used when rolling up to it
+    DIMENSIONS = {
+        "date": "date",
+        "hour": "hour",
+        "item": "item_name",
+        "category": "category_name",
+        "payment_mode": "payment_mode",
+        "table": "table__number",
+    }
+
+    def between(self, start, end=None):
+        """Facts from business day ``start`` to ``end`` (inclusive)."""
+        return self.filter(date__range=(start, end or start))
+
+    def rollup(self, *dimensions):
+        """
+        ``qty`` and ``revenue`` per combination of ``dimensions``, e.g.
+        ``rollup("item")`` or ``rollup("date", "payment_mode")``.
+        """
+        fields = [self.DIMENSIONS[name] for name in dimensions]
+        return (
+            self.values(*fields)
+            .annotate(qty=Sum("quantity"), revenue=Sum("revenue"))
+            .order_by(*fields)
+        )
+
+    def totals(self) -> dict:
+        return self.aggregate(
+            qty=Coalesce(Sum("quantity"), 0),
+            revenue=Coalesce(Sum("revenue"), Decimal("0")),
+        )
+
+
+class SalesFact(models.Model):
+    """
+    Items sold, pre-aggregated per (bill, item), with the bill's business
+    date, local hour, payment mode and table, and the item's category.
+    Revenue is price x quantity, before the bill discount and GST.
+
+    Derived data: a bill's facts are replaced whenever it is finalized
+    and go with it when it is deleted (see ``dashboard.cube``);
+    ``python manage.py rebuild_sales_facts`` recomputes any range. Item
+    and category are kept by id and name without a database constraint,
+    so menu entries can still be deleted.
+    """
+
+    date = models.DateField(db_index=True)
+    hour = models.PositiveSmallIntegerField()
+    bill = models.ForeignKey(Bill, on_delete=models.CASCADE, related_name="+")
+    item = models.ForeignKey(
+        Item, on_delete=models.DO_NOTHING, db_constraint=False, related_name="+"
+    )
+    item_name = models.CharField(max_length=150)
+    category = models.ForeignKey(
+        Category, on_delete=models.DO_NOTHING, db_constraint=False, related_name="+"
+    )
+    category_name = models.CharField(max_length=100)
+    payment_mode = models.CharField(max_length=10, choices=Bill.PaymentMode.choices)
+    # Table of the bill's first order; null for counter bills
+    table = models.ForeignKey(
+        Table, on_delete=models.SET_NULL, null=True, blank=True, related_name="+"
+    )
+    quantity = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0"))
+
+    objects = SalesFactQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = "Sales Fact"
+
+    def __str__(self):
+        return f"{self.date} {self.hour:02d}h — {self.item_name} x {self.quantity}"
@@ -0,0 +1,11 @@
+from billing.signals import bill_finalized
+
+from .cube import refresh_bill_facts
+
+
+def refresh_sales_facts(sender, bill, **kwargs):
+    refresh_bill_facts(bill)
+
+
+# A deleted bill's facts are removed by the cascade
+bill_finalized.connect(refresh_sales_facts, dispatch_uid="sales-facts-finalized")
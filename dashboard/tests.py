@@ -1 +1,147 @@
-# Create your tests here.
+from datetime import timedelta
+from decimal import Decimal
+
+from django.test import TestCase
+from django.utils import timezone
+
+from billing.models import Bill, BillItem
+from core.business_day import business_date
+from dashboard.aggregation import sales_breakdown
+from dashboard.cube import build_missing_days, refresh_bill_facts, refresh_facts
+from dashboard.models import SalesFact
+from home.models import Category, Item
+
+
+class SalesFactTests(TestCase):
+    def setUp(self):
+        self.coffee = Category.objects.create(name="Coffee")
+        self.latte = Item.objects.create(category=self.coffee, name="Latte")
+        self.mocha = Item.objects.create(category=self.coffee, name="Mocha")
+
+    def make_bill(self, *lines, payment_mode="CASH"):
+        bill = Bill.objects.create(
+            customer_name="Asha",
+            customer_phone="9999999999",
+            payment_mode=payment_mode,
+            gst_percentage=Decimal("5.00"),
+        )
+        items = BillItem.objects.bulk_create(
+            BillItem(
+                bill=bill, item=item, size=size, price=Decimal(price), quantity=qty
+            )
+            for item, size, price, qty in lines
+        )
+        bill.finalize(items=items)
+        return bill
+
+    def facts(self, bill):
+        return sorted(
+            SalesFact.objects.filter(bill=bill).values_list(
+                "item_name", "category_name", "quantity", "revenue"
+            )
+        )
+
+    def test_finalize_writes_the_bills_facts(self):
+        bill = self.make_bill(
+            (self.latte, "S", "100", 1),
+            (self.latte, "L", "150", 2),
+            (self.mocha, "M", "120", 1),
+        )
+
+        self.assertEqual(
+            self.facts(bill),
+            [
+                ("Latte", "Coffee", 3, Decimal("400.00")),
+                ("Mocha", "Coffee", 1, Decimal("120.00")),
+            ],
+        )
+
+    def test_only_the_finalized_bill_is_touched(self):
+        other = self.make_bill((self.mocha, "M", "120", 1))
+        other_ids = list(SalesFact.objects.values_list("id", flat=True))
+        bill = self.make_bill((self.latte, "M", "100", 1))
+
+        # Edited in the admin and finalized again
+        bill.items.update(quantity=4)
+        # Savepoint, lock, delete, insert, release: however busy the day
+        with self.assertNumQueries(5):
+            refresh_bill_facts(bill)
+
+        self.assertEqual(self.facts(bill), [("Latte", "Coffee", 4, Decimal("400.00"))])
+        self.assertEqual(
+            list(SalesFact.objects.filter(bill=other).values_list("id", flat=True)),
+            other_ids,
+        )
+
+    def test_deleted_bill_takes_its_facts(self):
+        bill = self.make_bill((self.latte, "M", "100", 1))
+        bill.delete()
+
+        self.assertFalse(SalesFact.objects.exists())
+
+    def test_names_are_kept_from_the_sale(self):
+        bill = self.make_bill((self.latte, "M", "100", 1))
+        Item.objects.filter(id=self.latte.id).update(name="Caffe Latte")
+
+        self.assertEqual(self.facts(bill), [("Latte", "Coffee", 1, Decimal("100.00"))])
+
+    def test_rebuild_matches_incremental(self):
+        self.make_bill((self.latte, "M", "100", 2), (self.mocha, "M", "120", 1))
+        self.make_bill((self.latte, "M", "100", 1), payment_mode="UPI")
+        incremental = sorted(
+            SalesFact.objects.values_list(
+                "bill_id", "item_id", "payment_mode", "quantity", "revenue"
+            )
+        )
+        day = Bill.objects.first().business_date
+
+        self.assertEqual(refresh_facts(day), 3)
+        self.assertEqual(
+            sorted(
+                SalesFact.objects.values_list(
+                    "bill_id", "item_id", "payment_mode", "quantity", "revenue"
+                )
+            ),
+            incremental,
+        )
+
+
+class SalesBreakdownTests(TestCase):
+    def setUp(self):
+        coffee = Category.objects.create(name="Coffee")
+        self.latte = Item.objects.create(category=coffee, name="Latte")
+        self.today = business_date()
+
+    def make_bill(self, days_ago, qty):
+        bill = Bill.objects.create(
+            customer_name="Asha",
+            customer_phone="9999999999",
+            gst_percentage=Decimal("5.00"),
+            created_at=timezone.now() - timedelta(days=days_ago),
+        )
+        items = BillItem.objects.bulk_create(
+            [BillItem(bill=bill, item=self.latte, price=Decimal("100"), quantity=qty)]
+        )
+        bill.finalize(items=items)
+
+    def test_history_without_facts_is_read_from_the_bills(self):
+        self.make_bill(days_ago=3, qty=2)
+        self.make_bill(days_ago=1, qty=1)
+        start = self.today - timedelta(days=6)
+        with_facts = sales_breakdown(start, self.today)
+
+        # Bills from before the cube existed
+        SalesFact.objects.filter(date=self.today - timedelta(days=3)).delete()
+
+        self.assertEqual(sales_breakdown(start, self.today), with_facts)
+        self.assertEqual(with_facts["total_qty"], 3)
+        self.assertEqual(
+            with_facts["top_items"],
+            [{"item__name": "Latte", "qty": 3, "revenue": Decimal("300.00")}],
+        )
+        # Read only
+        self.assertEqual(SalesFact.objects.count(), 1)
+
+        self.assertEqual(build_missing_days(start, self.today), 1)
+        self.assertEqual(SalesFact.objects.count(), 2)
+        self.assertEqual(sales_breakdown(start, self.today), with_facts)
@@ -1,21 +1,20 @@
-from datetime import date
-from decimal import Decimal
+from datetime import date, timedelta
 
-from django.db.models import DecimalField, ExpressionWrapper, F, Sum
-from django.db.models.functions import ExtractHour, ExtractWeekDay, TruncDay
 from django.shortcuts import render
-from django.utils.timezone import localdate
 
-from billing.models import Bill, BillItem
+from core.business_day import business_date
 from core.decorators import staff_required
 
+from .aggregation import sales_breakdown
+
 
 @staff_required
 def dashboard_home(request):
     mode = request.GET.get("mode", "day")
 
-    today = localdate()
-    bills = Bill.objects.none()
+    today = business_date()
+    # Empty range unless a valid mode is picked
+    start, end = today, today - timedelta(days=1)
     label = ""
 
     if mode == "day":
@@ -26,104 +25,25 @@ def dashboard_home(request):
         else:
             selected_date = today
 
-        bills = Bill.objects.filter(created_at__date=selected_date)
+        start = end = selected_date
         label = selected_date.strftime("%d %b %Y")
 
     elif mode == "month":
         selected_month = int(request.GET.get("month", today.month))
         selected_year = int(request.GET.get("year", today.year))
 
-        bills = Bill.objects.filter(
-            created_at__year=selected_year,
-            created_at__month=selected_month,
-        )
+        start = date(selected_year, selected_month, 1)
+        end = (start + timedelta(days=31)).replace(day=1) - timedelta(days=1)
 
-        label = f"{date(selected_year, selected_month, 1).strftime('%B %Y')}"
+        label = f"{start.strftime('%B %Y')}"
 
     elif mode == "year":
         selected_year = int(request.GET.get("year", today.year))
-        bills = Bill.objects.filter(created_at__year=selected_year)
+        start, end = date(selected_year, 1, 1), date(selected_year, 12, 31)
         label = str(selected_year)
 
-    revenue_expr = ExpressionWrapper(
-        F("price") * F("quantity"),
-        output_field=DecimalField(max_digits=12, decimal_places=2),
-    )
-
-    total_bills = bills.count()
-
-    total_sales = Decimal("0.00")
-    total_discount = Decimal("0.00")
-    total_gst = Decimal("0.00")
-
-    for bill in bills:
-        total_sales += bill.total_amount()
-        total_discount += bill.discount_amount
-        total_gst += bill.gst_amount()
-
-    total_qty = (
-        BillItem.objects.filter(bill__in=bills).aggregate(qty=Sum("quantity"))["qty"]
-        or 0
-    )
-
-    avg_bill = total_sales / total_bills if total_bills > 0 else Decimal("0.00")
-
-    top_items = (
-        BillItem.objects.filter(bill__in=bills)
-        .values("item__name")
-        .annotate(qty=Sum("quantity"), revenue=Sum(revenue_expr))
-        .order_by("-qty")
-    )
-
-    payment_split = bills.values("payment_mode").annotate(revenue=Sum("items__price"))
-
-    hourly_sales = (
-        BillItem.objects.filter(bill__in=bills)
-        .annotate(hour=ExtractHour("bill__created_at"))
-        .values("hour")
-        .annotate(revenue=Sum(revenue_expr))
-        .order_by("hour")
-    )
-
-    daily_sales = (
-        BillItem.objects.filter(bill__in=bills)
-        .annotate(day=TruncDay("bill__created_at"))
-        .values("day")
-        .annotate(revenue=Sum(revenue_expr))
-        .order_by("day")
-    )
-
-    weekly_sales = (
-        BillItem.objects.filter(bill__in=bills)
-        .annotate(week=ExtractWeekDay("bill__created_at"))
-        .values("week")
-        .annotate(revenue=Sum(revenue_expr))
-        .order_by("week")
-    )
-
-    top_revenue_items = (
-        BillItem.objects.filter(bill__in=bills)
-        .values("item__name")
-        .annotate(revenue=Sum(revenue_expr))
-        .order_by("-revenue")[:10]
-    )
-
-    busiest_tables = (
-        BillItem.objects.filter(bill__in=bills)
-        .values("bill__orders__table__number")
-        .annotate(total_items=Sum("quantity"))
-        .order_by("-total_items")[:10]
-    )
-
-    category_sales = (
-        BillItem.objects.filter(bill__in=bills)
-        .values("item__category__name")
-        .annotate(
-            revenue=Sum(revenue_expr),
-            qty=Sum("quantity"),
-        )
-        .order_by("-revenue")
-    )
+    # From the sales cube and daily rollups, not the raw bills
+    breakdown = sales_breakdown(start, end)
 
     return render(
         request,
@@ -131,20 +51,7 @@ def dashboard_home(request):
         {
             "mode": mode,
             "label": label,
-            "total_sales": total_sales,
-            "total_bills": total_bills,
-            "total_discount": total_discount,
-            "total_gst": total_gst,
-            "total_qty": total_qty,
-            "avg_bill": avg_bill,
-            "top_items": top_items,
-            "payment_split": payment_split,
-            "hourly_sales": hourly_sales,
-            "daily_sales": daily_sales,
-            "weekly_sales": weekly_sales,
-            "top_revenue_items": top_revenue_items,
-            "busiest_tables": busiest_tables,
-            "category_sales": category_sales,
+            **breakdown,
             "months": range(1, 13),
             "selected_date": request.GET.get("date", today.isoformat()),
             "selected_month": int(request.GET.get("month", today.month)),
@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import Category, ContactMessage, Item, ItemSize
+from .models import Category, ContactMessage, Item, ItemSize, RemoteImage
 
 
 # ---------- CATEGORY ADMIN ----------
@@ -47,6 +47,18 @@ class ItemSizeAdmin(admin.ModelAdmin):
     ordering = ("item", "size")
 
 
+# ---------- REMOTE IMAGE ADMIN (local copies, see home.remote_images) ----------
+@admin.register(RemoteImage)
+class RemoteImageAdmin(admin.ModelAdmin):
+    list_display = ("url", "path", "fetched_at", "checked_at", "last_error")
+    search_fields = ("url",)
+    ordering = ("url",)
+    readonly_fields = [field.name for field in RemoteImage._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
+
+
 # ---------- CONTACT MESSAGE ADMIN ----------
 @admin.register(ContactMessage)
 class ContactMessageAdmin(admin.ModelAdmin):
@@ -0,0 +1,218 @@
+"""
+In-process snapshot of the menu.
+
+Items, sizes, categories and the cafe config change a few times a day
+but are read on every POS page load and every bill. ``get_catalog()``
+returns an immutable ``MenuCatalog`` built once per catalog version.
+
+The version lives in the shared Django cache, so every worker process
+sees a bump and rebuilds its own snapshot on the next read. Model
+signals (see ``home.signals``) and the menu import/sync services call
+``bump_catalog_version()`` after their transaction commits.
+"""
+
+import threading
+import time
+from dataclasses import dataclass
+from decimal import Decimal
+from pathlib import PurePosixPath
+from types import MappingProxyType
+from typing import Mapping, Optional, Tuple
+
+from django.apps import apps
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.urls import reverse
+
+from home.models import Category, Item, ItemSize, RemoteImage
+
+CATALOG_VERSION_KEY = "menu_catalog:version"
+
+
+@dataclass(frozen=True)
+class CatalogSize:
+    size: str
+    label: str
+    price: Decimal
+
+
+@dataclass(frozen=True)
+class CatalogCategory:
+    id: int
+    name: str
+    image: str
+    image_hash: str
+    is_active: bool
+
+    @property
+    def image_url(self) -> str:
+        return _image_url(self.image)
+
+
+@dataclass(frozen=True)
+class CatalogItem:
+    id: int
+    name: str
+    description: str
+    station: str
+    category_id: int
+    category_name: str
+    image: str
+    image_hash: str
+    is_available: bool
+    sizes: Tuple[CatalogSize, ...]
+    prices: Mapping[str, Decimal]
+
+    @property
+    def image_url(self) -> str:
+        return _image_url(self.image)
+
+    def price_for_size(self, size: str) -> Decimal:
+        """
+        Return price for a given size.
+        Raises ValidationError if size is invalid.
+        """
+        try:
+            return self.prices[size]
+        except KeyError:
+            raise ValidationError(f"Invalid size '{size}' for item '{self.name}'")
+
+
+@dataclass(frozen=True)
+class MenuCatalog:
+    version: int
+    items: Mapping[int, CatalogItem]
+    categories: Mapping[int, CatalogCategory]
+    cafe_name: str
+    gst_percentage: Decimal
+
+    def item(self, item_id: int) -> CatalogItem:
+        try:
+            return self.items[item_id]
+        except KeyError:
+            raise ValidationError(f"Unknown item '{item_id}'")
+
+    def available_items(self) -> Tuple[CatalogItem, ...]:
+        return tuple(item for item in self.items.values() if item.is_available)
+
+    def active_categories(self) -> Tuple[CatalogCategory, ...]:
+        return tuple(cat for cat in self.categories.values() if cat.is_active)
+
+
+def _image_url(name: str) -> str:
+    if not name:
+        return ""
+    # Sheet/JSON imports store remote Google URLs in the ImageField;
+    # "/images/..." is the local copy of one (see home.remote_images)
+    if name.startswith(("http", "/")):
+        return name
+    return default_storage.url(name)
+
+
+def _build_catalog(version: int) -> MenuCatalog:
+    local_copies = {
+        url: reverse("home:cached_image", args=[PurePosixPath(path).name])
+        for url, path in RemoteImage.objects.exclude(path="").values_list("url", "path")
+    }
+
+    categories = {
+        cat.id: CatalogCategory(
+            id=cat.id,
+            name=cat.name,
+            image=local_copies.get(cat.image.name, cat.image.name or ""),
+            image_hash=cat.image_hash,
+            is_active=cat.is_active,
+        )
+        for cat in Category.objects.order_by("id")
+    }
+
+    sizes_by_item = {}
+    for item_size in ItemSize.objects.order_by("id"):
+        sizes_by_item.setdefault(item_size.item_id, []).append(
+            CatalogSize(
+                size=item_size.size,
+                label=item_size.get_size_display(),
+                price=item_size.price,
+            )
+        )
+
+    items = {}
+    for item in Item.objects.order_by("id"):
+        sizes = tuple(sizes_by_item.get(item.id, ()))
+        items[item.id] = CatalogItem(
+            id=item.id,
+            name=item.name,
+            description=item.description,
+            station=item.station,
+            category_id=item.category_id,
+            category_name=categories[item.category_id].name,
+            image=local_copies.get(item.image.name, item.image.name or ""),
+            image_hash=item.image_hash,
+            is_available=item.is_available,
+            sizes=sizes,
+            prices=MappingProxyType({s.size: s.price for s in sizes}),
+        )
+
+    cafe = apps.get_model("billing", "CafeConfig").objects.first()
+
+    return MenuCatalog(
+        version=version,
+        items=MappingProxyType(items),
+        categories=MappingProxyType(categories),
+        cafe_name=cafe.cafe_name if cafe else "",
+        gst_percentage=cafe.gst_percentage if cafe else Decimal("0"),
+    )
+
+
+_snapshot: Optional[MenuCatalog] = None
+_lock = threading.Lock()
+
+
+def catalog_version() -> int:
+    """
+    Current shared catalog version.
+    """
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        # First read after a cache flush: start a new version so that no
+        # process keeps serving a snapshot built before the flush.
+        cache.add(CATALOG_VERSION_KEY, time.time_ns(), None)
+        version = cache.get(CATALOG_VERSION_KEY)
+    return version
+
+
+def get_catalog() -> MenuCatalog:
+    """
+    Return the menu snapshot, rebuilding it if the version moved on.
+    """
+    global _snapshot
+
+    version = catalog_version()
+    snapshot = _snapshot
+    if snapshot is not None and snapshot.version == version:
+        return snapshot
+
+    with _lock:
+        if _snapshot is None or _snapshot.version != version:
+            _snapshot = _build_catalog(version)
+        return _snapshot
+
+
+def _bump() -> None:
+    global _snapshot
+
+    # Versions are nanosecond timestamps so they keep increasing even
+    # if the cache is cleared or the server restarts.
+    current = cache.get(CATALOG_VERSION_KEY) or 0
+    cache.set(CATALOG_VERSION_KEY, max(time.time_ns(), current + 1), None)
+    _snapshot = None
+
+
+def bump_catalog_version() -> None:
+    """
+    Invalidate every process's snapshot once the current transaction
+    commits (immediately when not in a transaction).
+    """
+    transaction.on_commit(_bump)
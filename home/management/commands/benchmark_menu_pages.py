@@ -0,0 +1,66 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import Client
+
+from home.catalog import bump_catalog_version
+
+
+class Command(BaseCommand):
+    help = (
+        "Requests/sec for the public menu pages as an anonymous visitor: "
+        "full responses and conditional (If-None-Match) ones"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=300)
+        parser.add_argument(
+            "--path",
+            action="append",
+            dest="paths",
+            help="Page to load (repeatable). Default: /menu/ and /",
+        )
+
+    def handle(self, *args, **options):
+        client = Client()
+        count = options["requests"]
+
+        for path in options["paths"] or ["/menu/", "/"]:
+            # First visitor after a menu change
+            bump_catalog_version()
+            started = time.perf_counter()
+            response = client.get(path)
+            first_ms = (time.perf_counter() - started) * 1000
+
+            line = (
+                f"{path:<12} status {response.status_code}, "
+                f"{len(response.content) // 1024} KB | "
+                f"first {first_ms:7.1f} ms | "
+                f"{self._rate(lambda path=path: client.get(path), count):8.1f} req/s"
+            )
+
+            etag = response.get("ETag")
+            if etag:
+                not_modified = client.get(path, HTTP_IF_NONE_MATCH=etag)
+                rate = self._rate(
+                    lambda path=path, etag=etag: client.get(
+                        path, HTTP_IF_NONE_MATCH=etag
+                    ),
+                    count,
+                )
+                line += f" | {not_modified.status_code}: {rate:8.1f} req/s"
+            else:
+                line += " | no ETag"
+
+            self.stdout.write(line)
+
+    @staticmethod
+    def _rate(request, count):
+        started = time.perf_counter()
+        for _ in range(count):
+            request()
+        return count / (time.perf_counter() - started)
+
+
+# python manage.py benchmark_menu_pages
+# python manage.py benchmark_menu_pages --requests 1000 --path /menu/
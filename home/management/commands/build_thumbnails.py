@@ -0,0 +1,87 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from PIL import Image
+
+from home.catalog import bump_catalog_version
+from home.models import Category, Item
+from home.remote_images import cached_copy
+from utils.thumbnails import build_derivatives, local_source
+
+
+class Command(BaseCommand):
+    help = "Make the resized copies of every local item and category image"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Worker processes (default: one per CPU)",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Rewrite copies that already exist (after changing sizes/quality)",
+        )
+
+    def handle(self, *args, **options):
+        # Same file can back several rows: resize it once
+        rows_by_source = {}
+        remote = 0
+        for model in (Category, Item):
+            for obj in model.objects.exclude(image="").exclude(image__isnull=True):
+                source = local_source(obj.image)
+                if not source and obj.image.name.startswith("http"):
+                    # Downloaded by cache_remote_images, or not yet
+                    source = cached_copy(obj.image.name)
+                    remote += not source
+                if source:
+                    rows_by_source.setdefault(source, []).append(obj)
+
+        started = time.perf_counter()
+        changed, failed = {Category: [], Item: []}, 0
+        with ProcessPoolExecutor(max_workers=options["workers"]) as pool:
+            futures = {
+                pool.submit(
+                    build_derivatives, source, settings.MEDIA_ROOT, options["force"]
+                ): source
+                for source in rows_by_source
+            }
+            for future in as_completed(futures):
+                source = futures[future]
+                try:
+                    image_hash = future.result()
+                except (OSError, Image.DecompressionBombError) as exc:
+                    failed += 1
+                    self.stderr.write(f"{source}: {exc}")
+                    continue
+
+                for obj in rows_by_source[source]:
+                    if obj.image_hash != image_hash:
+                        obj.image_hash = image_hash
+                        changed[type(obj)].append(obj)
+
+        with transaction.atomic():
+            for model, objs in changed.items():
+                model.objects.bulk_update(objs, ["image_hash"], batch_size=500)
+            # bulk_update sends no post_save
+            bump_catalog_version()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{len(rows_by_source)} images in "
+                f"{time.perf_counter() - started:.1f}s "
+                f"({options['workers']} workers): "
+                f"{sum(map(len, changed.values()))} rows updated, {failed} failed, "
+                f"{remote} remote URLs not downloaded yet"
+            )
+        )
+
+
+# python manage.py build_thumbnails
+# python manage.py build_thumbnails --workers 2 --force
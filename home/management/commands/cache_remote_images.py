@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from home.remote_images import cache_remote_images
+
+
+class Command(BaseCommand):
+    help = "Download remote (Google) menu images so the menu serves local copies"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--refresh",
+            action="store_true",
+            help="Also ask the origin whether already downloaded images changed",
+        )
+
+    def handle(self, *args, **options):
+        outcomes = cache_remote_images(refresh=options["refresh"])
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                ", ".join(
+                    f"{outcomes[key]} {key}"
+                    for key in ("fetched", "unchanged", "skipped", "failed")
+                )
+            )
+        )
+
+
+# python manage.py cache_remote_images
+# python manage.py cache_remote_images --refresh
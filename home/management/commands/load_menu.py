@@ -2,6 +2,7 @@ from pathlib import Path
 
 from django.core.management.base import BaseCommand, CommandError
 
+from home.remote_images import cache_remote_images
 from home.utils.menu_loader import load_menu_from_json
 
 
@@ -34,6 +35,12 @@ class Command(BaseCommand):
 
         self.stdout.write(self.style.SUCCESS("Menu loaded successfully"))
 
+        # New remote image URLs: download them now the import is saved
+        outcomes = cache_remote_images()
+        self.stdout.write(
+            f"Images: {outcomes['fetched']} downloaded, {outcomes['failed']} failed"
+        )
+
 
 # python manage.py load_menu --path home/fixtures/menu_data.json
 # python manage.py load_menu --path home/fixtures/menu_data.json --clear
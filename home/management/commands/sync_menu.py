@@ -1,13 +1,54 @@
-from django.core.management.base import BaseCommand
-from django.db import transaction
+from django.core.management.base import BaseCommand, CommandError
 
-from cms.services.menu_sync import sync_menu_from_sheet
+from cms.services.menu_sync import (
+    MenuSyncError,
+    rows_from_csv,
+    sync_menu,
+    sync_menu_from_sheet,
+)
+from home.remote_images import cache_remote_images
 
 
 class Command(BaseCommand):
     help = "Sync menu from Google Sheet"
 
-    @transaction.atomic
-    def handle(self, *args, **kwargs):
-        sync_menu_from_sheet()
-        self.stdout.write(self.style.SUCCESS("Menu synced"))
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--csv",
+            help="Read the rows from a CSV export of the sheet instead",
+        )
+        parser.add_argument(
+            "--remove-missing",
+            action="store_true",
+            help="Delete sizes and make items unavailable that are not in the sheet",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            if options["csv"]:
+                report = sync_menu(
+                    rows_from_csv(options["csv"]),
+                    remove_missing=options["remove_missing"],
+                )
+            else:
+                report = sync_menu_from_sheet(remove_missing=options["remove_missing"])
+        except MenuSyncError as exc:
+            raise CommandError(str(exc))
+
+        if options["verbosity"] > 1:
+            for name in ("added", "updated", "removed"):
+                for line in getattr(report, name):
+                    self.stdout.write(f"{name:<8} {line}")
+
+        self.stdout.write(self.style.SUCCESS(f"Menu synced: {report}"))
+
+        # New remote image URLs: download them now the sync is saved
+        outcomes = cache_remote_images()
+        self.stdout.write(
+            f"Images: {outcomes['fetched']} downloaded, {outcomes['failed']} failed"
+        )
+
+
+# python manage.py sync_menu
+# python manage.py sync_menu --csv cms/fixtures/menu_sheet.csv -v 2
+# python manage.py sync_menu --remove-missing
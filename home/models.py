@@ -10,6 +10,8 @@ class Category(models.Model):
     image = models.ImageField(
         upload_to="category_images/", blank=True, null=True, max_length=500
     )
+    # sha256 of the local image; its resized copies live under thumbs/
+    image_hash = models.CharField(max_length=64, blank=True, default="", editable=False)
     is_active = models.BooleanField(default=True)
 
     def __str__(self) -> str:
@@ -31,6 +33,8 @@ class Item(models.Model):
     image = models.ImageField(
         upload_to="item_images/", blank=True, null=True, max_length=500
     )
+    # sha256 of the local image; its resized copies live under thumbs/
+    image_hash = models.CharField(max_length=64, blank=True, default="", editable=False)
 
     station = models.CharField(
         max_length=20,
@@ -40,6 +44,9 @@ class Item(models.Model):
     )
 
     is_available = models.BooleanField(default=True)
+    # Made unavailable by ``sync_menu --remove-missing``, not by staff:
+    # the next sync that finds it in the sheet makes it available again
+    removed_from_sheet = models.BooleanField(default=False, editable=False)
     created_at = models.DateTimeField(default=timezone.now)
 
     def __str__(self) -> str:
@@ -77,6 +84,28 @@ class ItemSize(models.Model):
         return f"{self.item.name} ({self.get_size_display()})"
 
 
+class RemoteImage(models.Model):
+    """
+    Local copy of a remote image URL from the sheet / JSON menu imports.
+    Filled and refreshed by ``home.remote_images``.
+    """
+
+    url = models.URLField(max_length=500, unique=True)
+    sha256 = models.CharField(max_length=64, blank=True, default="")
+    # Relative to MEDIA_ROOT; empty until the first successful download
+    path = models.CharField(max_length=200, blank=True, default="")
+    content_type = models.CharField(max_length=50, blank=True, default="")
+    # Origin's validators, sent back on refresh for a cheap 304
+    etag = models.CharField(max_length=200, blank=True, default="")
+    last_modified = models.CharField(max_length=64, blank=True, default="")
+    fetched_at = models.DateTimeField(null=True, blank=True)
+    checked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default="")
+
+    def __str__(self):
+        return self.url
+
+
 class ContactMessage(models.Model):
     name = models.CharField(max_length=100)
     email = models.EmailField()
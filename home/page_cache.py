@@ -0,0 +1,82 @@
+"""
+Whole-page caching for the public menu pages.
+
+Every cached page is keyed on the catalog version (see ``home.catalog``),
+so a menu change — admin edit, ``load_menu`` or ``sync_menu`` — starts a
+fresh set of pages; old ones are never served again and expire on their
+own.
+
+Anonymous visitors get:
+
+* the rendered page from the shared cache (no queries, no rendering)
+* ``ETag`` / ``Last-Modified`` from the catalog version, and ``304 Not
+  Modified`` when their copy is still current
+
+Logged-in users see their own navbar (and a CSRF token for logout), so
+their pages are rendered every time.
+"""
+
+from datetime import datetime, timezone
+from functools import wraps
+from urllib.parse import urlencode
+
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from .catalog import catalog_version
+
+PAGE_TIMEOUT = 24 * 60 * 60
+
+
+def _etag(request, *args, **kwargs):
+    return f"menu-{request.menu_version}"
+
+
+def _last_modified(request, *args, **kwargs):
+    # Versions are time.time_ns() of the last bump
+    return datetime.fromtimestamp(request.menu_version / 1e9, tz=timezone.utc)
+
+
+def menu_page(*vary_on):
+    """
+    Cache a public GET view per catalog version for anonymous visitors.
+    ``vary_on`` lists the query parameters the page depends on; any
+    others are left out of the cache key.
+    """
+
+    def decorator(view):
+        @wraps(view)
+        def cached_view(request, *args, **kwargs):
+            params = urlencode([(name, request.GET.get(name, "")) for name in vary_on])
+            key = f"menu_page:{request.menu_version}:{request.path}?{params}"
+
+            content = cache.get(key)
+            if content is not None:
+                return HttpResponse(content)
+
+            response = view(request, *args, **kwargs)
+            if response.status_code == 200:
+                cache.set(key, response.content, PAGE_TIMEOUT)
+            return response
+
+        conditional_view = condition(
+            etag_func=_etag, last_modified_func=_last_modified
+        )(cached_view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method != "GET" or request.user.is_authenticated:
+                return view(request, *args, **kwargs)
+
+            # One version for the ETag and the cached copy alike
+            request.menu_version = catalog_version()
+            response = conditional_view(request, *args, **kwargs)
+            # Keep a copy, but check back (cheaply, via ETag) on every visit
+            patch_cache_control(response, max_age=0, must_revalidate=True)
+            return response
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,236 @@
+"""
+Local copies of remote menu images.
+
+The sheet and JSON menu imports put Google image URLs straight into
+``Item.image`` / ``Category.image``, so every visitor's phone fetched
+them from Google over the cafe Wi-Fi. Here each URL is downloaded once
+into ``MEDIA_ROOT/remote/<ab>/<sha256><ext>`` and recorded in
+``RemoteImage``:
+
+* the catalog points the menu at ``/images/<sha256><ext>`` instead,
+  served with a year-long immutable ``Cache-Control`` (the name is the
+  content hash, so it can never go stale)
+* resized copies (``utils.thumbnails``) are made from the local file
+
+``cache_remote_images(refresh=True)`` re-checks the origin with its
+``ETag`` / ``Last-Modified``. A changed picture gets a new hash — a new
+URL — and the catalog version is bumped so pages pick it up.
+
+Downloads never run inside a request (each can take ``TIMEOUT``
+seconds): the ``cache_remote_images`` command does them at start-up, in
+its own window next to the server, and the ``load_menu`` / ``sync_menu``
+commands after an import. Until then the menu keeps showing the remote
+URL.
+"""
+
+import hashlib
+import logging
+import os
+import re
+import tempfile
+from collections import Counter
+from datetime import timedelta
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+import requests
+from django.conf import settings
+from django.utils import timezone
+from PIL import Image
+
+from utils.thumbnails import build_derivatives
+
+from .catalog import bump_catalog_version
+from .models import Category, Item, RemoteImage
+
+logger = logging.getLogger(__name__)
+
+ROOT = "remote"
+TIMEOUT = 10
+MAX_BYTES = 10 * 1024 * 1024
+# --refresh skips URLs checked more recently than this
+REFRESH_AFTER = timedelta(days=1)
+# A failed download is not retried sooner than this (slow / dead links)
+RETRY_AFTER = timedelta(hours=1)
+EXTENSIONS = {
+    "image/jpeg": ".jpg",
+    "image/png": ".png",
+    "image/webp": ".webp",
+    "image/gif": ".gif",
+}
+
+NAME_RE = re.compile(r"^([0-9a-f]{64})(\.[a-z]+)$")
+
+
+class RemoteImageError(Exception):
+    pass
+
+
+class Download(NamedTuple):
+    data: bytes
+    content_type: str
+    etag: str
+    last_modified: str
+
+
+def download(url, etag="", last_modified="") -> Optional[Download]:
+    """
+    GET ``url``; None when the origin answers 304 to the validators.
+    """
+    headers = {}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+
+    try:
+        with requests.get(url, headers=headers, timeout=TIMEOUT, stream=True) as r:
+            if r.status_code == 304:
+                return None
+            r.raise_for_status()
+
+            content_type = r.headers.get("Content-Type", "").split(";")[0].strip()
+            if content_type not in EXTENSIONS:
+                raise RemoteImageError(f"Not an image: {content_type or 'no type'}")
+
+            data = bytearray()
+            for chunk in r.iter_content(1 << 16):
+                data += chunk
+                if len(data) > MAX_BYTES:
+                    raise RemoteImageError("Image larger than 10 MB")
+
+            return Download(
+                bytes(data),
+                content_type,
+                r.headers.get("ETag", ""),
+                r.headers.get("Last-Modified", ""),
+            )
+    except requests.RequestException as exc:
+        raise RemoteImageError(str(exc)) from exc
+
+
+def relative_path(name: str) -> str:
+    """
+    Where ``<sha256><ext>`` lives, relative to MEDIA_ROOT.
+    """
+    return f"{ROOT}/{name[:2]}/{name}"
+
+
+def _store(data: bytes, sha256: str, ext: str) -> str:
+    path = relative_path(f"{sha256}{ext}")
+    target = Path(settings.MEDIA_ROOT) / path
+    if not target.exists():
+        target.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=target.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, target)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+    return path
+
+
+def _has_file(record) -> bool:
+    return bool(record.path) and (Path(settings.MEDIA_ROOT) / record.path).exists()
+
+
+def cached_copy(url: str) -> Optional[str]:
+    """
+    Filesystem path of the local copy of ``url``, if there is one.
+    """
+    record = RemoteImage.objects.filter(url=url).exclude(path="").first()
+    return str(Path(settings.MEDIA_ROOT) / record.path) if record else None
+
+
+def _use_local_copy(record) -> None:
+    """
+    Resize the new copy and point the rows using this URL at it.
+    """
+    try:
+        image_hash = build_derivatives(
+            Path(settings.MEDIA_ROOT) / record.path, settings.MEDIA_ROOT
+        )
+    except (OSError, Image.DecompressionBombError):
+        logger.exception("Could not resize %s", record.url)
+        image_hash = ""
+
+    for model in (Category, Item):
+        model.objects.filter(image=record.url).update(image_hash=image_hash)
+    bump_catalog_version()
+
+
+def cache_image(url: str, refresh=False) -> str:
+    """
+    Make sure ``url`` has a local copy; with ``refresh``, also check the
+    origin for a newer picture. Returns what happened: "fetched",
+    "unchanged", "skipped" (fresh enough) or "failed".
+    """
+    record, _ = RemoteImage.objects.get_or_create(url=url)
+    now = timezone.now()
+    has_file = _has_file(record)
+    age = now - record.checked_at if record.checked_at else None
+
+    if has_file and not (refresh and (age is None or age > REFRESH_AFTER)):
+        return "skipped"
+    if not has_file and record.last_error and age is not None and age < RETRY_AFTER:
+        return "skipped"
+
+    try:
+        result = download(
+            url,
+            etag=record.etag if has_file else "",
+            last_modified=record.last_modified if has_file else "",
+        )
+    except RemoteImageError as exc:
+        # Keep serving the old copy, if any
+        record.last_error = str(exc)
+        record.checked_at = now
+        record.save(update_fields=["last_error", "checked_at"])
+        logger.warning("Could not fetch %s: %s", url, exc)
+        return "failed"
+
+    if result is None:
+        record.checked_at = now
+        record.last_error = ""
+        record.save(update_fields=["checked_at", "last_error"])
+        return "unchanged"
+
+    sha256 = hashlib.sha256(result.data).hexdigest()
+    changed = sha256 != record.sha256 or not has_file
+    record.path = _store(result.data, sha256, EXTENSIONS[result.content_type])
+    record.sha256 = sha256
+    record.content_type = result.content_type
+    record.etag = result.etag
+    record.last_modified = result.last_modified
+    record.fetched_at = record.checked_at = now
+    record.last_error = ""
+    record.save()
+
+    if not changed:
+        return "unchanged"
+    _use_local_copy(record)
+    return "fetched"
+
+
+def remote_urls() -> set:
+    urls = set()
+    for model in (Category, Item):
+        urls.update(
+            model.objects.filter(image__startswith="http").values_list(
+                "image", flat=True
+            )
+        )
+    return urls
+
+
+def cache_remote_images(refresh=False) -> Counter:
+    """
+    Download every remote menu image that has no local copy yet (and,
+    with ``refresh``, re-check the others). Counts outcomes.
+    """
+    outcomes = Counter()
+    for url in sorted(remote_urls()):
+        outcomes[cache_image(url, refresh=refresh)] += 1
+    return outcomes
@@ -0,0 +1,188 @@
+"""
+Ranked menu search over the in-process catalog snapshot.
+
+The menu is a few hundred items, so instead of hitting the database on
+every keystroke an inverted index (word → items) is built from
+``get_catalog()`` and rebuilt whenever the catalog version moves on.
+
+Matching, per query word:
+
+* exact word            — full weight
+* prefix of a word      — as-you-type ("capp" → cappuccino)
+* one typo (two for long words) — only for words that matched nothing
+  above, so "capuccino" still finds "Cappuccino"
+
+Every query word has to match somewhere. Hits in the item name count
+more than hits in its category, which count more than the description;
+names that start with the whole query come first.
+"""
+
+import re
+import threading
+import unicodedata
+from bisect import bisect_left
+from dataclasses import dataclass
+from typing import Dict, List, Mapping, Optional, Tuple
+
+from .catalog import CatalogItem, MenuCatalog, get_catalog
+
+# Where the word was found
+NAME, CATEGORY, DESCRIPTION = 3.0, 2.0, 1.0
+# How well it matched
+EXACT, PREFIX, TYPO = 1.0, 0.7, 0.4
+# Name starts with the whole query
+LEADING_BONUS = 2.0
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercase ASCII words: "Crème Brûlée (Large)" → creme, brulee, large.
+    """
+    text = unicodedata.normalize("NFKD", text or "")
+    text = text.encode("ascii", "ignore").decode().lower()
+    return _WORD.findall(text)
+
+
+def _max_typos(word: str) -> int:
+    if len(word) < 4:
+        return 0
+    return 1 if len(word) < 8 else 2
+
+
+def _within_edits(a: str, b: str, limit: int) -> bool:
+    """
+    Levenshtein distance of ``a`` and ``b`` is at most ``limit``.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return False
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(
+                min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb))
+            )
+        if min(current) > limit:
+            return False
+        previous = current
+    return previous[-1] <= limit
+
+
+@dataclass(frozen=True)
+class MenuSearchIndex:
+    version: int
+    items: Mapping[int, CatalogItem]
+    # word → {item id: best field weight}
+    postings: Mapping[str, Mapping[int, float]]
+    # Sorted, for prefix lookups
+    words: Tuple[str, ...]
+
+    @classmethod
+    def build(cls, catalog: MenuCatalog) -> "MenuSearchIndex":
+        postings: Dict[str, Dict[int, float]] = {}
+        items = {item.id: item for item in catalog.available_items()}
+
+        for item in items.values():
+            for text, weight in (
+                (item.name, NAME),
+                (item.category_name, CATEGORY),
+                (item.description, DESCRIPTION),
+            ):
+                for word in tokenize(text):
+                    hits = postings.setdefault(word, {})
+                    hits[item.id] = max(hits.get(item.id, 0.0), weight)
+
+        return cls(
+            version=catalog.version,
+            items=items,
+            postings=postings,
+            words=tuple(sorted(postings)),
+        )
+
+    def _matches(self, term: str) -> Dict[int, float]:
+        """
+        Item id → score of the best way ``term`` matched it.
+        """
+        scores: Dict[int, float] = {}
+
+        def add(word, quality):
+            for item_id, weight in self.postings[word].items():
+                score = weight * quality
+                if score > scores.get(item_id, 0.0):
+                    scores[item_id] = score
+
+        start = bisect_left(self.words, term)
+        for word in self.words[start:]:
+            if not word.startswith(term):
+                break
+            add(word, EXACT if word == term else PREFIX)
+
+        limit = _max_typos(term)
+        if limit and not scores:
+            for word in self.words:
+                # Compared up to the typed length, so typos work as-you-type too
+                if word[0] == term[0] and _within_edits(
+                    term, word[: len(term) + limit], limit
+                ):
+                    add(word, TYPO)
+
+        return scores
+
+    def search(self, query: str, limit: Optional[int] = 20) -> List[CatalogItem]:
+        terms = tokenize(query)
+        if not terms:
+            return []
+
+        scores: Optional[Dict[int, float]] = None
+        for term in terms:
+            matches = self._matches(term)
+            if scores is None:
+                scores = matches
+            else:
+                scores = {
+                    item_id: score + matches[item_id]
+                    for item_id, score in scores.items()
+                    if item_id in matches
+                }
+            if not scores:
+                return []
+
+        phrase = " ".join(terms)
+        for item_id in scores:
+            if " ".join(tokenize(self.items[item_id].name)).startswith(phrase):
+                scores[item_id] += LEADING_BONUS
+
+        ranked = sorted(
+            scores, key=lambda item_id: (-scores[item_id], self.items[item_id].name)
+        )
+        return [self.items[item_id] for item_id in ranked[:limit]]
+
+
+_index: Optional[MenuSearchIndex] = None
+_lock = threading.Lock()
+
+
+def get_search_index() -> MenuSearchIndex:
+    """
+    Return the search index for the current catalog snapshot.
+    """
+    global _index
+
+    catalog = get_catalog()
+    index = _index
+    if index is not None and index.version == catalog.version:
+        return index
+
+    with _lock:
+        if _index is None or _index.version != catalog.version:
+            _index = MenuSearchIndex.build(catalog)
+        return _index
+
+
+def search_menu(query: str, limit: Optional[int] = 20) -> List[CatalogItem]:
+    """
+    Available items matching ``query``, best first.
+    """
+    return get_search_index().search(query, limit)
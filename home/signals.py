@@ -0,0 +1,59 @@
+import logging
+
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from PIL import Image
+
+from home.catalog import bump_catalog_version
+from home.models import Category, Item
+from home.remote_images import cached_copy
+from utils.thumbnails import build_derivatives, local_source
+
+logger = logging.getLogger(__name__)
+
+CATALOG_MODELS = ("home.Category", "home.Item", "home.ItemSize", "billing.CafeConfig")
+
+
+def invalidate_catalog(sender, **kwargs):
+    bump_catalog_version()
+
+
+for model in CATALOG_MODELS:
+    post_save.connect(
+        invalidate_catalog, sender=model, dispatch_uid=f"catalog-save-{model}"
+    )
+    post_delete.connect(
+        invalidate_catalog, sender=model, dispatch_uid=f"catalog-delete-{model}"
+    )
+
+
+def refresh_image_derivatives(sender, instance, update_fields=None, **kwargs):
+    """
+    Make the resized copies of a new or changed local image, or of the
+    local copy of a remote URL. Remote URLs not downloaded yet keep
+    ``image_hash`` empty and are shown as they are.
+    """
+    if update_fields is not None and "image" not in update_fields:
+        return
+
+    image_hash = ""
+    source = local_source(instance.image)
+    if not source and instance.image and instance.image.name.startswith("http"):
+        source = cached_copy(instance.image.name)
+    if source:
+        try:
+            image_hash = build_derivatives(source, settings.MEDIA_ROOT)
+        except (OSError, Image.DecompressionBombError):
+            logger.exception("Could not resize %s", source)
+
+    if image_hash != instance.image_hash:
+        instance.image_hash = image_hash
+        sender.objects.filter(pk=instance.pk).update(image_hash=image_hash)
+
+
+for model in (Category, Item):
+    post_save.connect(
+        refresh_image_derivatives,
+        sender=model,
+        dispatch_uid=f"thumbnails-{model._meta.label}",
+    )
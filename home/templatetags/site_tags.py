@@ -1,6 +1,10 @@
 import datetime
 
 from django import template
+from django.forms.utils import flatatt
+from django.utils.html import format_html
+
+from utils.thumbnails import WIDTHS, derivative_url
 
 register = template.Library()
 
@@ -8,3 +12,47 @@ register = template.Library()
 @register.simple_tag
 def current_time(format_string):
     return datetime.datetime.now().strftime(format_string)
+
+
+def _srcset(image_hash, ext):
+    return ", ".join(
+        f"{derivative_url(image_hash, width, ext)} {width}w" for width in WIDTHS
+    )
+
+
+@register.simple_tag
+def responsive_image(obj, sizes="100vw", default="", **attrs):
+    """
+    Lazy-loaded <img> for a catalog item or category.
+
+    With resized copies (``obj.image_hash``) the browser picks a WebP
+    or JPEG width from ``srcset`` to fit ``sizes``; otherwise it gets
+    the image as stored, or ``default``.
+
+        {% responsive_image item sizes="(max-width: 576px) 100vw, 33vw" class="menu-item-image" alt=item.name %}
+    """
+    attrs = {"loading": "lazy", "decoding": "async", **attrs}
+
+    if not obj.image_hash:
+        src = obj.image_url or default
+        if not src:
+            return ""
+        return format_html("<img{}>", flatatt({"src": src, **attrs}))
+
+    # display:contents keeps <picture> out of the page layout
+    return format_html(
+        '<picture style="display:contents">'
+        '<source type="image/webp" srcset="{}" sizes="{}">'
+        "<img{}>"
+        "</picture>",
+        _srcset(obj.image_hash, "webp"),
+        sizes,
+        flatatt(
+            {
+                "src": derivative_url(obj.image_hash, WIDTHS[1], "jpg"),
+                "srcset": _srcset(obj.image_hash, "jpg"),
+                "sizes": sizes,
+                **attrs,
+            }
+        ),
+    )
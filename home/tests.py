@@ -1 +1,567 @@
-# Create your tests here.
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+import threading
+from datetime import timedelta
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse
+from django.template import Context, Template
+from django.test import RequestFactory, SimpleTestCase, TestCase
+from django.urls import reverse
+from PIL import Image
+
+from home.catalog import catalog_version, get_catalog
+from home.models import Category, Item, ItemSize, RemoteImage
+from home.page_cache import menu_page
+from home.remote_images import cache_remote_images
+from home.search import get_search_index, search_menu
+from utils.thumbnails import WIDTHS, build_derivatives, derivative_path, file_sha256
+
+
+def png(color):
+    buffer = io.BytesIO()
+    Image.new("RGB", (32, 24), color).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+class _Origin(BaseHTTPRequestHandler):
+    """
+    Stand-in for Google's image host: serves ``server.files`` with an
+    ETag and answers 304 to a matching If-None-Match.
+    """
+
+    def do_GET(self):
+        self.server.requests.append(self.headers.get("If-None-Match"))
+        body, content_type = self.server.files.get(self.path, (None, None))
+        if body is None:
+            self.send_error(404)
+            return
+
+        etag = f'"{hashlib.md5(body).hexdigest()}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class RemoteImageCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.origin = ThreadingHTTPServer(("127.0.0.1", 0), _Origin)
+        threading.Thread(target=cls.origin.serve_forever, daemon=True).start()
+        cls.base_url = f"http://127.0.0.1:{cls.origin.server_port}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.origin.shutdown()
+        cls.origin.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings = self.settings(MEDIA_ROOT=media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.origin.files = {"/latte.png": (png("brown"), "image/png")}
+        self.origin.requests = []
+
+        self.url = f"{self.base_url}/latte.png"
+        with self.captureOnCommitCallbacks(execute=True):
+            category = Category.objects.create(name="Coffee")
+            self.item = Item.objects.create(
+                category=category, name="Latte", image=self.url
+            )
+
+    def cache(self, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            return cache_remote_images(**kwargs)
+
+    def test_downloads_each_url_once(self):
+        self.assertEqual(self.cache()["fetched"], 1)
+        self.assertEqual(self.cache()["skipped"], 1)
+        self.assertEqual(len(self.origin.requests), 1)
+
+        record = RemoteImage.objects.get(url=self.url)
+        self.assertEqual(record.sha256, hashlib.sha256(png("brown")).hexdigest())
+
+        # Menu points at the local copy, with resized versions
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.image_hash, record.sha256)
+        self.assertEqual(
+            get_catalog().item(self.item.id).image_url,
+            reverse("home:cached_image", args=[f"{record.sha256}.png"]),
+        )
+
+    def test_refresh_revalidates_with_etag(self):
+        self.cache()
+        RemoteImage.objects.update(
+            checked_at=RemoteImage.objects.get().checked_at - timedelta(days=2)
+        )
+
+        self.assertEqual(self.cache(refresh=True)["unchanged"], 1)
+        self.assertIsNotNone(self.origin.requests[-1])
+
+    def test_refresh_picks_up_a_changed_image(self):
+        self.cache()
+        old = RemoteImage.objects.get().sha256
+        RemoteImage.objects.update(checked_at=None)
+        self.origin.files["/latte.png"] = (png("white"), "image/png")
+
+        self.assertEqual(self.cache(refresh=True)["fetched"], 1)
+
+        new = RemoteImage.objects.get().sha256
+        self.assertNotEqual(new, old)
+        self.assertEqual(
+            get_catalog().item(self.item.id).image_url,
+            reverse("home:cached_image", args=[f"{new}.png"]),
+        )
+
+    def test_resave_keeps_the_local_copy(self):
+        self.cache()
+        # What the sheet sync does for every row
+        self.item.save(update_fields=["category", "image"])
+
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.image_hash, RemoteImage.objects.get().sha256)
+
+    def test_failed_download_is_not_retried_at_once(self):
+        self.origin.files["/latte.png"] = (b"<html>", "text/html")
+
+        self.assertEqual(self.cache()["failed"], 1)
+        self.assertEqual(self.cache()["skipped"], 1)
+
+        record = RemoteImage.objects.get()
+        self.assertEqual(record.path, "")
+        self.assertIn("text/html", record.last_error)
+        self.assertEqual(get_catalog().item(self.item.id).image_url, self.url)
+
+    def test_local_copy_is_served_immutable(self):
+        self.cache()
+        url = get_catalog().item(self.item.id).image_url
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b"".join(response.streaming_content), png("brown"))
+        self.assertEqual(response["Content-Type"], "image/png")
+        self.assertEqual(
+            response["Cache-Control"], "public, max-age=31536000, immutable"
+        )
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+
+        self.assertEqual(self.client.get(url.replace(".png", ".jpg")).status_code, 404)
+
+
+def image_file(path, size, mode="RGB", color="brown", fmt="PNG", **save):
+    Image.new(mode, size, color).save(path, fmt, **save)
+    return str(path)
+
+
+class ThumbnailTests(SimpleTestCase):
+    def setUp(self):
+        self.media_root = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.media_root)
+
+    def build(self, source, **kwargs):
+        return build_derivatives(source, self.media_root, **kwargs)
+
+    def open(self, sha256, width, ext):
+        return Image.open(self.media_root / derivative_path(sha256, width, ext))
+
+    def test_every_width_and_format_under_the_hash(self):
+        source = image_file(self.media_root / "latte.png", (800, 600))
+
+        sha256 = self.build(source)
+
+        self.assertEqual(sha256, hashlib.sha256(Path(source).read_bytes()).hexdigest())
+        for width in WIDTHS:
+            for ext, pil_format in (("webp", "WEBP"), ("jpg", "JPEG")):
+                with self.subTest(width=width, ext=ext):
+                    with self.open(sha256, width, ext) as image:
+                        self.assertEqual(image.format, pil_format)
+                        self.assertEqual(image.size, (width, width * 3 // 4))
+
+    def test_small_sources_are_not_enlarged(self):
+        sha256 = self.build(image_file(self.media_root / "chai.png", (200, 100)))
+
+        with self.open(sha256, 160, "jpg") as image:
+            self.assertEqual(image.size, (160, 80))
+        for width in WIDTHS[1:]:
+            with self.open(sha256, width, "webp") as image:
+                self.assertEqual(image.size, (200, 100))
+
+    def test_exif_rotation_is_applied(self):
+        exif = Image.Exif()
+        exif[0x0112] = 6  # Rotate 90 CW
+        source = image_file(
+            self.media_root / "phone.jpg", (400, 200), fmt="JPEG", exif=exif
+        )
+
+        sha256 = self.build(source)
+
+        with self.open(sha256, 160, "jpg") as image:
+            self.assertEqual(image.size, (160, 320))
+
+    def test_transparency_is_flattened_onto_white_for_jpeg(self):
+        source = image_file(
+            self.media_root / "logo.png", (320, 320), mode="RGBA", color=(0, 0, 0, 0)
+        )
+
+        sha256 = self.build(source)
+
+        with self.open(sha256, 160, "jpg") as image:
+            self.assertEqual(image.mode, "RGB")
+            self.assertEqual(image.getpixel((80, 80)), (255, 255, 255))
+        with self.open(sha256, 160, "webp") as image:
+            self.assertEqual(image.mode, "RGBA")
+            self.assertEqual(image.getpixel((80, 80))[3], 0)
+
+    def test_existing_files_are_reused_unless_forced(self):
+        source = image_file(self.media_root / "latte.png", (800, 600))
+        sha256 = self.build(source)
+        target = self.media_root / derivative_path(sha256, 320, "webp")
+        os.utime(target, ns=(0, 0))
+
+        with mock.patch("utils.thumbnails.Image.open") as image_open:
+            self.assertEqual(self.build(source), sha256)
+        image_open.assert_not_called()
+        self.assertEqual(target.stat().st_mtime_ns, 0)
+
+        # A missing file is made again, the others are kept
+        (self.media_root / derivative_path(sha256, 160, "jpg")).unlink()
+        self.build(source)
+        self.assertTrue(
+            (self.media_root / derivative_path(sha256, 160, "jpg")).exists()
+        )
+        self.assertEqual(target.stat().st_mtime_ns, 0)
+
+        self.build(source, force=True)
+        self.assertNotEqual(target.stat().st_mtime_ns, 0)
+
+
+class ResponsiveImageTests(SimpleTestCase):
+    TEMPLATE = (
+        "{% load site_tags %}"
+        '{% responsive_image item sizes="33vw" default="/static/none.png" '
+        'alt="Latte" %}'
+    )
+
+    def render(self, **item):
+        template = Template(self.TEMPLATE)
+        return template.render(Context({"item": SimpleNamespace(**item)}))
+
+    def test_with_resized_copies(self):
+        sha = "ab" + "0" * 62
+        html = self.render(image_hash=sha, image_url="/media/item_images/latte.png")
+
+        def srcset(ext):
+            return ", ".join(
+                f"/media/thumbs/ab/{sha}/{width}.{ext} {width}w" for width in WIDTHS
+            )
+
+        self.assertHTMLEqual(
+            html,
+            '<picture style="display:contents">'
+            f'<source type="image/webp" srcset="{srcset("webp")}" sizes="33vw">'
+            f'<img src="/media/thumbs/ab/{sha}/320.jpg" srcset="{srcset("jpg")}" '
+            'sizes="33vw" loading="lazy" decoding="async" alt="Latte">'
+            "</picture>",
+        )
+
+    def test_without_resized_copies(self):
+        self.assertHTMLEqual(
+            self.render(image_hash="", image_url="https://example.com/latte.jpg"),
+            '<img src="https://example.com/latte.jpg" loading="lazy" '
+            'decoding="async" alt="Latte">',
+        )
+        self.assertHTMLEqual(
+            self.render(image_hash="", image_url=""),
+            '<img src="/static/none.png" loading="lazy" decoding="async" alt="Latte">',
+        )
+
+
+class ImageDerivativeSignalTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings = self.settings(MEDIA_ROOT=media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.media_root = Path(media_root)
+
+    def upload(self, color):
+        buffer = io.BytesIO()
+        Image.new("RGB", (400, 300), color).save(buffer, "PNG")
+        return SimpleUploadedFile(f"{color}.png", buffer.getvalue())
+
+    def test_uploaded_image_gets_resized_copies(self):
+        category = Category.objects.create(name="Coffee")
+        latte = Item.objects.create(
+            category=category, name="Latte", image=self.upload("brown")
+        )
+
+        latte.refresh_from_db()
+        self.assertEqual(latte.image_hash, file_sha256(latte.image.path))
+        for width in WIDTHS:
+            self.assertTrue(
+                (
+                    self.media_root / derivative_path(latte.image_hash, width, "webp")
+                ).exists()
+            )
+
+        # Saves that leave the image alone don't look at it
+        with mock.patch("home.signals.build_derivatives") as build:
+            latte.save(update_fields=["name"])
+        build.assert_not_called()
+
+        latte.image = self.upload("white")
+        latte.save()
+        latte.refresh_from_db()
+        self.assertEqual(latte.image_hash, file_sha256(latte.image.path))
+
+        latte.image = None
+        latte.save()
+        latte.refresh_from_db()
+        self.assertEqual(latte.image_hash, "")
+
+
+class CatalogTests(TestCase):
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.coffee = Category.objects.create(name="Coffee")
+            self.latte = Item.objects.create(category=self.coffee, name="Latte")
+            self.regular = ItemSize.objects.create(
+                item=self.latte, size="REGULAR", price=Decimal("120")
+            )
+
+    def assertBumpedOnCommit(self, change):
+        version = catalog_version()
+        snapshot = get_catalog()
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            change()
+            # Nothing is invalidated before the commit
+            self.assertEqual(catalog_version(), version)
+            self.assertIs(get_catalog(), snapshot)
+
+        self.assertTrue(callbacks)
+        self.assertGreater(catalog_version(), version)
+        self.assertIsNot(get_catalog(), snapshot)
+
+    def test_saves_and_deletes_bump_the_version(self):
+        changes = {
+            "category save": lambda: self.coffee.save(),
+            "item save": lambda: self.latte.save(),
+            "size save": lambda: self.regular.save(),
+            "size delete": lambda: self.regular.delete(),
+            "item delete": lambda: self.latte.delete(),
+            "category delete": lambda: self.coffee.delete(),
+        }
+        for name, change in changes.items():
+            with self.subTest(name):
+                self.assertBumpedOnCommit(change)
+
+    def test_rolled_back_change_keeps_the_snapshot(self):
+        version = catalog_version()
+        snapshot = get_catalog()
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            try:
+                with transaction.atomic():
+                    self.regular.price = Decimal("150")
+                    self.regular.save()
+                    raise IntegrityError
+            except IntegrityError:
+                pass
+
+        self.assertEqual(callbacks, [])
+        self.assertEqual(catalog_version(), version)
+        self.assertIs(get_catalog(), snapshot)
+
+    def test_snapshot_has_the_edited_price(self):
+        self.assertEqual(
+            get_catalog().item(self.latte.id).price_for_size("REGULAR"),
+            Decimal("120"),
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.regular.price = Decimal("135")
+            self.regular.save()
+            ItemSize.objects.create(item=self.latte, size="LARGE", price=Decimal("160"))
+
+        item = get_catalog().item(self.latte.id)
+        self.assertEqual(item.price_for_size("REGULAR"), Decimal("135"))
+        self.assertEqual(item.price_for_size("LARGE"), Decimal("160"))
+        with self.assertRaises(ValidationError):
+            item.price_for_size("SMALL")
+
+
+class MenuSearchTests(TestCase):
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            hot = Category.objects.create(name="Hot Coffee")
+            cold = Category.objects.create(name="Cold Coffee")
+            tea = Category.objects.create(name="Tea")
+            self.cappuccino = Item.objects.create(category=hot, name="Cappuccino")
+            Item.objects.create(
+                category=hot, name="Cafe Latte", description="Espresso, steamed milk"
+            )
+            Item.objects.create(category=cold, name="Cold Coffee")
+            Item.objects.create(
+                category=cold, name="Iced Latte", description="Cold brew over ice"
+            )
+            Item.objects.create(category=tea, name="Masala Chai", description="Milk")
+            Item.objects.create(category=tea, name="Lemon Tea", is_available=False)
+
+    def names(self, query):
+        return [item.name for item in search_menu(query)]
+
+    def test_prefix_matches_as_you_type(self):
+        self.assertEqual(self.names("capp"), ["Cappuccino"])
+        self.assertEqual(self.names("mas ch"), ["Masala Chai"])
+
+    def test_typos(self):
+        self.assertEqual(self.names("capuccino"), ["Cappuccino"])
+        self.assertEqual(self.names("masla chai"), ["Masala Chai"])
+        # Short words must match as typed
+        self.assertEqual(self.names("tae"), [])
+
+    def test_ranking(self):
+        # Name before category, leading match first, then by name
+        self.assertEqual(
+            self.names("coffee"),
+            ["Cold Coffee", "Cafe Latte", "Cappuccino", "Iced Latte"],
+        )
+        self.assertEqual(self.names("cold"), ["Cold Coffee", "Iced Latte"])
+        # Category before description
+        self.assertEqual(self.names("tea"), ["Masala Chai"])
+        self.assertEqual(self.names("milk"), ["Cafe Latte", "Masala Chai"])
+        # Every word has to match
+        self.assertEqual(self.names("iced latte"), ["Iced Latte"])
+
+    def test_unavailable_items_are_left_out(self):
+        self.assertEqual(self.names("lemon"), [])
+
+    def test_rebuilt_when_the_catalog_changes(self):
+        index = get_search_index()
+        self.assertIs(get_search_index(), index)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cappuccino.is_available = False
+            self.cappuccino.save()
+            Item.objects.create(category=self.cappuccino.category, name="Cortado")
+
+        self.assertIsNot(get_search_index(), index)
+        self.assertEqual(self.names("capp"), [])
+        self.assertEqual(self.names("cort"), ["Cortado"])
+
+    def test_json_endpoint(self):
+        response = self.client.get(reverse("home:search_api"), {"q": "latte"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [item["name"] for item in response.json()["items"]],
+            ["Cafe Latte", "Iced Latte"],
+        )
+
+
+class MenuPageCacheTests(TestCase):
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.coffee = Category.objects.create(name="Coffee")
+            self.tea = Category.objects.create(name="Tea")
+            self.latte = Item.objects.create(category=self.coffee, name="Latte")
+            Item.objects.create(category=self.tea, name="Masala Chai")
+        self.url = reverse("home:menu_display")
+
+    def test_anonymous_visitors_get_the_cached_page(self):
+        first = self.client.get(self.url)
+        self.assertEqual(first.status_code, 200)
+        self.assertContains(first, "Latte")
+
+        # No queries, no rendering
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url)
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second["ETag"], first["ETag"])
+        self.assertIn("must-revalidate", second["Cache-Control"])
+
+    def test_current_copy_is_not_modified(self):
+        etag = self.client.get(self.url)["ETag"]
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+
+    def test_menu_change_gives_a_new_page(self):
+        old = self.client.get(self.url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.latte.name = "Caffe Latte"
+            self.latte.save()
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=old["ETag"])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], old["ETag"])
+        self.assertContains(response, "Caffe Latte")
+
+    def test_logged_in_users_are_not_cached(self):
+        self.client.get(self.url)
+        user = User.objects.create_user("staff", password="pw")
+        self.client.force_login(user)
+
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("ETag", response)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.latte.name = "Caffe Latte"
+            self.latte.save(update_fields=["name"])
+        self.assertContains(self.client.get(self.url), "Caffe Latte")
+
+    def test_cache_key_has_only_the_listed_params(self):
+        rendered = []
+
+        @menu_page("category")
+        def view(request):
+            rendered.append(request.get_full_path())
+            return HttpResponse(f"category {request.GET.get('category')}")
+
+        def get(params):
+            request = RequestFactory().get("/shop/", params)
+            request.user = AnonymousUser()
+            return view(request)
+
+        self.assertEqual(get({"category": "1"}).content, b"category 1")
+        self.assertEqual(get({"category": "2"}).content, b"category 2")
+        # Other params share the cached page
+        self.assertEqual(
+            get({"category": "1", "utm_source": "qr"}).content, b"category 1"
+        )
+        self.assertEqual(rendered, ["/shop/?category=1", "/shop/?category=2"])
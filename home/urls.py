@@ -8,6 +8,8 @@ urlpatterns = [
     path("", views.home_view, name="home"),
     path("category/<int:pk>/", views.category_items, name="category_items"),
     path("search/", views.search_items, name="search"),
+    path("api/search/", views.search_api, name="search_api"),
     path("about/", views.about_view, name="about"),
     path("menu/", views.menu_display, name="menu_display"),
+    path("images/<str:name>", views.cached_image, name="cached_image"),
 ]
@@ -5,6 +5,7 @@ from pathlib import Path
 from django.db import transaction
 from django.db.models import Count
 
+from home.catalog import bump_catalog_version
 from home.models import Category, Item, ItemSize
 
 
@@ -64,3 +65,5 @@ def load_menu_from_json(json_path, clear_existing=False):
                     size=size_code,
                     defaults={"price": Decimal(price_val)},
                 )
+
+        bump_catalog_version()
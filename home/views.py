@@ -1,68 +1,153 @@
-from django.shortcuts import get_object_or_404, render
+import mimetypes
+from pathlib import Path
 
-from .models import Category, Item
+from django.conf import settings
+from django.http import Http404, JsonResponse
+from django.shortcuts import render
 
+from utils.file_response import PUBLIC_IMMUTABLE_CACHE_CONTROL, serve_immutable_file
+from utils.thumbnails import WIDTHS, derivative_url
 
+from .catalog import get_catalog
+from .page_cache import menu_page
+from .remote_images import NAME_RE, relative_path
+from .search import search_menu
+
+
+@menu_page()
 def menu_display(request):
-    categories = (
-        Category.objects.filter(is_active=True)
-        .prefetch_related("items__sizes")
-        .order_by("name")
-    )
+    catalog = get_catalog()
 
-    return render(request, "menu/menu_display.html", {"categories": categories})
+    items_by_category = {}
+    for item in catalog.items.values():
+        items_by_category.setdefault(item.category_id, []).append(item)
 
+    sections = [
+        {"category": category, "items": items_by_category.get(category.id, [])}
+        for category in sorted(catalog.active_categories(), key=lambda c: c.name)
+    ]
 
+    return render(
+        request,
+        "menu/menu_display.html",
+        {"sections": sections, "menu_version": catalog.version},
+    )
+
+
+@menu_page("category")
 def home_view(request):
-    categories = Category.objects.filter(is_active=True)
+    catalog = get_catalog()
 
     category_id = request.GET.get("category")
     items = None
 
     if category_id:
-        items = Item.objects.filter(category_id=category_id, is_available=True)
+        items = [
+            item
+            for item in catalog.available_items()
+            if item.category_id == int(category_id)
+        ]
 
     return render(
         request,
         "home/index.html",
         {
-            "categories": categories,
+            "categories": catalog.active_categories(),
             "items": items,
             "selected_category": int(category_id) if category_id else None,
         },
     )
 
 
+@menu_page()
 def category_items(request, pk):
-    category = get_object_or_404(Category, pk=pk, is_active=True)
-    items = category.items.filter(is_available=True)
+    catalog = get_catalog()
+    category = catalog.categories.get(pk)
+    if category is None or not category.is_active:
+        raise Http404("No Category matches the given query.")
 
     return render(
         request,
         "home/shop.html",
         {
             "category": category,
-            "items": items,
+            "items": [
+                item for item in catalog.available_items() if item.category_id == pk
+            ],
         },
     )
 
 
 def search_items(request):
-    query = request.GET.get("q", "")
-
-    items = []
-    if query:
-        items = Item.objects.filter(name__icontains=query, is_available=True)
+    query = request.GET.get("q", "").strip()
 
     return render(
         request,
         "home/search.html",
         {
             "query": query,
-            "items": items,
+            "items": search_menu(query, limit=None) if query else [],
         },
     )
 
 
+def search_api(request):
+    """
+    As-you-type menu search for the storefront and the POS item grid.
+    """
+    query = request.GET.get("q", "").strip()
+    try:
+        limit = max(1, min(int(request.GET.get("limit", 20)), 100))
+    except ValueError:
+        limit = 20
+
+    return JsonResponse(
+        {
+            "query": query,
+            "items": [
+                {
+                    "id": item.id,
+                    "name": item.name,
+                    "description": item.description,
+                    "category_id": item.category_id,
+                    "category": item.category_name,
+                    "image_url": item.image_url,
+                    # 640px copy when there is one
+                    "thumbnail_url": (
+                        derivative_url(item.image_hash, WIDTHS[-1], "webp")
+                        if item.image_hash
+                        else item.image_url
+                    ),
+                    "sizes": [
+                        {"size": s.size, "label": s.label, "price": str(s.price)}
+                        for s in item.sizes
+                    ],
+                }
+                for item in search_menu(query, limit)
+            ],
+        }
+    )
+
+
 def about_view(request):
     return render(request, "About.html")
+
+
+def cached_image(request, name):
+    """
+    Local copy of a remote menu image. The name is the content hash, so
+    browsers may keep it for good.
+    """
+    match = NAME_RE.match(name)
+    path = Path(settings.MEDIA_ROOT) / relative_path(name)
+    if not match or not path.is_file():
+        raise Http404("No such image")
+
+    return serve_immutable_file(
+        request,
+        lambda: (path.open("rb"), path.stat().st_size),
+        etag=match[1],
+        content_type=mimetypes.guess_type(name)[0] or "application/octet-stream",
+        filename=name,
+        cache_control=PUBLIC_IMMUTABLE_CACHE_CONTROL,
+    )
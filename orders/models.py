@@ -3,6 +3,8 @@ from decimal import Decimal
 from django.db import models
 from django.utils import timezone
 
+from core.business_day import business_date
+
 
 class Table(models.Model):
     number = models.CharField(max_length=10, unique=True)
@@ -33,6 +35,7 @@ class Order(models.Model):
         default=False
     )  # Ye track karega ki iska bill ban chuka hai ya nahi
     created_at = models.DateTimeField(default=timezone.now)
+    business_date = models.DateField(null=True, editable=False, db_index=True)
 
     class Status(models.TextChoices):
         NEW = "NEW", "New"
@@ -48,6 +51,11 @@ class Order(models.Model):
     def __str__(self) -> str:
         return f"Order #{self.id}"
 
+    def save(self, *args, **kwargs):
+        if not self.business_date:
+            self.business_date = business_date(self.created_at)
+        super().save(*args, **kwargs)
+
 
 class OrderItem(models.Model):
     order = models.ForeignKey(
@@ -183,6 +191,7 @@ class OrderHistory(models.Model):
 
     # -------- META --------
     created_at = models.DateTimeField(default=timezone.now)
+    business_date = models.DateField(null=True, editable=False, db_index=True)
 
     class Meta:
         ordering = ["-created_at"]
@@ -191,3 +200,8 @@ class OrderHistory(models.Model):
 
     def __str__(self) -> str:
         return f"Order #{self.order_id} | {self.bill_number}"
+
+    def save(self, *args, **kwargs):
+        if not self.business_date:
+            self.business_date = business_date(self.created_at)
+        super().save(*args, **kwargs)
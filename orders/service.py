@@ -1,3 +1,5 @@
+from home.catalog import get_catalog
+
 from .models import Recipe, RecipeItem
 
 
@@ -6,10 +8,11 @@ def generate_recipes_for_order(order, items):
     Generate recipes only for provided order items.
     """
 
+    catalog = get_catalog()
     station_map = {}
 
     for oi in items:
-        station = oi.item.station
+        station = catalog.item(oi.item_id).station
         station_map.setdefault(station, []).append(oi)
 
     recipes_with_items = []
@@ -25,7 +28,7 @@ def generate_recipes_for_order(order, items):
             [
                 RecipeItem(
                     recipe=recipe,
-                    item_name=oi.item.name,
+                    item_name=catalog.item(oi.item_id).name,
                     quantity=oi.quantity,
                     size=oi.size,
                     priority=oi.priority,
@@ -42,22 +42,17 @@ def order_history_view(request, order_id):
     )
 
     if bill and history:
-        current_subtotal = bill.subtotal()
+        current_subtotal = bill.subtotal
         current_discount = bill.discount_amount or 0
 
-        taxable_amount = current_subtotal - current_discount
-        gst_percent = bill.gst_percentage or 0
-
-        total_gst_amount = (taxable_amount * gst_percent) / 100
-
         history[0].subtotal = current_subtotal
         history[0].discount_amount = current_discount
         history[0].discount_percent = bill.discount_percent
 
-        history[0].cgst_amount = total_gst_amount / 2
-        history[0].sgst_amount = total_gst_amount / 2
+        history[0].cgst_amount = bill.cgst
+        history[0].sgst_amount = bill.sgst
 
-        history[0].total_amount = bill.total_amount()
+        history[0].total_amount = bill.grand_total
 
     return render(
         request,
@@ -11,6 +11,28 @@ where python
 REM Take DB backup BEFORE starting server
 python backup_db.py
 
+REM Pack bill PDFs of closed months into monthly archives
+python manage.py archive_pdfs
+
+REM Store the totals of bills saved before totals were stored (only those)
+python manage.py backfill_bill_totals
+
+REM Date bills and orders saved before they had a business_date (only those)
+python manage.py backfill_business_dates
+
+REM Store the daily sales rollups of days that have none yet
+python manage.py rebuild_sales_rollups --missing
+
+REM Same for the sales dashboard cube
+python manage.py rebuild_sales_facts --missing
+
+REM Download new / changed remote menu images in their own window:
+REM a slow or offline connection must not keep the POS from starting
+start "Menu Images" cmd /c python manage.py cache_remote_images --refresh
+
+REM Start print worker in its own window
+start "Print Worker" cmd /k python manage.py run_print_worker
+
 REM Start Django server
 python manage.py runserver 0.0.0.0:8000
 
@@ -0,0 +1,204 @@
+"""
+ESC/POS tickets for the 80 mm thermal printers.
+
+Builds the same bill and kitchen slip as ``utils.pdf`` but as the raw
+byte stream the printer understands, so bold, double size and the
+paper cut are done by the printer itself. PDFs are still rendered for
+the archive.
+"""
+
+import textwrap
+
+from django.utils import timezone
+
+from billing.pricing import totals_for_bill
+
+ESC = b"\x1b"
+GS = b"\x1d"
+
+# Font A on 80 mm paper (576 dots / 12 dots per character)
+LINE_WIDTH = 48
+
+# PC858 = PC850 + euro sign; covers the Latin text we print
+CODEPAGE = "cp858"
+CODEPAGE_ID = 19
+
+LEFT, CENTER, RIGHT = 0, 1, 2
+
+
+class Ticket:
+    """
+    Minimal ESC/POS command builder.
+
+    Every method appends to one buffer; ``getvalue()`` returns the
+    finished ticket.
+    """
+
+    def __init__(self, *, width=LINE_WIDTH, codepage=CODEPAGE, codepage_id=CODEPAGE_ID):
+        self.width = width
+        self.codepage = codepage
+        self._double_width = False
+        self._buffer = bytearray()
+
+        self._buffer += ESC + b"@"  # reset printer
+        self._buffer += ESC + b"t" + bytes([codepage_id])
+
+    @property
+    def columns(self) -> int:
+        return self.width // 2 if self._double_width else self.width
+
+    # ---------- STYLE ----------
+    def bold(self, on=True):
+        self._buffer += ESC + b"E" + (b"\x01" if on else b"\x00")
+        return self
+
+    def size(self, *, double_height=False, double_width=False):
+        self._double_width = double_width
+        self._buffer += (
+            GS + b"!" + bytes([(0x10 if double_width else 0) | int(double_height)])
+        )
+        return self
+
+    def align(self, alignment):
+        self._buffer += ESC + b"a" + bytes([alignment])
+        return self
+
+    # ---------- TEXT ----------
+    def text(self, text):
+        self._buffer += str(text).encode(self.codepage, errors="replace")
+        return self
+
+    def line(self, text=""):
+        return self.text(text).text("\n")
+
+    def wrapped(self, text, *, indent=""):
+        """Write ``text`` word-wrapped to the current column count."""
+        lines = textwrap.wrap(
+            str(text),
+            width=self.columns,
+            initial_indent=indent,
+            subsequent_indent=" " * len(indent),
+        )
+        for line in lines or [indent]:
+            self.line(line)
+        return self
+
+    def pair(self, left, right, *, indent=0):
+        """One line with ``left`` and ``right`` pushed to the edges."""
+        right = str(right)
+        space = self.columns - indent - len(right)
+        return self.line(f"{' ' * indent}{str(left)[: space - 1]:<{space}}{right}")
+
+    def rule(self, char="-"):
+        return self.line(char * self.columns)
+
+    # ---------- PAPER ----------
+    def feed(self, lines=1):
+        self._buffer += ESC + b"d" + bytes([lines])
+        return self
+
+    def cut(self):
+        # Feed to the cutter, then partial cut
+        self._buffer += GS + b"VB\x00"
+        return self
+
+    def getvalue(self) -> bytes:
+        return bytes(self._buffer)
+
+
+def render_bill_escpos(*, bill, items=None) -> bytes:
+    if items is None:
+        items = list(bill.items.select_related("item").all())
+    local_dt = timezone.localtime(bill.created_at)
+    totals = totals_for_bill(bill, items=items)
+
+    t = Ticket()
+
+    # --- HEADER ---
+    t.align(CENTER).bold().size(double_height=True, double_width=True)
+    t.line("MAHAKAAL THEMES CAFE")
+    t.size().bold(False)
+    t.line("Plot 92, Lakhuja Heights, Bhilwara")
+    t.line("GST: 08MAQPS9885M1ZX | 9530301414")
+    t.align(LEFT).rule()
+
+    # --- INFO ---
+    t.bold().line(f"BILL: {bill.bill_number}").bold(False)
+    t.line(f"DATE: {local_dt.strftime('%d/%m/%y %I:%M%p')}")
+    t.line(f"CUST: {str(bill.customer_name or 'Cash'):.20}")
+
+    # --- TABLE HEADER ---
+    t.bold().pair("ITEM DESCRIPTION", "PRICE").bold(False)
+    t.rule()
+
+    # --- ITEMS ---
+    for bi in items:
+        name = bi.item.name.upper()
+        if bi.size:
+            name = f"{name} ({bi.size})"
+
+        name_lines = textwrap.wrap(name, width=t.columns - 10) or [""]
+
+        t.bold().pair(name_lines[0], f"{bi.line_total():>8.2f}")
+        for line in name_lines[1:]:
+            t.line(line)
+        t.bold(False)
+        t.line(f"  {bi.quantity} x {bi.price}")
+
+    t.rule()
+
+    # --- SUMMARY ---
+    t.pair("Sub-Total:", f"{totals.subtotal:>8.2f}", indent=10)
+    if bill.discount_amount > 0:
+        t.pair("Discount:", f"{-bill.discount_amount:>8.2f}", indent=10)
+    t.pair(f"CGST {bill.gst_percentage/2:g}%:", f"{totals.cgst:>8.2f}", indent=10)
+    t.pair(f"SGST {bill.gst_percentage/2:g}%:", f"{totals.sgst:>8.2f}", indent=10)
+
+    t.feed(1)
+    t.bold().size(double_height=True)
+    t.pair("GRAND TOTAL:", f"Rs {totals.grand_total}/-", indent=4)
+    t.size()
+
+    t.feed(1)
+    t.align(CENTER).line("THANK YOU! VISIT AGAIN").bold(False).align(LEFT)
+
+    t.feed(3).cut()
+    return t.getvalue()
+
+
+def render_kitchen_escpos(*, recipe, items=None) -> bytes:
+    if items is None:
+        items = list(recipe.items.all())
+    local_dt = timezone.localtime(recipe.created_at)
+    table_number = recipe.order.table.number if recipe.order.table else "TAKEAWAY"
+
+    t = Ticket()
+
+    # KOT Header
+    t.align(CENTER).bold().size(double_height=True, double_width=True)
+    t.line("KITCHEN SLIP")
+    t.size(double_height=True)
+    t.line(f"STATION: {recipe.station.upper()}")
+    t.size().bold(False)
+    t.line(
+        f"TABLE {table_number} | KOT {recipe.order_id} | {local_dt.strftime('%I:%M %p')}"
+    )
+    t.align(LEFT).rule()
+
+    # KOT Items
+    for item in items:
+        name = item.item_name.upper()
+        if getattr(item, "size", None):
+            name = f"{name} ({item.size})"
+
+        t.bold().size(double_height=True)
+        t.wrapped(name, indent=f"{item.quantity} x ")
+        t.size()
+
+        if item.notes:
+            t.wrapped(f">> {item.notes}", indent="  ")
+
+        t.bold(False).rule()
+
+    t.feed(3).cut()
+    return t.getvalue()
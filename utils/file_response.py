@@ -0,0 +1,114 @@
+"""
+Serve files that never change once written (finalized bills, cached
+menu images) with a
+strong ETag, ``If-None-Match`` / ``If-Range`` handling and single byte
+ranges.
+"""
+
+import re
+
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified
+from django.utils.http import parse_etags, quote_etag
+
+# Staff-only documents: browsers may keep them forever, shared caches may not
+IMMUTABLE_CACHE_CONTROL = "private, max-age=31536000, immutable"
+# Staff-only documents behind a fixed URL that can be regenerated (a bill
+# edited in the admin): always revalidate, the ETag makes that a 304
+REVALIDATE_CACHE_CONTROL = "private, no-cache"
+# Content-addressed public files (menu images)
+PUBLIC_IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_byte_range(header, size):
+    """
+    Return the inclusive ``(start, end)`` asked for by a single-range
+    ``Range`` header, or None when the header should be ignored
+    (malformed or multi-range: the whole file is sent).
+    """
+    match = _RANGE_RE.match(header.strip())
+    if not match or match.groups() == ("", ""):
+        return None
+
+    first, last = match.groups()
+
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+        if last and int(last) < start:
+            return None
+    else:
+        # bytes=-N -> last N bytes
+        suffix = int(last)
+        if suffix == 0:
+            raise RangeNotSatisfiable
+        start, end = max(size - suffix, 0), size - 1
+
+    if start >= size:
+        raise RangeNotSatisfiable
+
+    return start, end
+
+
+def _set_validators(response, etag, cache_control=IMMUTABLE_CACHE_CONTROL):
+    response["ETag"] = etag
+    response["Cache-Control"] = cache_control
+    response["Accept-Ranges"] = "bytes"
+    return response
+
+
+def serve_immutable_file(
+    request,
+    open_file,
+    *,
+    etag,
+    content_type,
+    filename,
+    cache_control=IMMUTABLE_CACHE_CONTROL,
+):
+    """
+    Stream a stored file. ``open_file()`` returns ``(binary file, size)``
+    and is only called when the body is needed; ``etag`` is the
+    unquoted content hash.
+    """
+    etag = quote_etag(etag)
+
+    client_etags = [
+        tag.removeprefix("W/")
+        for tag in parse_etags(request.headers.get("If-None-Match", ""))
+    ]
+    if "*" in client_etags or etag in client_etags:
+        return _set_validators(HttpResponseNotModified(), etag, cache_control)
+
+    file, size = open_file()
+    range_header = request.headers.get("Range")
+    if_range = request.headers.get("If-Range")
+
+    if range_header and (not if_range or if_range == etag):
+        try:
+            byte_range = parse_byte_range(range_header, size)
+        except RangeNotSatisfiable:
+            file.close()
+            response = HttpResponse(status=416)
+            response["Content-Range"] = f"bytes */{size}"
+            return _set_validators(response, etag, cache_control)
+
+        if byte_range:
+            start, end = byte_range
+            with file:
+                file.seek(start)
+                data = file.read(end - start + 1)
+
+            response = HttpResponse(data, status=206, content_type=content_type)
+            response["Content-Range"] = f"bytes {start}-{end}/{size}"
+            response["Content-Disposition"] = f'inline; filename="{filename}"'
+            return _set_validators(response, etag, cache_control)
+
+    response = FileResponse(file, content_type=content_type, filename=filename)
+    response["Content-Length"] = size
+    return _set_validators(response, etag, cache_control)
@@ -1,11 +1,18 @@
 # billing/pdf.py
-from decimal import Decimal
+from functools import lru_cache
 
 from django.utils import timezone
+from reportlab import rl_config
 from reportlab.lib.pagesizes import mm
 from reportlab.lib.utils import simpleSplit
 from reportlab.pdfgen import canvas
 
+from billing.pricing import totals_for_bill
+
+# Write compressed streams as binary instead of ASCII85 text:
+# ~20% smaller files and the slowest step of save() disappears
+rl_config.useA85 = 0
+
 
 def _draw_dark_text(p, x, y, text, center=False, right=False):
     """Clean darkness hack with alignment options"""
@@ -20,19 +27,53 @@ def _draw_dark_text(p, x, y, text, center=False, right=False):
         p.drawString(x + 0.15, y, text)
 
 
-def draw_bill_pdf(*, bill, output) -> None:
-    items = list(bill.items.select_related("item").all())
-    local_dt = timezone.localtime(bill.created_at)
+@lru_cache(maxsize=2048)
+def _split(text, font_name, font_size, max_width):
+    """simpleSplit memoised - same item names are wrapped all day"""
+    return tuple(simpleSplit(text, font_name, font_size, max_width))
 
-    width = 80 * mm
-    height = max(180, 100 + (len(items) * 15)) * mm
-    p = canvas.Canvas(output, pagesize=(width, height))
 
-    y = height - 12 * mm
-    margin_left = 6 * mm
-    margin_right = width - 6 * mm
+def _new_canvas(output, width, height):
+    # Only the built-in Courier fonts are used; they are never embedded,
+    # so compression is the only size win left.
+    # invariant: no timestamp / random id, same bill -> same bytes -> same
+    # content-addressed file
+    return canvas.Canvas(
+        output, pagesize=(width, height), pageCompression=1, invariant=1
+    )
 
-    # --- HEADER ---
+
+def _draw_region(p, name, draw, *, x, y, width, height, as_form=False):
+    """
+    Draw a static region with its top-left corner at (x, y).
+
+    ``draw(p)`` paints the region below (0, 0). With ``as_form`` the
+    region is recorded once per document as a Form XObject and reused;
+    only worth it when one canvas holds several receipts - for a single
+    receipt the extra PDF objects cost more than they save.
+    """
+    p.saveState()
+    p.translate(x, y)
+    if as_form:
+        if not p.hasForm(name):
+            p.beginForm(name, lowerx=0, lowery=-height, upperx=width, uppery=0)
+            draw(p)
+            p.endForm()
+        p.doForm(name)
+    else:
+        draw(p)
+    p.restoreState()
+
+
+# ---------- STATIC REGIONS ----------
+BILL_HEADER_HEIGHT = 34 * mm
+# One-line regions: text baseline sits this far below the top edge
+LINE_REGION_HEIGHT = 10 * mm
+LINE_REGION_BASELINE = 7 * mm
+
+
+def _bill_header(p, width=80 * mm):
+    y = -12 * mm
     p.setFont("Courier-Bold", 14)
     _draw_dark_text(p, width / 2, y, "MAHAKAAL THEMES CAFE", center=True)
     y -= 6 * mm
@@ -43,8 +84,45 @@ def draw_bill_pdf(*, bill, output) -> None:
     y -= 6 * mm
 
     p.setDash(1, 1)  # Dotted line
-    p.line(margin_left, y, margin_right, y)
-    y -= 6 * mm
+    p.line(6 * mm, y, width - 6 * mm, y)
+
+
+def _bill_footer(p, width=80 * mm):
+    p.setFont("Courier-Bold", 10)
+    _draw_dark_text(
+        p, width / 2, -LINE_REGION_BASELINE, "THANK YOU! VISIT AGAIN", center=True
+    )
+
+
+def _kot_title(p, width=80 * mm):
+    p.setFont("Courier-Bold", 16)
+    _draw_dark_text(p, width / 2, -LINE_REGION_BASELINE, "KITCHEN SLIP", center=True)
+
+
+def draw_bill_pdf(*, bill, output, items=None) -> None:
+    if items is None:
+        items = list(bill.items.select_related("item").all())
+    local_dt = timezone.localtime(bill.created_at)
+
+    width = 80 * mm
+    height = max(180, 100 + (len(items) * 15)) * mm
+    p = _new_canvas(output, width, height)
+
+    margin_left = 6 * mm
+    margin_right = width - 6 * mm
+
+    # --- HEADER ---
+    _draw_region(
+        p,
+        "bill_header",
+        _bill_header,
+        x=0,
+        y=height,
+        width=width,
+        height=BILL_HEADER_HEIGHT,
+    )
+    p.setDash(1, 1)  # Dotted line
+    y = height - BILL_HEADER_HEIGHT
 
     # --- INFO ---
 
@@ -72,11 +150,8 @@ def draw_bill_pdf(*, bill, output) -> None:
     y -= 6 * mm
 
     # --- ITEMS ---
-    subtotal = Decimal("0.00")
-
     for bi in items:
-        line_total = bi.price * bi.quantity
-        subtotal += line_total
+        line_total = bi.line_total()
 
         p.setFont("Courier-Bold", 10)
 
@@ -85,7 +160,7 @@ def draw_bill_pdf(*, bill, output) -> None:
         if bi.size:
             name = f"{name} ({bi.size})"
 
-        name_lines = simpleSplit(name, "Courier-Bold", 10, 50 * mm)
+        name_lines = _split(name, "Courier-Bold", 10, 50 * mm)
 
         for i, line in enumerate(name_lines):
             _draw_dark_text(p, margin_left, y, line)
@@ -110,13 +185,14 @@ def draw_bill_pdf(*, bill, output) -> None:
         p.drawRightString(margin_right, y, f"{val:>8.2f}")
         y -= 5 * mm
 
-    add_row("Sub-Total:", subtotal)
+    totals = totals_for_bill(bill, items=items)
+
+    add_row("Sub-Total:", totals.subtotal)
     if bill.discount_amount > 0:
         add_row("Discount:", -bill.discount_amount)
 
-    gst = (subtotal - bill.discount_amount) * (bill.gst_percentage / 2) / 100
-    add_row(f"CGST {bill.gst_percentage/2:g}%:", gst)
-    add_row(f"SGST {bill.gst_percentage/2:g}%:", gst)
+    add_row(f"CGST {bill.gst_percentage/2:g}%:", totals.cgst)
+    add_row(f"SGST {bill.gst_percentage/2:g}%:", totals.sgst)
 
     y -= 2 * mm
     p.setFont("Courier-Bold", 12)
@@ -125,13 +201,20 @@ def draw_bill_pdf(*, bill, output) -> None:
         p,
         margin_right,
         y,
-        f"Rs {round(subtotal - bill.discount_amount + (gst*2))}/-",
+        f"Rs {totals.grand_total}/-",
         right=True,
     )
     y -= 10 * mm
 
-    p.setFont("Courier-Bold", 10)
-    _draw_dark_text(p, width / 2, y, "THANK YOU! VISIT AGAIN", center=True)
+    _draw_region(
+        p,
+        "bill_footer",
+        _bill_footer,
+        x=0,
+        y=y + LINE_REGION_BASELINE,
+        width=width,
+        height=LINE_REGION_HEIGHT,
+    )
 
     p.showPage()
     p.save()
@@ -139,17 +222,50 @@ def draw_bill_pdf(*, bill, output) -> None:
 
 def draw_kitchen_pdf(*, recipe, output, items=None) -> None:
     """Ultra-Bold Kitchen Slip"""
-    if items is None:
-        items = list(recipe.items.all())
-    local_dt = timezone.localtime(recipe.created_at)
+    draw_kitchen_slips_pdf(slips=[(recipe, items)], output=output)
+
+
+def draw_kitchen_slips_pdf(*, slips, output) -> None:
+    """
+    All stations of an order on one canvas, one page per slip.
+
+    ``slips`` is a list of ``(recipe, items)``; ``items=None`` uses
+    ``recipe.items.all()`` (prefetched by the caller if possible).
+    """
     width, height = 80 * mm, 180 * mm
-    p = canvas.Canvas(output, pagesize=(width, height))
+    p = _new_canvas(output, width, height)
+
+    for recipe, items in slips:
+        _draw_kitchen_slip(
+            p,
+            recipe=recipe,
+            items=recipe.items.all() if items is None else items,
+            width=width,
+            height=height,
+            # Title recorded once and reused on every page
+            title_as_form=len(slips) > 1,
+        )
+        p.showPage()
+
+    p.save()
+
+
+def _draw_kitchen_slip(p, *, recipe, items, width, height, title_as_form) -> None:
+    local_dt = timezone.localtime(recipe.created_at)
     y = height - 12 * mm
     margin = 6 * mm
 
     # KOT Header (Inverted style look)
-    p.setFont("Courier-Bold", 16)
-    _draw_dark_text(p, width / 2, y, "KITCHEN SLIP", center=True)
+    _draw_region(
+        p,
+        "kot_title",
+        _kot_title,
+        x=0,
+        y=y + LINE_REGION_BASELINE,
+        width=width,
+        height=LINE_REGION_HEIGHT,
+        as_form=title_as_form,
+    )
     y -= 7 * mm
     p.setFont("Courier-Bold", 12)
     _draw_dark_text(p, width / 2, y, f"STATION: {recipe.station.upper()}", center=True)
@@ -179,7 +295,7 @@ def draw_kitchen_pdf(*, recipe, output, items=None) -> None:
         if getattr(item, "size", None):
             name = f"{name} ({item.size})"
 
-        name_lines = simpleSplit(name, "Courier-Bold", 11, 50 * mm)
+        name_lines = _split(name, "Courier-Bold", 11, 50 * mm)
 
         for line in name_lines:
             _draw_dark_text(p, margin + 15 * mm, y, line)
@@ -188,7 +304,7 @@ def draw_kitchen_pdf(*, recipe, output, items=None) -> None:
         if item.notes:
             p.setFont("Courier-BoldOblique", 11)
 
-            note_lines = simpleSplit(
+            note_lines = _split(
                 f">> {item.notes}",
                 "Courier-BoldOblique",
                 11,
@@ -204,6 +320,3 @@ def draw_kitchen_pdf(*, recipe, output, items=None) -> None:
         p.line(margin, y, width - margin, y)
         p.setDash(1, 0)
         y -= 8 * mm
-
-    p.showPage()
-    p.save()
@@ -0,0 +1,159 @@
+"""
+Storage for generated bill and kitchen slip files.
+
+Files live under ``MEDIA_ROOT/bills/YYYY/MM/DD/<sha256><suffix>``: one
+directory per trading day, named by content hash, so the same bytes are
+only ever stored once. Each write goes to a temp file in the target
+directory and is renamed into place; readers never see half a PDF.
+
+Closed months are packed into ``MEDIA_ROOT/bills/archive/YYYY-MM.zip``
+by ``manage.py archive_pdfs``. The zip central directory is the index:
+``open_stored()`` reads one member without unpacking the rest.
+"""
+
+import hashlib
+import os
+import re
+import tempfile
+import zipfile
+from pathlib import Path
+from typing import NamedTuple
+
+from django.conf import settings
+
+ROOT = "bills"
+ARCHIVE_DIR = "archive"
+
+_SHARDED_RE = re.compile(rf"^{ROOT}/(\d{{4}})/(\d{{2}})/(\d{{2}}/[^/]+)$")
+
+
+class StoredFile(NamedTuple):
+    path: str  # relative to MEDIA_ROOT
+    sha256: str
+
+
+def _media_root() -> Path:
+    return Path(settings.MEDIA_ROOT)
+
+
+def _atomic_write(target: Path, write) -> None:
+    target.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=target.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+        os.replace(tmp, target)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+
+
+def store_file(data: bytes, *, day, suffix=".pdf") -> StoredFile:
+    """
+    Write ``data`` into the shard for ``day`` and return where it went.
+    """
+    sha256 = hashlib.sha256(data).hexdigest()
+    relative_path = f"{ROOT}/{day:%Y/%m/%d}/{sha256}{suffix}"
+    target = _media_root() / relative_path
+
+    try:
+        _atomic_write(target, lambda f: f.write(data))
+    except OSError:
+        # Windows refuses to replace a file that is open (being printed);
+        # same name means same bytes, so the existing copy is fine
+        if not target.exists():
+            raise
+
+    return StoredFile(relative_path, sha256)
+
+
+def _archive_location(relative_path):
+    match = _SHARDED_RE.match(relative_path)
+    if not match:
+        return None, None
+
+    year, month, member = match.groups()
+    archive = _media_root() / ROOT / ARCHIVE_DIR / f"{year}-{month}.zip"
+    return archive, member
+
+
+def open_stored(relative_path):
+    """
+    Open a stored file from disk or from its month's archive.
+    Returns ``(binary file object, size)``.
+    """
+    path = _media_root() / relative_path
+    try:
+        return open(path, "rb"), path.stat().st_size
+    except FileNotFoundError:
+        pass
+
+    archive, member = _archive_location(relative_path)
+    if archive is None or not archive.exists():
+        raise FileNotFoundError(relative_path)
+
+    with zipfile.ZipFile(archive) as zf:
+        try:
+            info = zf.getinfo(member)
+        except KeyError:
+            raise FileNotFoundError(relative_path) from None
+        # The member stays readable after the ZipFile itself is closed
+        return zf.open(info), info.file_size
+
+
+# ---------- ARCHIVE ----------
+def stored_months():
+    """``(year, month)`` of every month that still has loose files."""
+    root = _media_root() / ROOT
+    return sorted(
+        (int(month_dir.parent.name), int(month_dir.name))
+        for month_dir in root.glob("[0-9][0-9][0-9][0-9]/[0-9][0-9]")
+        if month_dir.is_dir()
+    )
+
+
+def archive_month(year: int, month: int, keep=()) -> int:
+    """
+    Pack one month's files into its zip (adding to an existing one) and
+    delete the originals. Files whose relative path is in ``keep`` (still
+    waiting to be printed) stay loose. Returns the number of files
+    archived.
+    """
+    month_dir = _media_root() / ROOT / f"{year:04d}" / f"{month:02d}"
+    keep = set(keep)
+    files = sorted(
+        path
+        for path in month_dir.glob("*/*")
+        if path.is_file()
+        and path.suffix != ".tmp"
+        and path.relative_to(_media_root()).as_posix() not in keep
+    )
+    if not files:
+        return 0
+
+    archive = _media_root() / ROOT / ARCHIVE_DIR / f"{year:04d}-{month:02d}.zip"
+
+    def write(f):
+        with zipfile.ZipFile(f, "w", compression=zipfile.ZIP_DEFLATED) as out:
+            if archive.exists():
+                with zipfile.ZipFile(archive) as old:
+                    for info in old.infolist():
+                        out.writestr(info, old.read(info))
+
+            existing = set(out.namelist())
+            for path in files:
+                member = path.relative_to(month_dir).as_posix()
+                if member not in existing:
+                    out.write(path, member)
+
+    _atomic_write(archive, write)
+
+    for path in files:
+        path.unlink()
+    for day_dir in month_dir.iterdir():
+        if day_dir.is_dir() and not any(day_dir.iterdir()):
+            day_dir.rmdir()
+    if not any(month_dir.iterdir()):
+        month_dir.rmdir()
+
+    return len(files)
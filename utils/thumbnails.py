@@ -0,0 +1,121 @@
+"""
+Resized copies of menu images (items and categories).
+
+Every source image gets one WebP and one JPEG per width in ``WIDTHS``,
+stored under ``MEDIA_ROOT/thumbs/<ab>/<sha256>/<width>.<ext>`` — named
+by the hash of the source bytes, so re-uploading or re-syncing the same
+picture reuses what is already on disk. Sources smaller than a width
+are not enlarged; that file just holds the original size.
+
+``build_derivatives()`` only needs a file path and the media root (no
+Django state), so ``manage.py build_thumbnails`` can run it in worker
+processes.
+"""
+
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+from typing import Optional
+
+from django.conf import settings
+from PIL import Image, ImageOps
+
+ROOT = "thumbs"
+WIDTHS = (160, 320, 640)
+# extension → Pillow format and save options
+FORMATS = {
+    "webp": ("WEBP", {"quality": 80, "method": 4}),
+    "jpg": ("JPEG", {"quality": 82, "optimize": True, "progressive": True}),
+}
+
+
+def derivative_path(sha256: str, width: int, ext: str) -> str:
+    """
+    Path of one derivative, relative to MEDIA_ROOT.
+    """
+    return f"{ROOT}/{sha256[:2]}/{sha256}/{width}.{ext}"
+
+
+def derivative_url(sha256: str, width: int, ext: str) -> str:
+    return f"{settings.MEDIA_URL}{derivative_path(sha256, width, ext)}"
+
+
+def local_source(field_file) -> Optional[str]:
+    """
+    Filesystem path of an ImageField's file, or None for empty fields,
+    remote URLs (sheet / JSON imports) and missing files.
+    """
+    name = field_file.name if field_file else ""
+    if not name or name.startswith("http"):
+        return None
+    try:
+        path = field_file.path
+    except NotImplementedError:
+        # Storage without local files
+        return None
+    return path if os.path.exists(path) else None
+
+
+def file_sha256(path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _save_atomic(image, target: Path, pil_format, options) -> None:
+    target.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=target.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            image.save(f, pil_format, **options)
+        os.replace(tmp, target)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+
+
+def _resized(image, width):
+    if image.width <= width:
+        return image
+    height = max(1, round(image.height * width / image.width))
+    return image.resize((width, height), Image.Resampling.LANCZOS)
+
+
+def build_derivatives(source, media_root, force=False) -> str:
+    """
+    Write every missing derivative of the image at ``source`` and return
+    its hash. Existing files are kept unless ``force``.
+    """
+    sha256 = file_sha256(source)
+    media_root = Path(media_root)
+    targets = {
+        (width, ext): media_root / derivative_path(sha256, width, ext)
+        for width in WIDTHS
+        for ext in FORMATS
+    }
+    if not force and all(target.exists() for target in targets.values()):
+        return sha256
+
+    with Image.open(source) as original:
+        # Phone photos: apply the EXIF rotation before it is stripped
+        image = ImageOps.exif_transpose(original)
+        has_alpha = image.mode in ("RGBA", "LA") or "transparency" in image.info
+        image = image.convert("RGBA" if has_alpha else "RGB")
+
+        # JPEG has no transparency: flatten onto white
+        flat = image
+        if has_alpha:
+            flat = Image.new("RGB", image.size, (255, 255, 255))
+            flat.paste(image, mask=image.getchannel("A"))
+
+        for width in WIDTHS:
+            for ext, (pil_format, options) in FORMATS.items():
+                target = targets[width, ext]
+                if force or not target.exists():
+                    picture = image if ext == "webp" else flat
+                    _save_atomic(_resized(picture, width), target, pil_format, options)
+
+    return sha256
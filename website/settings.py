@@ -103,6 +103,18 @@ DATABASES = {
 }
 
 
+# Cache
+# Shared by all server processes (menu catalog version, cached pages)
+# https://docs.djangoproject.com/en/4.1/topics/cache/
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.path.join(BASE_DIR, "cache"),
+    }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
 
@@ -170,5 +182,28 @@ ip = get_local_ip()
 print(f"\nStarting development server at http://{ip}:8000/\n")
 
 
+# Receipt printers used by the print worker (python manage.py run_print_worker)
+# BACKEND: billing.printing.WindowsShellBackend | WindowsRawBackend
+#          | RawTcpBackend | FileSinkBackend
+# FORMAT:  "pdf" (default) or "escpos" -> printer gets a raw ESC/POS ticket,
+#          the PDF is still saved for the archive
+PRINTERS = {
+    "POS-80C BT": {
+        "BACKEND": "billing.printing.WindowsRawBackend",
+        "FORMAT": "escpos",
+    },
+    "POS-80C USB": {
+        "BACKEND": "billing.printing.WindowsRawBackend",
+        "FORMAT": "escpos",
+    },
+}
+
+# Threads rendering bill / kitchen slip PDFs after commit
+PDF_RENDER_WORKERS = 2
+
+# Sales before this hour (local time) count towards the previous day,
+# so a late-night shift stays in one day's takings
+BUSINESS_DAY_CUTOFF_HOUR = 4
+
 GOOGLE_SERVICE_ACCOUNT_FILE = os.getenv("GOOGLE_SERVICE_ACCOUNT_FILE")
 GOOGLE_SHEET_ID = os.getenv("GOOGLE_SHEET_ID")